@@ -0,0 +1,80 @@
+"""
+Benchmark del codec JSON: stdlib vs backend rapido (orjson/msgspec).
+
+Compara la serializacion de una respuesta de /chat/history con 100 mensajes
+por el camino por defecto de FastAPI (response_model + jsonable_encoder +
+json.dumps) frente a FastJSONResponse, y la codificacion/decodificacion de
+los frames WebSocket mas frecuentes.
+
+Uso (desde chat_py_backend):
+    python -m benchmarks.json_codec_benchmark
+"""
+import sys
+import os
+import json
+import timeit
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from typing import List
+from model.chat import Message
+from schemas.chat_schema import MessageResponse
+from utils import json_codec
+from benchmarks.ws_codec_benchmark import FRAMES
+
+ITERATIONS = 2000
+FRAME_ITERATIONS = 50000
+
+def _history(size: int = 100) -> List[Message]:
+    start = datetime(2026, 1, 15, 10, 0, 0)
+    return [
+        Message(
+            id=f"665f1c2a9b1e8a3d4c5b{i:04x}",
+            sender_email="maria.garcia@example.com" if i % 2 else "juan.perez@example.com",
+            receiver_email="juan.perez@example.com" if i % 2 else "maria.garcia@example.com",
+            content=f"Mensaje número {i} de la conversación, con algo de texto para que pese.",
+            timestamp=start + timedelta(seconds=i * 7),
+            is_read=i < 90,
+        )
+        for i in range(size)
+    ]
+
+def _us(fn, number: int) -> float:
+    return timeit.timeit(fn, number=number) / number * 1e6
+
+def run():
+    print(f"Backend rapido: {json_codec.backend_name}\n")
+
+    messages = _history()
+    adapter = TypeAdapter(List[MessageResponse])
+
+    def fastapi_default():
+        #validacion del response_model + serializacion + json.dumps de JSONResponse
+        validated = adapter.validate_python([m.model_dump() for m in messages])
+        content = jsonable_encoder(adapter.dump_python(validated, mode="json"))
+        return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    def fast_response():
+        return json_codec.dumps([m.model_dump() for m in messages])
+
+    print("Historial de 100 mensajes")
+    print(f"  {'FastAPI por defecto':<28}{_us(fastapi_default, ITERATIONS):>10.1f} us")
+    print(f"  {'FastJSONResponse':<28}{_us(fast_response, ITERATIONS):>10.1f} us")
+    print(f"  {'bytes':<28}{len(fast_response()):>10}\n")
+
+    print(f"{'frame':<14}{'stdlib enc':>12}{'fast enc':>12}{'stdlib dec':>12}{'fast dec':>12}   (us)")
+    for name, frame in FRAMES.items():
+        text = json.dumps(frame)
+        print(
+            f"{name:<14}"
+            f"{_us(lambda: json.dumps(frame), FRAME_ITERATIONS):>12.2f}"
+            f"{_us(lambda: json_codec.dumps_str(frame), FRAME_ITERATIONS):>12.2f}"
+            f"{_us(lambda: json.loads(text), FRAME_ITERATIONS):>12.2f}"
+            f"{_us(lambda: json_codec.loads(text), FRAME_ITERATIONS):>12.2f}"
+        )
+
+if __name__ == "__main__":
+    run()
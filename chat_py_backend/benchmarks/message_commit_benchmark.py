@@ -0,0 +1,113 @@
+"""
+Benchmark de latencia por mensaje del camino de guardado.
+
+Compara el camino anterior (insert_one + find_one de la sala + update_one o
+insert_one) con los modos de `MESSAGE_COMMIT_MODE`: sequential (insercion +
+upsert), pipelined (ambas en paralelo) y transaction (si el servidor es un
+replica set).
+
+Necesita un MongoDB accesible en MONGO_URL; trabaja sobre una base de datos
+temporal `<DB_NAME>_bench` que se elimina al terminar.
+
+Uso (desde chat_py_backend):
+    python -m benchmarks.message_commit_benchmark
+"""
+import sys
+import os
+import asyncio
+import statistics
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from config.settings import settings
+from services import chat_service as chat_service_module
+from services.chat_service import ChatService
+
+MESSAGES = 500
+CONVERSATIONS = 50
+
+async def _legacy_save(db, sender_email: str, receiver_email: str, content: str):
+    #camino anterior: 3 round-trips secuenciales y carrera al crear la sala
+    now = datetime.now(timezone.utc)
+    message_data = {
+        "sender_email": sender_email,
+        "receiver_email": receiver_email,
+        "content": content,
+        "timestamp": now,
+        "is_read": False
+    }
+    result = await db.messages.insert_one(message_data)
+    message_data["id"] = str(result.inserted_id)
+
+    participants = sorted([sender_email, receiver_email])
+    room_id = f"{participants[0]}_{participants[1]}"
+    existing_room = await db.chat_rooms.find_one({"room_id": room_id})
+    if existing_room:
+        await db.chat_rooms.update_one(
+            {"room_id": room_id},
+            {"$set": {"last_message": message_data, "updated_at": now}}
+        )
+    else:
+        await db.chat_rooms.insert_one({
+            "room_id": room_id,
+            "participants": participants,
+            "last_message": message_data,
+            "updated_at": now,
+            "created_at": now
+        })
+
+async def _measure(name: str, save) -> None:
+    latencies = []
+    for i in range(MESSAGES):
+        sender = f"user{i % CONVERSATIONS}@bench.local"
+        receiver = f"user{(i % CONVERSATIONS) + CONVERSATIONS}@bench.local"
+        started = time.perf_counter()
+        await save(sender, receiver, f"mensaje {i}")
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"  {name:<14}{statistics.mean(latencies):>10.2f}{latencies[len(latencies) // 2]:>10.2f}{p99:>10.2f}")
+
+async def run():
+    client = AsyncIOMotorClient(settings.mongo_url, serverSelectionTimeoutMS=5000)
+    try:
+        hello = await client.admin.command("hello")
+    except Exception as e:
+        print(f"MongoDB no disponible en {settings.mongo_url}: {e}")
+        return
+
+    db = client[f"{settings.db_name}_bench"]
+    await db.chat_rooms.create_index("room_id", unique=True)
+
+    #el servicio usa la base temporal y el cliente del benchmark
+    async def bench_database():
+        return db
+    chat_service_module.get_database = bench_database
+    chat_service_module.get_client = lambda: client
+    service = ChatService()
+
+    modes = ["sequential", "pipelined"]
+    if "setName" in hello:
+        modes.append("transaction")
+
+    print(f"{MESSAGES} mensajes en {CONVERSATIONS} conversaciones (ms por mensaje)")
+    print(f"  {'modo':<14}{'media':>10}{'p50':>10}{'p99':>10}")
+    try:
+        await _measure("anterior", lambda s, r, c: _legacy_save(db, s, r, c))
+        for mode in modes:
+            await db.messages.delete_many({})
+            await db.chat_rooms.delete_many({})
+            settings.message_commit_mode = mode
+            await _measure(mode, service.save_message)
+        if "transaction" not in modes:
+            print("  (transaction omitido: el servidor no es un replica set)")
+    finally:
+        await client.drop_database(db.name)
+        client.close()
+
+if __name__ == "__main__":
+    asyncio.run(run())
@@ -0,0 +1,140 @@
+"""
+Benchmark de /chat/search con millones de mensajes.
+
+Compara `ChatService.search_messages` (indice de texto idx_messages_text) con
+la alternativa ingenua: `$regex` sobre `content` limitado a los mensajes del
+usuario. Las consultas se agrupan por frecuencia de la palabra buscada
+(comun, media, rara) y por alcance (todas las conversaciones o una).
+
+Necesita un MongoDB accesible en MONGO_URL; trabaja sobre una base de datos
+temporal `<DB_NAME>_bench` que se elimina al terminar. La carga de datos
+tarda varios minutos con el tamaño por defecto.
+
+Uso (desde chat_py_backend):
+    python -m benchmarks.message_search_benchmark [mensajes]
+"""
+import sys
+import os
+import asyncio
+import random
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from config.settings import settings
+from services import chat_service as chat_service_module
+from services.chat_service import ChatService, room_key
+
+MESSAGES = 2_000_000
+USERS = 5_000
+VOCABULARY = 50_000
+WORDS_PER_MESSAGE = 8
+BATCH = 10_000
+QUERIES = 50
+
+def _word(rank: int) -> str:
+    return f"w{rank}"
+
+def _zipf_rank(rng: random.Random) -> int:
+    #distribucion de Zipf aproximada: pocas palabras muy frecuentes, muchas raras
+    return min(VOCABULARY - 1, int(VOCABULARY ** rng.random()) - 1)
+
+async def _load(db, messages: int, rng: random.Random):
+    start = datetime.now(timezone.utc) - timedelta(days=30)
+    docs = []
+    for i in range(messages):
+        sender, receiver = rng.sample(range(USERS), 2)
+        sender_email, receiver_email = f"user{sender}@bench.local", f"user{receiver}@bench.local"
+        docs.append({
+            "room_id": room_key(sender_email, receiver_email)[0],
+            "sender_email": sender_email,
+            "receiver_email": receiver_email,
+            "content": " ".join(_word(_zipf_rank(rng)) for _ in range(WORDS_PER_MESSAGE)),
+            "timestamp": start + timedelta(seconds=i),
+            "is_read": False
+        })
+        if len(docs) == BATCH:
+            await db.messages.insert_many(docs, ordered=False)
+            docs = []
+    if docs:
+        await db.messages.insert_many(docs, ordered=False)
+
+async def _regex_search(db, user_email: str, word: str, limit: int = 20):
+    query = {
+        "content": {"$regex": rf"\b{word}\b", "$options": "i"},
+        "$or": [{"sender_email": user_email}, {"receiver_email": user_email}]
+    }
+    return await db.messages.find(query).sort("timestamp", -1).limit(limit).to_list(length=limit)
+
+async def _measure(name: str, search, cases) -> None:
+    latencies = []
+    for case in cases:
+        started = time.perf_counter()
+        await search(*case)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    latencies.sort()
+    p99 = latencies[max(0, int(len(latencies) * 0.99) - 1)]
+    print(f"  {name:<28}{statistics.mean(latencies):>10.2f}{latencies[len(latencies) // 2]:>10.2f}{p99:>10.2f}")
+
+async def run(messages: int):
+    client = AsyncIOMotorClient(settings.mongo_url, serverSelectionTimeoutMS=5000)
+    try:
+        await client.admin.command("ping")
+    except Exception as e:
+        print(f"MongoDB no disponible en {settings.mongo_url}: {e}")
+        return
+
+    db = client[f"{settings.db_name}_bench"]
+
+    #el servicio usa la base temporal del benchmark
+    async def bench_database():
+        return db
+    chat_service_module.get_database = bench_database
+    service = ChatService()
+    rng = random.Random(42)
+
+    try:
+        started = time.perf_counter()
+        await _load(db, messages, rng)
+        print(f"{messages} mensajes cargados en {time.perf_counter() - started:.0f}s")
+
+        #los mismos indices que crea la migracion para estas consultas
+        started = time.perf_counter()
+        await db.messages.create_index(
+            [("content", "text"), ("sender_email", 1), ("receiver_email", 1)],
+            default_language=settings.message_search_language,
+            name="idx_messages_text"
+        )
+        await db.messages.create_index([("receiver_email", 1), ("timestamp", 1), ("_id", 1)])
+        await db.messages.create_index([("sender_email", 1), ("timestamp", 1), ("_id", 1)])
+        print(f"Índices creados en {time.perf_counter() - started:.0f}s")
+
+        users = [f"user{rng.randrange(USERS)}@bench.local" for _ in range(QUERIES)]
+        partners = [f"user{rng.randrange(USERS)}@bench.local" for _ in range(QUERIES)]
+        frequencies = {
+            "comun": [_word(rng.randrange(10)) for _ in range(QUERIES)],
+            "media": [_word(rng.randrange(100, 1000)) for _ in range(QUERIES)],
+            "rara": [_word(rng.randrange(10_000, VOCABULARY)) for _ in range(QUERIES)],
+        }
+
+        print(f"{QUERIES} búsquedas por caso, 20 resultados (ms por búsqueda)")
+        print(f"  {'caso':<28}{'media':>10}{'p50':>10}{'p99':>10}")
+        for frequency, words in frequencies.items():
+            cases = list(zip(users, words))
+            await _measure(f"texto {frequency}", lambda u, w: service.search_messages(u, w), cases)
+            await _measure(
+                f"texto {frequency} (1 conv.)",
+                lambda u, w, p: service.search_messages(u, w, other_user_email=p),
+                [(u, w, p) for (u, w), p in zip(cases, partners)]
+            )
+            await _measure(f"regex {frequency}", lambda u, w: _regex_search(db, u, w), cases)
+    finally:
+        await client.drop_database(db.name)
+        client.close()
+
+if __name__ == "__main__":
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else MESSAGES))
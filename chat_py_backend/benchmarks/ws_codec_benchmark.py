@@ -0,0 +1,70 @@
+"""
+Benchmark de codificacion de frames WebSocket: JSON (texto) vs MessagePack.
+
+Mide bytes por frame (sin comprimir y con deflate, como haria
+permessage-deflate) y el tiempo de encode/decode de los tipos de frame mas
+frecuentes.
+
+Uso (desde chat_py_backend):
+    python -m benchmarks.ws_codec_benchmark
+"""
+import sys
+import os
+import timeit
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.ws_codec import JSON_CODEC, MSGPACK_CODEC
+
+ITERATIONS = 20000
+
+FRAMES = {
+    "message": {
+        "type": "message",
+        "id": "665f1c2a9b1e8a3d4c5b6a79",
+        "sender_email": "maria.garcia@example.com",
+        "receiver_email": "juan.perez@example.com",
+        "content": "Hola! Nos vemos mañana a las 10 en la oficina para revisar el informe.",
+        "timestamp": "2026-01-15T10:32:11.123456+00:00",
+        "is_read": False,
+    },
+    "message_sent": {
+        "type": "message_sent",
+        "message_id": "665f1c2a9b1e8a3d4c5b6a79",
+        "timestamp": "2026-01-15T10:32:11.123456+00:00",
+    },
+    "typing": {
+        "type": "typing",
+        "sender_email": "maria.garcia@example.com",
+        "is_typing": True,
+    },
+    "user_status": {
+        "type": "user_status",
+        "user_email": "maria.garcia@example.com",
+        "is_online": True,
+        "timestamp": "2026-01-15T10:32:11.123456+00:00",
+    },
+}
+
+def _deflated_size(payload) -> int:
+    data = payload.encode("utf-8") if isinstance(payload, str) else payload
+    compressor = zlib.compressobj(wbits=-15)
+    return len(compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)) - 4
+
+def run():
+    codecs = [JSON_CODEC] + ([MSGPACK_CODEC] if MSGPACK_CODEC is not None else [])
+    if MSGPACK_CODEC is None:
+        print("msgpack no instalado: solo se mide JSON\n")
+
+    print(f"{'frame':<14}{'codec':<10}{'bytes':>8}{'deflate':>10}{'encode us':>12}{'decode us':>12}")
+    for name, frame in FRAMES.items():
+        for codec in codecs:
+            payload = codec.encode(frame)
+            size = len(payload.encode("utf-8") if isinstance(payload, str) else payload)
+            encode_us = timeit.timeit(lambda: codec.encode(frame), number=ITERATIONS) / ITERATIONS * 1e6
+            decode_us = timeit.timeit(lambda: codec.decode(payload), number=ITERATIONS) / ITERATIONS * 1e6
+            print(f"{name:<14}{codec.name:<10}{size:>8}{_deflated_size(payload):>10}{encode_us:>12.2f}{decode_us:>12.2f}")
+
+if __name__ == "__main__":
+    run()
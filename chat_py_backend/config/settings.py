@@ -1,6 +1,6 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import field_validator, EmailStr
-from typing import List
+from typing import Dict, List
 
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(env_file=".env", case_sensitive=False)
@@ -34,6 +34,9 @@ class Settings(BaseSettings):
     host: str = "0.0.0.0"
     port: int = 8000
     
+    # Serializacion JSON: "auto" (orjson > msgspec > stdlib), "orjson", "msgspec" o "stdlib"
+    json_backend: str = "auto"
+
     # Logging
     log_level: str = "INFO"
     
@@ -43,8 +46,52 @@ class Settings(BaseSettings):
     lockout_duration: int = 300  # segundos
     
     # WebSocket
-    ws_heartbeat_interval: int = 30
-    ws_connection_timeout: int = 60
+    ws_heartbeat_interval: int = 30  # segundos sin actividad antes de enviar un ping
+    ws_connection_timeout: int = 60  # segundos sin actividad antes de expulsar la conexion
+    ws_pubsub_backend: str = "memory"  # "memory" (un worker) o "unix" (varios workers)
+    ws_pubsub_socket_dir: str = "/tmp/chatpy-pubsub"
+    ws_pubsub_send_timeout: float = 5.0  # segundos maximos esperando a que otro worker acepte un mensaje
+    ws_send_queue_size: int = 256  # frames prioritarios pendientes antes de desconectar
+    ws_send_queue_low_size: int = 64  # frames descartables (typing/presencia) pendientes
+    ws_send_timeout: float = 10.0  # segundos maximos por envio al socket
+    ws_batch_window_ms: int = 5  # espera maxima para agrupar eventos salientes (clientes con batch=1)
+    ws_max_batch_ops: int = 50  # operaciones maximas en un frame entrante de tipo batch
+    ws_handshake_max_inflight: int = 100  # validaciones de handshake simultaneas
+    ws_handshake_rate: float = 200.0  # handshakes admitidos por segundo
+    ws_handshake_burst: int = 400  # rafaga maxima de handshakes
+    ws_handshake_retry_min_ms: int = 1000  # reintento minimo sugerido a un handshake rechazado
+    ws_handshake_retry_max_ms: int = 30000  # reintento maximo sugerido
+    # presupuestos de frames entrantes por tipo: [tokens por segundo, rafaga] por conexion
+    ws_inbound_budgets: Dict[str, List[float]] = {
+        "message": [5, 20],
+        "typing": [2, 6],
+        "read": [5, 20],
+        "other": [2, 10],
+    }
+    ws_inbound_user_factor: float = 2.0  # presupuesto por usuario (todos sus dispositivos) = factor x conexion
+    ws_resume_max_events: int = 1000  # eventos maximos reenviados al reanudar una conexion
+    ws_max_devices_per_user: int = 5  # conexiones simultaneas por usuario en cada worker
+    ws_presence_grace_seconds: float = 5.0  # espera antes de anunciar a un usuario offline
+    ws_presence_coalesce_ms: int = 250  # ventana para agrupar cambios de estado en un frame
+    ws_typing_refresh_seconds: float = 3.0  # reenvio maximo de is_typing=true repetidos
+    ws_typing_expire_seconds: float = 6.0  # caducidad del indicador sin refresco del cliente
+    ws_typing_min_interval_ms: int = 500  # separacion minima entre frames de typing de un par
+
+    # Persistencia de mensajes
+    message_group_commit: bool = False  # agrupar inserciones de mensajes en lotes
+    message_group_commit_max_batch: int = 100
+    message_group_commit_interval_ms: int = 5
+    message_commit_mode: str = "sequential"  # "sequential", "pipelined" o "transaction" (requiere replica set)
+    message_search_language: str = "spanish"  # idioma del indice de texto (stemming y stopwords); "none" para desactivarlo
+    message_search_max_results: int = 500  # profundidad maxima de paginacion de /chat/search
+    message_archive_enabled: bool = False  # mover los mensajes antiguos a segmentos comprimidos en disco (sustituye al TTL de 365 dias)
+    message_archive_dir: str = "archive/messages"  # compartido por todos los workers
+    message_archive_after_days: int = 90
+    message_archive_interval_seconds: int = 3600
+    message_archive_batch_size: int = 5000
+
+    # Metricas
+    metrics_token: str = ""  # secreto para GET /metrics (Authorization: Bearer <token>); vacio desactiva el endpoint
 
     # Uploads
     upload_dir: str = "uploads/avatars"
@@ -69,6 +116,16 @@ class Settings(BaseSettings):
             raise ValueError("JWT_SECRET debe tener al menos 32 caracteres")
         return v
     
+    @field_validator("ws_inbound_budgets")
+    def validate_inbound_budgets(cls, v):
+        #los tipos sin presupuesto propio usan "other": tiene que existir
+        if "other" not in v:
+            raise ValueError('WS_INBOUND_BUDGETS debe incluir el presupuesto por defecto "other"')
+        for frame_type, budget in v.items():
+            if len(budget) != 2 or budget[0] <= 0 or budget[1] < 1:
+                raise ValueError(f"Presupuesto inválido para '{frame_type}': se espera [tokens por segundo > 0, rafaga >= 1]")
+        return v
+
     @field_validator("allowed_origins", mode="before")
     def parse_cors_origins(cls, v):
         if isinstance(v, str):
@@ -1,6 +1,8 @@
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from config.settings import settings
 from utils.logger import db_logger
 from typing import List, Dict, Any
+from pymongo import UpdateMany
 import asyncio
 
 class DatabaseMigration:
@@ -25,20 +27,47 @@ class DatabaseMigration:
             },
             
             # Indices para mensajes
+            # conversacion por clave unica (room_id) con paginacion por (timestamp, _id)
             {
                 'collection': self.db.messages,
-                'keys': [("sender_email", 1), ("receiver_email", 1), ("timestamp", -1)],
-                'options': {"name": "idx_messages_conversation"}
+                'keys': [("room_id", 1), ("timestamp", -1), ("_id", -1)],
+                'options': {"name": "idx_messages_room"}
             },
             {
                 'collection': self.db.messages,
-                'keys': [("receiver_email", 1), ("is_read", 1)],
-                'options': {"name": "idx_messages_unread"}
+                'keys': [("timestamp", -1)],
+                'options': {"name": "idx_messages_timestamp"}
             },
+            # envio idempotente: un client_message_id por remitente (solo si viene informado)
             {
                 'collection': self.db.messages,
-                'keys': [("timestamp", -1)],
-                'options': {"name": "idx_messages_timestamp"}
+                'keys': [("sender_email", 1), ("client_message_id", 1)],
+                'options': {
+                    "unique": True,
+                    "partialFilterExpression": {"client_message_id": {"$exists": True}},
+                    "name": "idx_messages_client_id"
+                }
+            },
+            # buzon por usuario: reanudacion de WebSocket desde un cursor (timestamp, _id)
+            {
+                'collection': self.db.messages,
+                'keys': [("receiver_email", 1), ("timestamp", 1), ("_id", 1)],
+                'options': {"name": "idx_messages_inbox"}
+            },
+            {
+                'collection': self.db.messages,
+                'keys': [("sender_email", 1), ("timestamp", 1), ("_id", 1)],
+                'options': {"name": "idx_messages_outbox"}
+            },
+            # busqueda de texto: indice invertido de content mantenido por Mongo en cada insercion;
+            # los emails como sufijo filtran por usuario dentro del propio indice
+            {
+                'collection': self.db.messages,
+                'keys': [("content", "text"), ("sender_email", 1), ("receiver_email", 1)],
+                'options': {
+                    "default_language": settings.message_search_language,
+                    "name": "idx_messages_text"
+                }
             },
             
             # Indices para chat rooms
@@ -47,6 +76,11 @@ class DatabaseMigration:
                 'keys': [("participants", 1)],
                 'options': {"name": "idx_chatrooms_participants"}
             },
+            {
+                'collection': self.db.chat_rooms,
+                'keys': [("participants", 1), ("updated_at", -1), ("_id", -1)],
+                'options': {"name": "idx_chatrooms_participant_recent"}
+            },
             {
                 'collection': self.db.chat_rooms,
                 'keys': [("room_id", 1)],
@@ -98,13 +132,38 @@ class DatabaseMigration:
         
         self.logger.info(f"Índices completados: {created_count} creados, {skipped_count} ya existían")
     
+    async def drop_superseded_indexes(self):
+        """
+        Eliminar indices de mensajes que ya no usa ninguna consulta.
+
+        El historial va por room_id (idx_messages_room) y los no leidos son
+        contadores en las salas, asi que los indices por (sender, receiver) y
+        (receiver, is_read) solo encarecian cada insercion.
+        """
+        indexes = await self.db.messages.index_information()
+        for name in ("idx_messages_conversation", "idx_messages_conversation_keyset", "idx_messages_unread"):
+            if name in indexes:
+                await self.db.messages.drop_index(name)
+                self.logger.info(f"Índice de mensajes sin uso eliminado: {name}")
+
+    async def drop_message_ttl_index(self):
+        """Eliminar el TTL de mensajes para que un retraso del archivador no pierda mensajes"""
+        indexes = await self.db.messages.index_information()
+        if "idx_messages_ttl" in indexes:
+            await self.db.messages.drop_index("idx_messages_ttl")
+            self.logger.info("Índice TTL de mensajes eliminado: los mensajes antiguos se archivan")
+
     async def setup_ttl_indexes(self):
         """Configurar indices TTL para limpieza automatica"""
         try:
             # TTL para mensajes antiguos (opcional - 1 year)
-            await self.db.messages.create_index([
-                ("timestamp", 1)
-            ], expireAfterSeconds=31536000, name="idx_messages_ttl")  # 365 días
+            if settings.message_archive_enabled:
+                #con el archivo frio los mensajes antiguos se mueven, no se borran
+                await self.drop_message_ttl_index()
+            else:
+                await self.db.messages.create_index([
+                    ("timestamp", 1)
+                ], expireAfterSeconds=31536000, name="idx_messages_ttl")  # 365 días
             
             # TTL para logs de conexion (si se implementa)
             try:
@@ -128,6 +187,78 @@ class DatabaseMigration:
             else:
                 self.logger.warning(f"No se pudieron configurar indices TTL: {str(e)}")
     
+    async def backfill_message_room_ids(self, batch_size: int = 1000):
+        """
+        Asignar `room_id` a los mensajes anteriores a que se guardara en cada mensaje.
+
+        Se procesa por lotes: se leen hasta `batch_size` mensajes sin room_id y se
+        actualizan con un unico bulk_write agrupado por conversacion.
+        """
+        total = 0
+        while True:
+            cursor = self.db.messages.find(
+                {"room_id": {"$exists": False}},
+                {"sender_email": 1, "receiver_email": 1}
+            ).limit(batch_size)
+            docs = await cursor.to_list(length=batch_size)
+            if not docs:
+                break
+
+            ids_by_room: Dict[str, List[Any]] = {}
+            for doc in docs:
+                participants = sorted([doc["sender_email"], doc["receiver_email"]])
+                ids_by_room.setdefault(f"{participants[0]}_{participants[1]}", []).append(doc["_id"])
+
+            await self.db.messages.bulk_write([
+                UpdateMany({"_id": {"$in": ids}}, {"$set": {"room_id": room_id}})
+                for room_id, ids in ids_by_room.items()
+            ], ordered=False)
+            total += len(docs)
+
+        if total:
+            self.logger.info(f"room_id asignado a {total} mensajes existentes")
+
+    async def backfill_unread_counters(self):
+        """
+        Calcular los contadores de no leidos de salas y usuarios que aun no los tienen.
+
+        Despues de esta migracion los contadores se mantienen con $inc al
+        guardar y se ponen a cero al leer; aqui solo se inicializan a partir de
+        los mensajes (is_read=False y posteriores a la marca de lectura).
+        """
+        rooms = self.db.chat_rooms.find(
+            {"unread": {"$exists": False}},
+            {"room_id": 1, "participants": 1, "read_up_to": 1}
+        )
+        room_count = 0
+        async for room in rooms:
+            unread = {}
+            for slot, email in enumerate(room.get("participants", [])):
+                condition = {
+                    "room_id": room["room_id"],
+                    "receiver_email": email,
+                    "sender_email": {"$ne": email},
+                    "is_read": False
+                }
+                watermark = (room.get("read_up_to") or {}).get(str(slot))
+                if watermark is not None:
+                    condition["timestamp"] = {"$gt": watermark}
+                unread[str(slot)] = await self.db.messages.count_documents(condition)
+            await self.db.chat_rooms.update_one({"_id": room["_id"]}, {"$set": {"unread": unread}})
+            room_count += 1
+
+        user_count = 0
+        async for user in self.db.users.find({"unread_total": {"$exists": False}}, {"email": 1}):
+            total = 0
+            async for room in self.db.chat_rooms.find({"participants": user["email"]}, {"participants": 1, "unread": 1}):
+                slot = str(room["participants"].index(user["email"]))
+                total += (room.get("unread") or {}).get(slot, 0)
+            await self.db.users.update_one({"_id": user["_id"]}, {"$set": {"unread_total": total}})
+            user_count += 1
+
+        if room_count or user_count:
+            self.logger.info(f"Contadores de no leídos inicializados: {room_count} salas, {user_count} usuarios")
+
     async def run_migrations(self):
         """Ejecutar todas las migraciones de base de datos"""
         self.logger.info("Iniciando migraciones de base de datos...")
@@ -135,6 +266,7 @@ class DatabaseMigration:
         results = await asyncio.gather(
             self.create_indexes(),
             self.setup_ttl_indexes(),
+            self.drop_superseded_indexes(),
             return_exceptions=True,
         )
 
@@ -142,6 +274,18 @@ class DatabaseMigration:
             if isinstance(result, Exception):
                 self.logger.error(f"Error en migracion {i}: {result}")
 
+        #el historial consulta por room_id: los mensajes antiguos deben tenerlo
+        try:
+            await self.backfill_message_room_ids()
+        except Exception as e:
+            self.logger.error(f"Error asignando room_id a mensajes: {e}")
+
+        #los contadores de no leidos se calculan por room_id
+        try:
+            await self.backfill_unread_counters()
+        except Exception as e:
+            self.logger.error(f"Error inicializando contadores de no leídos: {e}")
+
         self.logger.info("Migraciones completadas")
 
 async def run_database_migrations(db: AsyncIOMotorDatabase):
@@ -17,15 +17,31 @@ from middleware.security import (
     api_rate_limiter
 )
 from utils.logger import app_logger
+from utils.metrics import metrics
+from utils.json_codec import FastJSONResponse
 from services.refresh_token_service import refresh_token_service
+from services.pubsub import pubsub
+from services.presence import PRESENCE_CHANNEL
+from services.contact_index import contact_index, CONTACTS_CHANNEL
+from services.user_search import user_search_index, USERS_CHANNEL
+from services.message_archive import message_archiver
 import traceback
 import asyncio
+import hmac
 import os
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Manejador de ciclo de vida de la aplicación"""
     #startup
+    #el pub/sub se inicia primero: sin el no se entrega ningun evento WebSocket
+    pubsub.subscribe(chat_ws.WS_DELIVERY_CHANNEL, chat_ws.deliver_local)
+    pubsub.subscribe(CONTACTS_CHANNEL, contact_index.handle_room_created)
+    pubsub.subscribe(USERS_CHANNEL, user_search_index.handle_user_updated)
+    pubsub.subscribe(PRESENCE_CHANNEL, chat_ws.presence.handle_devices_changed)
+    await pubsub.start()
+    app_logger.info(f"Backend pub/sub '{settings.ws_pubsub_backend}' iniciado")
+
     try:
         db = await get_database()
         if db is None:
@@ -37,6 +53,9 @@ async def lifespan(app: FastAPI):
         
         #ejecutar migraciones
         await run_database_migrations(db)
+
+        #indice en memoria para /chat/users/search
+        await user_search_index.build(db)
         
         #iniciar tarea de limpieza del rate limiter
         asyncio.create_task(auth_rate_limiter.cleanup_old_entries())
@@ -56,6 +75,10 @@ async def lifespan(app: FastAPI):
         
         asyncio.create_task(cleanup_refresh_tokens())
         app_logger.info("Tarea de limpieza de refresh tokens iniciada")
+
+        if settings.message_archive_enabled:
+            message_archiver.start()
+            app_logger.info(f"Archivador de mensajes iniciado ({settings.message_archive_after_days} días)")
         
         app_logger.info("Aplicación iniciada correctamente")
     except Exception as e:
@@ -64,13 +87,19 @@ async def lifespan(app: FastAPI):
     yield
     
     #shutdown
+    await chat_ws.heartbeat.stop()
+    await message_archiver.stop()
+    #la salida del worker se publica antes de cerrar el pub/sub
+    await chat_ws.presence.stop()
+    await pubsub.stop()
     await close_database()
 
 app = FastAPI(
     title="ChatPy API",
     description="API para aplicación de chat en tiempo real",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
 #configuración de CORS - debe ser el PRIMER middleware
@@ -143,6 +172,17 @@ async def health_check():
             content={"status": "unhealthy", "error": str(e)}
         )
 
+#endpoint de metricas internas del proceso (solo con el token de metricas)
+@app.get("/metrics")
+async def get_metrics(request: Request):
+    """Metricas en memoria de este worker (contadores y resumenes)"""
+    if not settings.metrics_token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), settings.metrics_token.encode()):
+        raise HTTPException(status_code=401, detail="Token de métricas inválido")
+    return metrics.snapshot()
+
 #endpoint de desarrollo para limpiar rate limits
 @app.get("/dev/clear-ratelimits")
 async def clear_rate_limits():
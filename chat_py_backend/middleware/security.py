@@ -4,6 +4,7 @@ import time
 from collections import defaultdict, deque
 from typing import Dict, Deque
 import asyncio
+import random
 from utils.logger import app_logger
 from config.settings import settings
 
@@ -62,16 +63,122 @@ class RateLimiter:
                 app_logger.error(f"Error en limpieza de rate limiter: {str(e)}")
                 await asyncio.sleep(60)
 
+class TokenBucket:
+    """Token bucket: `rate` tokens por segundo con rafagas de hasta `capacity`"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        """Consumir tokens si hay suficientes (O(1), sin tareas de fondo)"""
+        self._refill(time.monotonic())
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True
+        return False
+
+    def retry_after(self, tokens: float = 1) -> float:
+        """Segundos hasta que haya `tokens` disponibles"""
+        self._refill(time.monotonic())
+        missing = tokens - self.tokens
+        return max(0.0, missing / self.rate) if self.rate > 0 else float("inf")
+
+class HandshakeAdmission:
+    """
+    Control de admision de handshakes WebSocket ante tormentas de reconexion.
+
+    - `max_inflight`: validaciones de token (JWT + consulta a Mongo) simultaneas
+    - token bucket: conexiones aceptadas por segundo, con rafaga `burst`
+
+    Un handshake rechazado recibe una sugerencia de reintento con jitter para
+    que los clientes no vuelvan todos en el mismo instante.
+    """
+
+    def __init__(self, max_inflight: int = None, rate: float = None, burst: int = None):
+        self.max_inflight = max_inflight or settings.ws_handshake_max_inflight
+        self.bucket = TokenBucket(
+            rate or settings.ws_handshake_rate,
+            burst or settings.ws_handshake_burst,
+        )
+        self.inflight = 0
+
+    def try_admit(self) -> bool:
+        """Reservar un hueco de validacion; llamar a `release` al terminar"""
+        if self.inflight >= self.max_inflight or not self.bucket.try_acquire():
+            return False
+        self.inflight += 1
+        return True
+
+    def release(self):
+        self.inflight = max(0, self.inflight - 1)
+
+    def retry_after_ms(self) -> int:
+        """Retraso sugerido: lo que falta para el siguiente token, con jitter completo"""
+        base_ms = max(settings.ws_handshake_retry_min_ms, self.bucket.retry_after() * 1000)
+        return int(min(settings.ws_handshake_retry_max_ms, base_ms + random.uniform(0, base_ms)))
+
+class WSFloodControl:
+    """
+    Control de flujo de frames WebSocket entrantes.
+
+    Cada frame consume un token de dos buckets de su tipo: el de la conexion
+    y el del usuario (compartido por todos sus dispositivos en este proceso).
+    Los tipos sin presupuesto propio comparten el de "other". Los buckets se
+    crean al primer frame y se eliminan con `forget` al desconectar.
+    """
+
+    def __init__(self, budgets: Dict[str, list] = None, user_factor: float = None):
+        self.budgets = budgets or settings.ws_inbound_budgets
+        self.user_factor = user_factor or settings.ws_inbound_user_factor
+        self.buckets: Dict[str, Dict[str, TokenBucket]] = {}
+
+    def _bucket(self, owner: str, frame_type: str, factor: float) -> TokenBucket:
+        owner_buckets = self.buckets.setdefault(owner, {})
+        bucket = owner_buckets.get(frame_type)
+        if bucket is None:
+            rate, burst = self.budgets.get(frame_type, self.budgets.get("other"))
+            bucket = owner_buckets[frame_type] = TokenBucket(rate * factor, burst * factor)
+        return bucket
+
+    def budget_key(self, frame_type) -> str:
+        #tipos desconocidos (o que no son str) comparten el presupuesto "other"
+        return frame_type if isinstance(frame_type, str) and frame_type in self.budgets else "other"
+
+    def is_allowed(self, connection_id: str, user_email: str, frame_type) -> bool:
+        #verificar si un frame entrante cabe en los presupuestos de conexion y usuario
+        frame_type = self.budget_key(frame_type)
+        connection_bucket = self._bucket(f"conn:{connection_id}", frame_type, 1)
+        user_bucket = self._bucket(f"user:{user_email}", frame_type, self.user_factor)
+        #el del usuario solo se consume si la conexion tenia saldo
+        return connection_bucket.try_acquire() and user_bucket.try_acquire()
+
+    def forget_connection(self, connection_id: str):
+        self.buckets.pop(f"conn:{connection_id}", None)
+
+    def forget_user(self, user_email: str):
+        self.buckets.pop(f"user:{user_email}", None)
+
+    def clear(self):
+        self.buckets.clear()
+
 #instancias globales de rate limiters
 auth_rate_limiter = RateLimiter(max_requests=10, window_seconds=60)  #10 intentos por minuto
 api_rate_limiter = RateLimiter(max_requests=1000, window_seconds=60) #1000 requests por minuto (temporal)  
-ws_rate_limiter = RateLimiter(max_requests=1000, window_seconds=60) #1000 mensajes WS por minuto
+ws_rate_limiter = WSFloodControl() #presupuestos por tipo de frame (ver settings.ws_inbound_budgets)
+ws_handshake_admission = HandshakeAdmission()
 
 def clear_rate_limits():
     """Limpiar todos los rate limiters (para desarrollo local)"""
     auth_rate_limiter.requests.clear()
     api_rate_limiter.requests.clear()
-    ws_rate_limiter.requests.clear()
+    ws_rate_limiter.clear()
     app_logger.info("Rate limiters limpiados para desarrollo local")
 
 async def rate_limit_middleware(request: Request, call_next, limiter: RateLimiter = None):
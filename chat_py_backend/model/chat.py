@@ -9,6 +9,7 @@ class Message(BaseModel):
     content: str
     timestamp: datetime
     is_read: bool = False
+    client_message_id: Optional[str] = None
 
     @field_serializer("timestamp")
     def serialize_timestamp(self, dt: datetime) -> str:
@@ -28,3 +29,21 @@ class ChatRoom(BaseModel):
         if dt.tzinfo is None:
             dt = dt.replace(tzinfo=timezone.utc)
         return dt.isoformat()
+
+class ChatRoomSummary(BaseModel):
+    #entrada de la lista de conversaciones: solo lo que necesita la vista
+    id: str
+    room_id: str
+    participants: list[str]
+    other_user_email: str
+    other_user_username: Optional[str] = None
+    other_user_avatar_url: Optional[str] = None
+    last_message: Optional[Message] = None
+    unread_count: int = 0
+    updated_at: datetime
+
+    @field_serializer("updated_at")
+    def serialize_datetime(self, dt: datetime) -> str:
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        return dt.isoformat()
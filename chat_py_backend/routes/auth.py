@@ -12,6 +12,7 @@ from schemas.user_schema import (
     UserProfileUpdate,
 )
 from database import connection as db_conn
+from services.user_search import user_search_index, search_record
 from passlib.context import CryptContext
 from utils.jwt_handler import (
     create_access_token, 
@@ -101,6 +102,12 @@ async def register(user: UserRegister, request: Request):
         auth_logger.error(f"Error al insertar usuario: {e}")
         raise HTTPException(status_code=500, detail="Error al registrar usuario")
 
+    #el usuario ya es buscable en todos los workers
+    try:
+        await user_search_index.publish_user(search_record(user_dict))
+    except Exception as e:
+        auth_logger.error(f"Error al actualizar el índice de búsqueda: {e}")
+
     #enviar correo de confirmacion
     try:
         confirmation_url = f"{settings.frontend_url}/confirm-email/{confirmation_token}"
@@ -256,6 +263,8 @@ async def update_profile(
             {"$set": update_fields},
         )
         db_user = {**db_user, **update_fields}
+        if "username" in update_fields or "email" in update_fields:
+            await user_search_index.publish_user(search_record(db_user), previous_email=current_user_email)
 
     return UserProfileResponse(
         email=db_user.get("email"),
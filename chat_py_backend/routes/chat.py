@@ -1,9 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, Request
-from typing import List
+from typing import Optional
 from services.chat_service import ChatService
-from schemas.chat_schema import MessageResponse, ChatRoomResponse, UserStatus
+from schemas.chat_schema import ChatHistoryPage, ChatRoomPage, MessageSearchPage, UserDirectoryPage, UserSearchResults, UserStatus
 from utils.cookie_auth import get_current_user_email_cookie
 from utils.logger import chat_logger
+from utils.json_codec import FastJSONResponse
+from services.user_search import user_search_index
 
 router = APIRouter()
 chat_service = ChatService()
@@ -15,31 +17,96 @@ async def get_current_user_email(request: Request):
     """
     return await get_current_user_email_cookie(request)
 
-@router.get("/chat/history/{other_user_email}", response_model=List[MessageResponse])
+@router.get("/chat/history/{other_user_email}", response_model=ChatHistoryPage)
 async def get_chat_history(
     other_user_email: str,
     limit: int = Query(50, ge=1, le=100),
+    before: Optional[str] = Query(None, description="Cursor: mensajes anteriores (scroll hacia atrás)"),
+    after: Optional[str] = Query(None, description="Cursor: mensajes posteriores"),
     current_user_email: str = Depends(get_current_user_email)
 ):
-    #obtener historial de chat con un usuario especifico
-    messages = await chat_service.get_chat_history(current_user_email, other_user_email, limit)
-    return messages
+    #obtener una pagina del historial de chat con un usuario especifico
+    if before and after:
+        raise HTTPException(status_code=400, detail="Use solo uno de 'before' o 'after'")
+    try:
+        messages, next_cursor = await chat_service.get_chat_history(
+            current_user_email, other_user_email, limit, before=before, after=after
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    #respuesta directa: el codec serializa las fechas sin pasar por la validacion del response_model
+    return FastJSONResponse({
+        "messages": [message.model_dump() for message in messages],
+        "next_cursor": next_cursor
+    })
 
-@router.get("/chat/rooms", response_model=List[ChatRoomResponse])
-async def get_user_chat_rooms(current_user_email: str = Depends(get_current_user_email)):
-    #obtener todas las salas de chat del usuario actual
-    chat_rooms = await chat_service.get_user_chat_rooms(current_user_email)
-    return chat_rooms
+@router.get("/chat/search", response_model=MessageSearchPage)
+async def search_messages(
+    q: str = Query(..., min_length=1, max_length=200, description="Palabras o \"frase exacta\" a buscar"),
+    limit: int = Query(20, ge=1, le=50),
+    offset: int = Query(0, ge=0, description="Posición en la lista de resultados (next_offset de la página anterior)"),
+    with_user: Optional[str] = Query(None, description="Limitar la búsqueda a la conversación con este usuario"),
+    current_user_email: str = Depends(get_current_user_email)
+):
+    #buscar en los mensajes de las conversaciones del usuario, ordenados por relevancia
+    try:
+        results, next_offset = await chat_service.search_messages(
+            current_user_email, q, limit, offset=offset, other_user_email=with_user
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return FastJSONResponse({
+        "results": [{**message.model_dump(), "score": score} for message, score in results],
+        "next_offset": next_offset
+    })
 
-@router.get("/chat/users", response_model=List[dict])
+@router.get("/chat/rooms", response_model=ChatRoomPage)
+async def get_user_chat_rooms(
+    limit: int = Query(50, ge=1, le=100),
+    before: Optional[str] = Query(None, description="Cursor: conversaciones anteriores (siguiente página)"),
+    include_profiles: bool = Query(False, description="Incluir nombre y avatar del otro participante"),
+    current_user_email: str = Depends(get_current_user_email)
+):
+    #obtener una pagina de las salas de chat del usuario actual
+    try:
+        chat_rooms, next_cursor = await chat_service.get_user_chat_rooms(
+            current_user_email, limit, before=before, include_profiles=include_profiles
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return FastJSONResponse({
+        "rooms": [room.model_dump() for room in chat_rooms],
+        "next_cursor": next_cursor
+    })
+
+@router.get("/chat/users", response_model=UserDirectoryPage)
 async def get_all_users(
     current_user_email: str = Depends(get_current_user_email),
     limit: int = Query(100, ge=1, le=500, description="Número máximo de usuarios"),
-    skip: int = Query(0, ge=0, description="Número de usuarios a saltar para paginación")
+    after: Optional[str] = Query(None, description="Cursor: usuarios siguientes por username")
+):
+    """Obtener una pagina del directorio de usuarios disponibles para chat (ordenado por username)"""
+    try:
+        users, next_cursor, total_estimate = await chat_service.get_all_users(
+            current_user_email, limit=limit, after=after
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return FastJSONResponse({
+        "users": users,
+        "next_cursor": next_cursor,
+        "total_estimate": total_estimate
+    })
+
+@router.get("/chat/users/search", response_model=UserSearchResults)
+async def search_users(
+    q: str = Query(..., min_length=1, max_length=100, description="Inicio del username o del email (tolera errores)"),
+    limit: int = Query(20, ge=1, le=50),
+    current_user_email: str = Depends(get_current_user_email)
 ):
-    """Obtener lista de todos los usuarios disponibles para chat (con paginación)"""
-    users = await chat_service.get_all_users(current_user_email, limit=limit, skip=skip)
-    return users
+    """Buscar usuarios mientras se escribe (indice en memoria, sin consultar la base de datos)"""
+    users = user_search_index.search(q, limit=limit, exclude_email=current_user_email)
+    return FastJSONResponse({"users": users})
 
 @router.get("/chat/unread-count")
 async def get_unread_count(current_user_email: str = Depends(get_current_user_email)):
@@ -1,14 +1,23 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query, HTTPException
 from jose import JWTError, jwt
-from typing import Dict, List, Optional
-import json
+from typing import Dict, List, Optional, Set
 import re
 import html
+import heapq
 from datetime import datetime, timezone
 from services.chat_service import ChatService
+from model.chat import Message
+from services.pubsub import WS_DELIVERY_CHANNEL, publish_to_users
+from services.presence import PresenceManager
+from services.typing_throttle import TypingThrottle
+from services.heartbeat import HeartbeatScheduler, IDLE_CLOSE_CODE
+from middleware.security import ws_handshake_admission, ws_rate_limiter
+from services.ws_connection import WSConnection, PRIORITY_HIGH, PRIORITY_LOW
 from config.settings import settings
 from utils.logger import websocket_logger
+from utils.metrics import metrics
 from utils.jwt_handler import decode_access_token
+from utils.ws_codec import MSGPACK_SUBPROTOCOL, negotiate_codec
 from database import connection as db_conn
 import traceback
 
@@ -19,10 +28,89 @@ def _ensure_utc(dt: datetime) -> datetime:
         return dt.replace(tzinfo=timezone.utc)
     return dt
 
-# Diccionario para mantener conexiones por usuario
-connected_users: Dict[str, WebSocket] = {}
+# Conexiones de cada usuario en este proceso (una por dispositivo)
+connected_users: Dict[str, Set[WSConnection]] = {}
 chat_service = ChatService()
 
+# Codigo de cierre para handshakes rechazados por sobrecarga (RFC 6455: try again later)
+OVERLOADED_CLOSE_CODE = 1013
+
+# Longitud maxima del id de mensaje generado por el cliente
+MAX_CLIENT_MESSAGE_ID_LENGTH = 64
+
+# Eventos que pueden descartarse si el cliente va atrasado
+DROPPABLE_FRAME_TYPES = {"typing", "user_status"}
+
+async def deliver_local(channel: str, message: dict):
+    """
+    Handler pub/sub: entregar un evento a las conexiones locales de este proceso.
+
+    Los usuarios conectados a otros workers se ignoran aqui; su worker recibe
+    el mismo evento y lo entrega. El frame se codifica una sola vez por codec
+    y solo se encola en cada conexion, asi que el envio a todos los
+    destinatarios ocurre en paralelo desde sus tareas escritoras.
+    """
+    recipients = message.get("to") or []
+    exclude_connection = message.get("exclude_connection")
+    frame = message.get("frame", {})
+    priority = PRIORITY_LOW if frame.get("type") in DROPPABLE_FRAME_TYPES else PRIORITY_HIGH
+    payloads = {}
+    for email in recipients:
+        for connection in connected_users.get(email, ()):
+            if connection.id == exclude_connection:
+                continue
+            codec = connection.codec
+            payload = payloads.get(codec.name)
+            if payload is None:
+                payload = payloads[codec.name] = codec.encode(frame)
+            if connection.live_backlog is not None:
+                #conexion reanudando: el evento se entrega despues de los perdidos
+                connection.live_backlog.append((frame, payload, priority))
+                continue
+            #solo encola: la tarea escritora de cada conexion hace el envio real
+            connection.send(payload, priority)
+
+# Anuncios de presencia con periodo de gracia y agrupacion de cambios
+presence = PresenceManager(publish_to_users)
+
+# Indicadores de escritura limitados y con caducidad en el servidor
+typing_throttle = TypingThrottle(publish_to_users)
+
+def unregister_connection(connection: WSConnection):
+    """Quitar una conexion del registro local y anunciar offline si era el ultimo dispositivo"""
+    #idempotente: una conexion expulsada vuelve a pasar por aqui al cerrar
+    ws_rate_limiter.forget_connection(connection.id)
+    devices = connected_users.get(connection.user_email)
+    if devices is None or connection not in devices:
+        return
+    devices.discard(connection)
+    #el usuario sigue online mientras le quede algun dispositivo
+    if not devices:
+        del connected_users[connection.user_email]
+        ws_rate_limiter.forget_user(connection.user_email)
+        # Notificar que el usuario esta offline (tras el periodo de gracia)
+        presence.user_disconnected(connection.user_email)
+
+async def enforce_device_limit(user_email: str):
+    """Cerrar la conexion mas antigua del usuario si supera el limite de dispositivos"""
+    devices = connected_users.get(user_email, set())
+    if len(devices) <= settings.ws_max_devices_per_user:
+        return
+    oldest = min(devices, key=lambda c: c.connected_at)
+    #misma limpieza que una desconexion normal (el usuario sigue online con la nueva)
+    unregister_connection(oldest)
+    websocket_logger.info(f"Límite de dispositivos alcanzado para {user_email}, cerrando la conexión más antigua")
+    await oldest.close(code=1000, reason="Nueva conexión establecida")
+
+async def evict_idle_connection(connection: WSConnection):
+    """Expulsar una conexion que no respondio al heartbeat"""
+    #se quita del registro antes de cerrar para que deje de recibir eventos
+    unregister_connection(connection)
+    await connection.close(code=IDLE_CLOSE_CODE, reason="Sin actividad")
+
+# Heartbeat de servidor: ping a conexiones inactivas y expulsion de las muertas
+heartbeat = HeartbeatScheduler(evict_idle_connection)
+
 async def validate_websocket_token(token: str) -> Optional[str]:
     """
     Validar token de WebSocket y retornar el email del usuario si es válido.
@@ -77,13 +165,49 @@ async def validate_websocket_token(token: str) -> Optional[str]:
         websocket_logger.debug(traceback.format_exc())
         return None
 
+async def reject_handshake(websocket: WebSocket):
+    """
+    Rechazar un handshake por sobrecarga con 1013 (try again later).
+
+    Se acepta y se cierra en lugar de cerrar antes de aceptar, porque en ese
+    caso el navegador solo ve un 403 sin codigo ni motivo. El motivo lleva
+    `retry_after_ms=<n>` con jitter para repartir los reintentos.
+    """
+    retry_after_ms = ws_handshake_admission.retry_after_ms()
+    metrics.incr("ws.handshake.rejected")
+    websocket_logger.warning(f"Handshake WebSocket rechazado por sobrecarga, reintento sugerido en {retry_after_ms}ms")
+    try:
+        await websocket.accept()
+        await websocket.close(code=OVERLOADED_CLOSE_CODE, reason=f"retry_after_ms={retry_after_ms}")
+    except Exception:
+        pass
+
 @router.websocket("/ws/chat")
-async def chat_endpoint(websocket: WebSocket, token: str = Query(None)):
+async def chat_endpoint(
+    websocket: WebSocket,
+    token: str = Query(None),
+    batch: bool = Query(False),
+    resume_after: Optional[str] = Query(None)
+):
     """
     Endpoint WebSocket para chat en tiempo real.
     
     Acepta token JWT por query parameter o por cookie (access_token).
     Valida el token antes de aceptar la conexión.
+
+    Si el cliente ofrece el subprotocolo `chatpy.msgpack.v1`, los frames en
+    ambos sentidos son binarios MessagePack con etiquetas cortas; si no, JSON
+    en texto. La compresion permessage-deflate la negocia el servidor ASGI
+    (uvicorn la acepta por defecto si el cliente la ofrece).
+
+    Con `batch=1` el servidor agrupa los eventos pendientes en frames
+    `{"type": "batch", "events": [...]}`. Los frames entrantes de tipo `batch`
+    (`{"type": "batch", "ops": [...]}`) se aceptan siempre.
+
+    Con `resume_after=<id de mensaje>` el servidor reenvia primero, en frames
+    batch y en orden, los mensajes y confirmaciones de lectura posteriores a
+    ese mensaje, cierra con `{"type": "resume_complete", ...}` y despues pasa
+    a la entrega en vivo.
     """
     # Si no viene en query, intentar leer de cookie (auth por httpOnly)
     if not token:
@@ -96,8 +220,17 @@ async def chat_endpoint(websocket: WebSocket, token: str = Query(None)):
         )
         return
 
+    # Control de admision: en una tormenta de reconexiones se rechaza pronto,
+    # antes de validar el token contra Mongo
+    if not ws_handshake_admission.try_admit():
+        await reject_handshake(websocket)
+        return
+
     # Validar token y obtener email del usuario
-    user_email = await validate_websocket_token(token)
+    try:
+        user_email = await validate_websocket_token(token)
+    finally:
+        ws_handshake_admission.release()
     if not user_email:
         websocket_logger.warning("Intento de conexión WebSocket con token inválido o usuario no autorizado")
         await websocket.close(
@@ -106,71 +239,234 @@ async def chat_endpoint(websocket: WebSocket, token: str = Query(None)):
         )
         return
     
-    # Verificar si el usuario ya tiene una conexion activa
-    if user_email in connected_users:
-        old_websocket = connected_users[user_email]
-        try:
-            websocket_logger.info(f"Cerrando conexión anterior para usuario {user_email}")
-            await old_websocket.close(code=1000, reason="Nueva conexión establecida")
-        except Exception as e:
-            websocket_logger.warning(f"Error al cerrar conexión anterior: {e}")
-        finally:
-            del connected_users[user_email]
-    
-    # Aceptar la conexion WebSocket
+    # Aceptar la conexion WebSocket con el codec negociado
+    codec = negotiate_codec(websocket.scope.get("subprotocols", []))
+    connection = WSConnection(
+        websocket,
+        user_email,
+        batch_window_ms=settings.ws_batch_window_ms if batch else 0,
+        codec=codec
+    )
+    if resume_after:
+        connection.live_backlog = []
     try:
-        await websocket.accept()
-        connected_users[user_email] = websocket
-        websocket_logger.info(f"Usuario {user_email} conectado vía WebSocket exitosamente")
+        await websocket.accept(subprotocol=MSGPACK_SUBPROTOCOL if codec.binary else None)
+        connection.start()
     except Exception as e:
         websocket_logger.error(f"Error al aceptar conexión WebSocket para {user_email}: {e}")
         await websocket.close(code=1011, reason="Error interno del servidor")
         return
+
+    # Cada dispositivo mantiene su propia conexion; solo se expulsa al mas
+    # antiguo si se supera el limite de dispositivos por usuario
+    devices = connected_users.setdefault(user_email, set())
+    is_first_device = not devices
+    devices.add(connection)
+    websocket_logger.info(f"Usuario {user_email} conectado vía WebSocket exitosamente ({len(devices)} dispositivos)")
+    await enforce_device_limit(user_email)
     
-    # Notificar a otros usuarios que este usuario esta online
-    await broadcast_user_status(user_email, True)
+    # Notificar a otros usuarios que este usuario esta online (solo con el primer dispositivo)
+    if is_first_device:
+        presence.user_connected(user_email)
+    heartbeat.register(connection)
+
+    if resume_after:
+        await resume_connection(connection, resume_after)
     
     try:
         while True:
-            data = await websocket.receive_text()
-            websocket_logger.debug(f"Mensaje recibido de {user_email}: {data[:100]}")
+            received = await websocket.receive()
+            if received["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(received.get("code", 1000))
+            connection.touch()
+            data = received.get("bytes") if codec.binary else received.get("text")
             try:
-                message_data = json.loads(data)
-                message_type = message_data.get("type", "message")
-                
-                if message_type == "message":
-                    await handle_private_message(user_email, message_data)
-                elif message_type == "typing":
-                    await handle_typing_indicator(user_email, message_data)
-                elif message_type == "read":
-                    await handle_read_receipt(user_email, message_data)
-                elif message_type == "ping":
-                    await websocket.send_text(json.dumps({"type": "pong"}))
-                    continue  # Solo para mantener la conexion
-                else:
-                    websocket_logger.warning(f"Tipo de mensaje desconocido: {message_type}")
-            except json.JSONDecodeError as e:
-                websocket_logger.error(f"Error al parsear JSON: {e}")
-                await websocket.send_text(json.dumps({
+                if data is None:
+                    raise ValueError("Tipo de frame no corresponde al protocolo negociado")
+                websocket_logger.debug(f"Mensaje recibido de {user_email}: {data[:100]!r}")
+                message_data = codec.decode(data)
+            except (ValueError, TypeError) as e:
+                websocket_logger.error(f"Error al decodificar frame: {e}")
+                connection.send_frame({
                     "type": "error",
                     "message": "Formato de mensaje inválido"
-                }))
+                })
+                continue
+
+            if isinstance(message_data, dict) and message_data.get("type") == "batch":
+                await handle_batch(connection, message_data)
+            else:
+                await dispatch_frame(connection, message_data)
                 
     except WebSocketDisconnect:
         websocket_logger.info(f"Usuario {user_email} desconectado")
-        if user_email in connected_users:
-            del connected_users[user_email]
-        # Notificar que el usuario esta offline
-        await broadcast_user_status(user_email, False)
     except Exception as e:
         websocket_logger.error(f"Error en WebSocket para {user_email}: {e}")
         websocket_logger.debug(traceback.format_exc())
-        if user_email in connected_users:
-            del connected_users[user_email]
-        await broadcast_user_status(user_email, False)
+    finally:
+        await connection.close()
+        unregister_connection(connection)
+
+def replay_frames(missed: dict) -> List[dict]:
+    """
+    Frames del reenvio en un unico flujo ordenado por fecha.
+
+    Un `read_receipt` marca como leidos todos los mensajes anteriores al
+    destinatario: si llegara despues de mensajes mas nuevos, el cliente los
+    marcaria como leidos. Con la misma fecha el acuse va detras del mensaje
+    (la marca de lectura lo incluye).
+    """
+    messages = (
+        (_ensure_utc(message.timestamp), 0, message_frame(message))
+        for message in missed["messages"]
+    )
+    receipts = (
+        (_ensure_utc(receipt["timestamp"]), 1, read_receipt_frame(receipt["reader_email"], receipt["timestamp"]))
+        for receipt in missed["receipts"]
+    )
+    #ambas listas ya vienen ordenadas por fecha
+    return [frame for _, _, frame in heapq.merge(messages, receipts, key=lambda event: event[:2])]
+
+async def resume_connection(connection: WSConnection, after_message_id: str):
+    """
+    Reenviar a una conexion los eventos perdidos desde su cursor y pasar a vivo.
 
-async def handle_private_message(sender_email: str, message_data: dict):
+    Los eventos en vivo que llegan mientras tanto quedan en `live_backlog` y
+    se encolan al final, omitiendo los mensajes que ya iban en el reenvio.
+    """
+    replayed_ids = set()
+    try:
+        missed = await chat_service.get_missed_events(
+            connection.user_email, after_message_id, settings.ws_resume_max_events
+        )
+        if missed is None:
+            #cursor desconocido: el cliente debe recargar el historial
+            connection.send_frame({"type": "resume_complete", "replayed": 0, "reset": True})
+        else:
+            frames = replay_frames(missed)
+            replayed_ids = {message.id for message in missed["messages"]}
+
+            #en lotes para no desbordar la cola de salida con un reenvio largo
+            codec = connection.codec
+            for start in range(0, len(frames), connection.max_batch):
+                chunk = frames[start:start + connection.max_batch]
+                connection.send(codec.join_batch([codec.encode(frame) for frame in chunk]))
+
+            connection.send_frame({
+                "type": "resume_complete",
+                "replayed": len(frames),
+                "truncated": missed["truncated"]
+            })
+            websocket_logger.info(f"Reanudación de {connection.user_email}: {len(frames)} eventos reenviados")
+    except Exception as e:
+        websocket_logger.error(f"Error al reanudar conexión de {connection.user_email}: {e}")
+        connection.send_frame({"type": "resume_complete", "replayed": 0, "reset": True})
+    finally:
+        backlog, connection.live_backlog = connection.live_backlog or [], None
+        for frame, payload, priority in backlog:
+            if frame.get("type") == "message" and frame.get("id") in replayed_ids:
+                continue
+            connection.send(payload, priority)
+
+async def dispatch_frame(connection: WSConnection, message_data: dict):
+    """Despachar una operacion del cliente a su handler segun el tipo"""
+    if not isinstance(message_data, dict):
+        connection.send_frame({
+            "type": "error",
+            "message": "Formato de mensaje inválido"
+        })
+        return
+
+    message_type = message_data.get("type", "message")
+    if not ws_rate_limiter.is_allowed(connection.id, connection.user_email, message_type):
+        reject_flooded_frame(connection, message_type)
+        return
+
+    if message_type == "message":
+        await handle_private_message(connection, message_data)
+    elif message_type == "typing":
+        await handle_typing_indicator(connection, message_data)
+    elif message_type == "read":
+        await handle_read_receipt(connection, message_data)
+    elif message_type == "ping":
+        connection.send_frame({"type": "pong"})  # Solo para mantener la conexion
+    elif message_type == "pong":
+        pass  # Respuesta al heartbeat del servidor: la actividad ya quedo registrada
+    else:
+        websocket_logger.warning(f"Tipo de mensaje desconocido: {message_type}")
+
+def reject_flooded_frame(connection: WSConnection, message_type: str):
+    """Descartar un frame que excede el presupuesto de su tipo"""
+    metrics.incr("ws.inbound.rejected")
+    metrics.incr(f"ws.inbound.rejected.{ws_rate_limiter.budget_key(message_type)}")
+    #typing es efimero: se descarta sin avisar; el resto recibe un error
+    if message_type == "typing":
+        return
+    connection.send_frame({
+        "type": "error",
+        "message": "Demasiados mensajes. Intenta más tarde.",
+        "rejected_type": ws_rate_limiter.budget_key(message_type)
+    })
+
+async def handle_batch(connection: WSConnection, message_data: dict):
+    """Procesar un sobre con varias operaciones (mensajes, lecturas, typing) en orden"""
+    ops = message_data.get("ops")
+    if not isinstance(ops, list):
+        connection.send_frame({
+            "type": "error",
+            "message": "Formato de mensaje inválido"
+        })
+        return
+
+    if len(ops) > settings.ws_max_batch_ops:
+        websocket_logger.warning(f"Lote demasiado grande de {connection.user_email}: {len(ops)} operaciones")
+        connection.send_frame({
+            "type": "error",
+            "message": f"El lote excede el límite de {settings.ws_max_batch_ops} operaciones"
+        })
+        return
+
+    for op in ops:
+        if isinstance(op, dict) and op.get("type") == "batch":
+            continue  # no se permiten lotes anidados
+        await dispatch_frame(connection, op)
+
+def message_frame(message: Message) -> dict:
+    """Frame `message` de un mensaje guardado (entrega en vivo y reenvio)"""
+    frame = {
+        "type": "message",
+        "id": message.id,
+        "sender_email": message.sender_email,
+        "receiver_email": message.receiver_email,
+        "content": message.content,
+        "timestamp": _ensure_utc(message.timestamp).isoformat(),
+        "is_read": message.is_read
+    }
+    if message.client_message_id:
+        frame["client_message_id"] = message.client_message_id
+    return frame
+
+def message_sent_frame(message: Message) -> dict:
+    """Confirmacion de guardado para el remitente"""
+    frame = {
+        "type": "message_sent",
+        "message_id": message.id,
+        "timestamp": _ensure_utc(message.timestamp).isoformat()
+    }
+    if message.client_message_id:
+        frame["client_message_id"] = message.client_message_id
+    return frame
+
+def read_receipt_frame(reader_email: str, timestamp: datetime) -> dict:
+    return {
+        "type": "read_receipt",
+        "reader_email": reader_email,
+        "timestamp": _ensure_utc(timestamp).isoformat()
+    }
+
+async def handle_private_message(connection: WSConnection, message_data: dict):
     """Manejar mensaje privado entre usuarios"""
+    sender_email = connection.user_email
     receiver_email = message_data.get("receiver_email")
     content = message_data.get("content")
     
@@ -183,12 +479,11 @@ async def handle_private_message(sender_email: str, message_data: dict):
     MAX_MESSAGE_LENGTH = 5000
     if len(content) > MAX_MESSAGE_LENGTH:
         websocket_logger.warning(f"Mensaje demasiado largo de {sender_email}: {len(content)} caracteres")
-        if sender_email in connected_users:
-            error_msg = {
-                "type": "error",
-                "message": f"El mensaje excede el límite de {MAX_MESSAGE_LENGTH} caracteres"
-            }
-            await connected_users[sender_email].send_text(json.dumps(error_msg))
+        error_msg = {
+            "type": "error",
+            "message": f"El mensaje excede el límite de {MAX_MESSAGE_LENGTH} caracteres"
+        }
+        connection.send_frame(error_msg)
         return
     
     # Sanitizar contenido: remover caracteres de control y escapar HTML
@@ -199,48 +494,52 @@ async def handle_private_message(sender_email: str, message_data: dict):
         websocket_logger.warning(f"Mensaje vacío después de sanitización de {sender_email}")
         return
     
+    # Id opcional generado por el cliente para reintentos idempotentes
+    client_message_id = message_data.get("client_message_id")
+    if client_message_id is not None and (
+        not isinstance(client_message_id, str) or not 0 < len(client_message_id) <= MAX_CLIENT_MESSAGE_ID_LENGTH
+    ):
+        connection.send_frame({
+            "type": "error",
+            "message": "client_message_id inválido"
+        })
+        return
+    
     #guardar mensaje en la base de datos
-    saved_message = await chat_service.save_message(sender_email, receiver_email, content)
+    saved_message, created = await chat_service.save_message(
+        sender_email, receiver_email, content, client_message_id=client_message_id
+    )
+    
+    #un reintento solo recibe de nuevo la confirmacion: el mensaje ya se entrego
+    if not created:
+        connection.send_frame(message_sent_frame(saved_message))
+        return
     
     #preparar mensaje para enviar
-    message_to_send = {
-        "type": "message",
-        "id": saved_message.id,
-        "sender_email": sender_email,
-        "receiver_email": receiver_email,
-        "content": content,
-        "timestamp": _ensure_utc(saved_message.timestamp).isoformat(),
-        "is_read": False
-    }
+    message_to_send = message_frame(saved_message)
     
-    #enviar al destinatario si esta en linea
-    if receiver_email in connected_users:
-        await connected_users[receiver_email].send_text(json.dumps(message_to_send))
+    #enviar al destinatario y a los demas dispositivos del remitente (en cualquier worker)
+    await publish_to_users(
+        list({receiver_email, sender_email}),
+        message_to_send,
+        exclude_connection=connection.id
+    )
     
     #enviar confirmacion al remitente
-    if sender_email in connected_users:
-        confirmation = {
-            "type": "message_sent",
-            "message_id": saved_message.id,
-            "timestamp": _ensure_utc(saved_message.timestamp).isoformat()
-        }
-        await connected_users[sender_email].send_text(json.dumps(confirmation))
+    connection.send_frame(message_sent_frame(saved_message))
 
-async def handle_typing_indicator(sender_email: str, message_data: dict):
+async def handle_typing_indicator(connection: WSConnection, message_data: dict):
     #manejar indicador de escritura
+    sender_email = connection.user_email
     receiver_email = message_data.get("receiver_email")
     is_typing = message_data.get("is_typing", False)
     
-    if receiver_email and receiver_email in connected_users:
-        typing_data = {
-            "type": "typing",
-            "sender_email": sender_email,
-            "is_typing": is_typing
-        }
-        await connected_users[receiver_email].send_text(json.dumps(typing_data))
+    if receiver_email and receiver_email != sender_email:
+        await typing_throttle.handle(sender_email, receiver_email, bool(is_typing))
 
-async def handle_read_receipt(user_email: str, message_data: dict):
+async def handle_read_receipt(connection: WSConnection, message_data: dict):
     #manejar confirmacion de lectura
+    user_email = connection.user_email
     sender_email = message_data.get("sender_email")
     
     if sender_email:
@@ -248,29 +547,5 @@ async def handle_read_receipt(user_email: str, message_data: dict):
         await chat_service.mark_messages_as_read(sender_email, user_email)
         
         #notificar al remitente
-        if sender_email in connected_users:
-            read_data = {
-                "type": "read_receipt",
-                "reader_email": user_email,
-                "timestamp": datetime.now(timezone.utc).isoformat()
-            }
-            await connected_users[sender_email].send_text(json.dumps(read_data))
-
-async def broadcast_user_status(user_email: str, is_online: bool):
-    #notificar a todos los usuarios conectados sobre el estado de un usuario
-    status_data = {
-        "type": "user_status",
-        "user_email": user_email,
-        "is_online": is_online,
-        "timestamp": datetime.now(timezone.utc).isoformat()
-    }
-    
-    for email, websocket in list(connected_users.items()):
-        if email != user_email:  #no enviar a mismo usuario
-            try:
-                await websocket.send_text(json.dumps(status_data))
-            except Exception as e:
-                websocket_logger.error(f"Error al transmitir el estado a {email}: {e}")
-                # Si hay error, remover la conexion
-                if email in connected_users:
-                    del connected_users[email]
+        read_data = read_receipt_frame(user_email, datetime.now(timezone.utc))
+        await publish_to_users([sender_email], read_data)
@@ -6,6 +6,7 @@ from database import connection as db_conn
 from utils.cookie_auth import get_current_user_email_cookie
 from config.settings import settings
 from utils.logger import auth_logger
+from services.user_search import user_search_index, search_record
 
 router = APIRouter()
 
@@ -52,6 +53,7 @@ async def upload_avatar(
         {"email": current_user_email},
         {"$set": {"avatar_url": avatar_url}},
     )
+    await user_search_index.publish_user(search_record({**user, "avatar_url": avatar_url}))
 
     auth_logger.info(f"Avatar actualizado para {current_user_email}: {avatar_url}")
     return {"avatar_url": avatar_url}
@@ -75,6 +77,7 @@ async def delete_avatar(
         {"email": current_user_email},
         {"$set": {"avatar_url": None}},
     )
+    await user_search_index.publish_user(search_record({**user, "avatar_url": None}))
 
     auth_logger.info(f"Avatar eliminado para {current_user_email}")
     return {"avatar_url": None}
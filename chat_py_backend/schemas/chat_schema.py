@@ -14,13 +14,46 @@ class MessageResponse(BaseModel):
     timestamp: datetime
     is_read: bool
 
+class ChatHistoryPage(BaseModel):
+    messages: List[MessageResponse]
+    next_cursor: Optional[str] = None
+
+class MessageSearchResult(MessageResponse):
+    score: float
+
+class MessageSearchPage(BaseModel):
+    results: List[MessageSearchResult]
+    next_offset: Optional[int] = None
+
 class ChatRoomResponse(BaseModel):
     id: str
+    room_id: str
     participants: List[str]
+    other_user_email: str
+    other_user_username: Optional[str] = None
+    other_user_avatar_url: Optional[str] = None
     last_message: Optional[MessageResponse] = None
-    created_at: datetime
+    unread_count: int = 0
     updated_at: datetime
 
+class ChatRoomPage(BaseModel):
+    rooms: List[ChatRoomResponse]
+    next_cursor: Optional[str] = None
+
+class DirectoryUser(BaseModel):
+    id: str
+    email: str
+    username: Optional[str] = None
+    avatar_url: Optional[str] = None
+
+class UserDirectoryPage(BaseModel):
+    users: List[DirectoryUser]
+    next_cursor: Optional[str] = None
+    total_estimate: int
+
+class UserSearchResults(BaseModel):
+    users: List[DirectoryUser]
+
 class UserStatus(BaseModel):
     email: str
     is_online: bool
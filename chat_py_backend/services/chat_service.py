@@ -1,10 +1,46 @@
-from database.connection import get_database
-from model.chat import Message, ChatRoom
+from database.connection import get_database, get_client
+from model.chat import Message, ChatRoomSummary
 from datetime import datetime, timezone
-from typing import List, Optional
+from typing import List, Optional, Tuple
+import asyncio
 from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 from utils.jwt_handler import decode_access_token
 from utils.logger import chat_logger
+from utils.cursor import encode_cursor, decode_cursor, encode_key_cursor, decode_key_cursor, keyset_filter
+from services.contact_index import contact_index
+from services.message_writer import message_writer, upsert_room, applied_unread
+from services.unread import publish_unread_update
+from services.message_archive import message_archive, archive_key
+from config.settings import settings
+
+def room_key(user1_email: str, user2_email: str) -> Tuple[str, List[str]]:
+    """room_id canonico y participantes ordenados de la conversacion entre dos usuarios"""
+    participants = sorted([user1_email, user2_email])
+    return f"{participants[0]}_{participants[1]}", participants
+
+def read_watermark(room: Optional[dict], reader_email: str) -> Optional[datetime]:
+    """
+    Marca de lectura de `reader_email` en la sala: todos los mensajes recibidos
+    con timestamp menor o igual estan leidos.
+
+    Se guarda en `read_up_to` indexada por la posicion del participante en
+    `participants` ("0"/"1"), porque los emails contienen puntos y no pueden
+    usarse como nombre de campo en una actualizacion.
+    """
+    if not room or reader_email not in room.get("participants", []):
+        return None
+    slot = str(room["participants"].index(reader_email))
+    return (room.get("read_up_to") or {}).get(slot)
+
+def is_message_read(message: dict, room: Optional[dict]) -> bool:
+    #los mensajes antiguos pueden tener is_read=True de cuando se marcaban uno a uno
+    if message.get("is_read"):
+        return True
+    watermark = read_watermark(room, message["receiver_email"])
+    return watermark is not None and message["timestamp"] <= watermark
 
 class ChatService:
     async def _get_db(self):
@@ -13,126 +49,539 @@ class ChatService:
             raise RuntimeError("Base de datos no inicializada. Verifique la conexión.")
         return db
 
-    async def save_message(self, sender_email: str, receiver_email: str, content: str) -> Message:
+    async def save_message(
+        self,
+        sender_email: str,
+        receiver_email: str,
+        content: str,
+        client_message_id: Optional[str] = None
+    ) -> Tuple[Message, bool]:
+        """
+        Guardar un mensaje. Retorna (mensaje, creado).
+
+        Con `client_message_id` el envio es idempotente: si el remitente ya
+        guardo un mensaje con ese id (reintento tras perder la confirmacion),
+        se retorna el original con creado=False y no se inserta otro.
+        """
         db = await self._get_db()
+        room_id, _ = room_key(sender_email, receiver_email)
         message_data = {
+            "room_id": room_id,
             "sender_email": sender_email,
             "receiver_email": receiver_email,
             "content": content,
             "timestamp": datetime.now(timezone.utc),
             "is_read": False
         }
+        if client_message_id:
+            message_data["client_message_id"] = client_message_id
+
+        try:
+            if settings.message_group_commit:
+                #el buffer escribe mensaje y sala en lote y retorna cuando el lote es persistido
+                message_id = await message_writer.write(message_data)
+                message_data["id"] = str(message_id)
+                return Message(**message_data), True
+
+            await self._commit_message(db, message_data)
+        except DuplicateKeyError:
+            if not client_message_id:
+                raise
+            existing = await db.messages.find_one(
+                {"sender_email": sender_email, "client_message_id": client_message_id}
+            )
+            if existing is None:
+                raise
+            chat_logger.info(f"Reintento de mensaje {client_message_id} de {sender_email}, se retorna el original")
+            existing["id"] = str(existing["_id"])
+            return Message(**existing), False
+
+        message_data["id"] = str(message_data["_id"])
+        return Message(**message_data), True
+
+    async def _commit_message(self, db, message_data: dict):
+        """
+        Insertar el mensaje y actualizar su sala segun `settings.message_commit_mode`.
+
+        - sequential: insercion y despues upsert de la sala (2 round-trips)
+        - pipelined: ambas operaciones en paralelo (1 round-trip de latencia);
+          si la insercion falla (tambien por un reintento con client_message_id)
+          se revierten los incrementos de no leidos, pero la sala puede quedar
+          apuntando a un mensaje que no existe hasta el siguiente mensaje
+        - transaction: ambas en una transaccion (atomico; requiere replica set)
+
+        Junto con la sala se incrementan los contadores de no leidos del
+        receptor (en la sala y su total) y se le notifican con `unread_update`.
+        La sala solo cuenta el mensaje si es posterior a la marca de lectura
+        del receptor; si una lectura ya lo cubria, el total se corrige.
+        """
+        message_data.setdefault("_id", ObjectId())
+        sender_email = message_data["sender_email"]
+        receiver_email = message_data["receiver_email"]
+        participants = sorted([sender_email, receiver_email])
+        last_message = {**message_data, "id": str(message_data["_id"])}
+        #los mensajes a uno mismo no cuentan como no leidos
+        counts_unread = sender_email != receiver_email
+        slot = str(participants.index(receiver_email))
+        timestamps = [message_data["timestamp"]]
+        increments = {slot: timestamps} if counts_unread else None
+        now = datetime.now(timezone.utc)
+        mode = settings.message_commit_mode
+
+        total = 0
+        if mode == "transaction":
+            async with await get_client().start_session() as session:
+                async with session.start_transaction():
+                    await db.messages.insert_one(message_data, session=session)
+                    room_before = await upsert_room(
+                        db, participants, last_message, now, increments, session=session
+                    )
+                    applied = counts_unread and applied_unread(room_before, slot, timestamps) > 0
+                    if applied:
+                        total = await self._increment_unread_total(db, receiver_email, 1, session=session)
+        else:
+            def room_writes():
+                writes = [upsert_room(db, participants, last_message, now, increments)]
+                if counts_unread:
+                    writes.append(self._increment_unread_total(db, receiver_email, 1))
+                return writes
+
+            if mode == "pipelined":
+                inserted, *results = await asyncio.gather(
+                    db.messages.insert_one(message_data), *room_writes(), return_exceptions=True
+                )
+                if isinstance(inserted, BaseException):
+                    #p.ej. reintento con client_message_id: el mensaje no existe, no cuenta como no leido
+                    if counts_unread:
+                        await self._undo_unread_increment(db, participants, slot, timestamps, receiver_email, results)
+                    raise inserted
+                for result in results:
+                    if isinstance(result, BaseException):
+                        raise result
+            else:
+                await db.messages.insert_one(message_data)
+                results = await asyncio.gather(*room_writes())
+            room_before = results[0]
+            applied = counts_unread and applied_unread(room_before, slot, timestamps) > 0
+            if counts_unread:
+                total = results[1]
+                if not applied:
+                    #una lectura ya cubria el mensaje: la sala no lo conto y el total tampoco debe
+                    total = await self._increment_unread_total(db, receiver_email, -1)
+
+        if room_before is None:
+            await contact_index.register_room(participants[0], participants[1])
+
+        if applied:
+            count = ((room_before or {}).get("unread") or {}).get(slot, 0) + 1
+            try:
+                await publish_unread_update(receiver_email, sender_email, count, total)
+            except Exception as e:
+                #el mensaje ya esta guardado: un fallo al notificar no debe fallar el envio
+                chat_logger.error(f"Error al publicar contadores de no leídos: {e}")
+
+    async def _undo_unread_increment(
+        self,
+        db,
+        participants: List[str],
+        slot: str,
+        timestamps: List[datetime],
+        receiver_email: str,
+        results: list
+    ):
+        """Revertir los incrementos de no leidos que se aplicaron en paralelo a una insercion fallida"""
+        room_result, total_result = results
+        if not isinstance(room_result, BaseException) and applied_unread(room_result, slot, timestamps):
+            room_id, _ = room_key(*participants)
+            await db.chat_rooms.update_one({"room_id": room_id}, {"$inc": {f"unread.{slot}": -1}})
+        if not isinstance(total_result, BaseException):
+            await self._increment_unread_total(db, receiver_email, -1)
+
+    async def _increment_unread_total(self, db, user_email: str, delta: int, session=None) -> int:
+        """Sumar `delta` al total de no leidos del usuario y retornar el nuevo total"""
+        user = await db.users.find_one_and_update(
+            {"email": user_email},
+            {"$inc": {"unread_total": delta}},
+            projection={"unread_total": 1},
+            return_document=ReturnDocument.AFTER,
+            session=session
+        )
+        return (user or {}).get("unread_total", 0)
+
+    async def get_chat_history(
+        self,
+        user1_email: str,
+        user2_email: str,
+        limit: int = 50,
+        before: Optional[str] = None,
+        after: Optional[str] = None
+    ) -> Tuple[List[Message], Optional[str]]:
+        """
+        Pagina del historial entre dos usuarios, en orden cronologico.
+
+        Paginacion por clave sobre `(timestamp, _id)`: cada pagina cuesta
+        O(limit) sin importar lo antiguo del cursor. Cuando la pagina cruza
+        la frontera con los mensajes archivados se completa con los segmentos
+        del archivo frio (services/message_archive), con los mismos cursores.
+
+        - sin cursor: los `limit` mensajes mas recientes
+        - `before`: los `limit` mensajes anteriores al cursor (scroll hacia atras)
+        - `after`: los `limit` mensajes posteriores al cursor
+
+        Returns:
+            (mensajes, next_cursor). Con `after`, next_cursor apunta al ultimo
+            mensaje devuelto (o al mismo cursor si no hay nuevos); en los demas
+            casos apunta al mas antiguo y es None si no quedan anteriores.
+
+        Raises:
+            ValueError: si el cursor no es valido
+        """
+        db = await self._get_db()
+        room_id, _ = room_key(user1_email, user2_email)
+        direction = 1 if after else -1
+
+        #un solo rango de idx_messages_room, ya ordenado por (timestamp, _id)
+        query = {"room_id": room_id}
+        cold_cursor = None
+        if after or before:
+            key, object_id = decode_cursor(after or before, datetime)
+            query.update(keyset_filter("timestamp", key, object_id, direction))
+            cold_cursor = archive_key(key, object_id)
+
+        room = await db.chat_rooms.find_one({"room_id": room_id}, {"participants": 1, "read_up_to": 1})
+
+        #los mensajes archivados son anteriores a todos los de la coleccion:
+        #hacia delante se lee primero el archivo, hacia atras se completa con el
+        archived = settings.message_archive_enabled
+        docs = []
+        if archived and direction == 1:
+            docs = await asyncio.to_thread(message_archive.read_page, room_id, limit + 1, cold_cursor, 1)
+        if len(docs) <= limit:
+            cursor = db.messages.find(query).sort([("timestamp", direction), ("_id", direction)]).limit(limit + 1 - len(docs))
+            docs += await cursor.to_list(length=limit + 1 - len(docs))
+        if archived and direction == -1 and len(docs) <= limit:
+            docs += await asyncio.to_thread(message_archive.read_page, room_id, limit + 1 - len(docs), cold_cursor, -1)
+        has_more = len(docs) > limit
+        del docs[limit:]
+        if direction == -1:
+            docs.reverse()
+
+        messages = []
+        for doc in docs:
+            doc["id"] = str(doc["_id"])
+            doc["is_read"] = is_message_read(doc, room)
+            messages.append(Message(**doc))
+
+        if after:
+            next_cursor = encode_cursor(docs[-1]["timestamp"], docs[-1]["_id"]) if docs else after
+        elif has_more:
+            next_cursor = encode_cursor(docs[0]["timestamp"], docs[0]["_id"])
+        else:
+            next_cursor = None
+
+        return messages, next_cursor
+
+    async def search_messages(
+        self,
+        user_email: str,
+        text: str,
+        limit: int = 20,
+        offset: int = 0,
+        other_user_email: Optional[str] = None
+    ) -> Tuple[List[Tuple[Message, float]], Optional[int]]:
+        """
+        Buscar mensajes por texto en las conversaciones del usuario.
+
+        Usa idx_messages_text (indice invertido de `content`); el filtro por
+        usuario se resuelve con los emails que el indice guarda como sufijo,
+        sin leer los mensajes de otras conversaciones. Con `other_user_email`
+        se limita a esa conversacion.
+
+        Los resultados se ordenan por relevancia (textScore) y despues por
+        fecha. Mongo calcula la relevancia de todas las coincidencias antes de
+        ordenar, asi que la pagina se elige por desplazamiento, hasta
+        `settings.message_search_max_results`.
+
+        Returns:
+            ([(mensaje, puntuacion)], next_offset). next_offset es None si no hay mas.
 
-        result = await db.messages.insert_one(message_data)
-        message_data["id"] = str(result.inserted_id)
+        Raises:
+            ValueError: si la busqueda esta vacia
+        """
+        text = text.strip()
+        if not text:
+            raise ValueError("La búsqueda no puede estar vacía")
+        db = await self._get_db()
+
+        limit = max(0, min(limit, settings.message_search_max_results - offset))
+        if limit == 0:
+            return [], None
+
+        query = {"$text": {"$search": text}}
+        if other_user_email:
+            query["room_id"] = room_key(user_email, other_user_email)[0]
+        else:
+            query["$or"] = [{"sender_email": user_email}, {"receiver_email": user_email}]
+
+        score = {"$meta": "textScore"}
+        cursor = db.messages.find(query, {"score": score, "_id": 1, "room_id": 1, "sender_email": 1,
+                                          "receiver_email": 1, "content": 1, "timestamp": 1, "is_read": 1}
+        ).sort([("score", score), ("timestamp", -1)]).skip(offset).limit(limit + 1)
+        docs = await cursor.to_list(length=limit + 1)
+        has_more = len(docs) > limit
+        del docs[limit:]
+
+        #una lectura de las salas implicadas para derivar is_read de sus marcas
+        room_ids = list({doc["room_id"] for doc in docs if doc.get("room_id")})
+        rooms = {}
+        if room_ids:
+            async for room in db.chat_rooms.find({"room_id": {"$in": room_ids}}, {"room_id": 1, "participants": 1, "read_up_to": 1}):
+                rooms[room["room_id"]] = room
 
-        await self._update_chat_room(sender_email, receiver_email, message_data)
+        results = []
+        for doc in docs:
+            doc["id"] = str(doc.pop("_id"))
+            doc["is_read"] = is_message_read(doc, rooms.get(doc.get("room_id")))
+            results.append((Message(**doc), doc.get("score", 0.0)))
 
-        return Message(**message_data)
+        return results, offset + len(docs) if has_more else None
 
-    async def get_chat_history(self, user1_email: str, user2_email: str, limit: int = 50) -> List[Message]:
+    async def get_missed_events(self, user_email: str, after_message_id: str, limit: int = 1000) -> Optional[dict]:
+        """
+        Mensajes y confirmaciones de lectura posteriores a un mensaje ya visto.
+
+        El cursor es el id del ultimo mensaje que recibio el cliente; se
+        continua en orden (timestamp, _id). Retorna None si el cursor no es un
+        mensaje del usuario, en cuyo caso el cliente debe recargar el historial.
+
+        Returns:
+            {"messages": [Message], "receipts": [{"reader_email", "timestamp"}], "truncated": bool}
+        """
         db = await self._get_db()
+        try:
+            anchor_id = ObjectId(after_message_id)
+        except (InvalidId, TypeError):
+            return None
+
+        involves_user = {"$or": [{"sender_email": user_email}, {"receiver_email": user_email}]}
+        anchor = await db.messages.find_one({"_id": anchor_id, **involves_user}, {"timestamp": 1})
+        if not anchor:
+            return None
+        since = anchor["timestamp"]
+
         query = {
-            "$or": [
-                {"sender_email": user1_email, "receiver_email": user2_email},
-                {"sender_email": user2_email, "receiver_email": user1_email}
+            "$and": [
+                involves_user,
+                {"$or": [
+                    {"timestamp": {"$gt": since}},
+                    {"timestamp": since, "_id": {"$gt": anchor_id}}
+                ]}
             ]
         }
+        cursor = db.messages.find(query).sort([("timestamp", 1), ("_id", 1)]).limit(limit + 1)
+        docs = await cursor.to_list(length=limit + 1)
+        truncated = len(docs) > limit
+        docs = docs[:limit]
 
-        cursor = db.messages.find(query).sort("timestamp", -1).limit(limit)
-        messages = []
+        rooms = {}
+        async for room in db.chat_rooms.find({"participants": user_email}, {"room_id": 1, "participants": 1, "read_up_to": 1}):
+            rooms[room["room_id"]] = room
 
-        async for doc in cursor:
+        messages = []
+        for doc in docs:
             doc["id"] = str(doc["_id"])
+            doc["is_read"] = is_message_read(doc, rooms.get(room_key(doc["sender_email"], doc["receiver_email"])[0]))
             messages.append(Message(**doc))
 
-        return list(reversed(messages))
+        #lecturas del otro participante posteriores al cursor
+        receipts = []
+        for room in rooms.values():
+            other = next((p for p in room["participants"] if p != user_email), None)
+            watermark = read_watermark(room, other) if other else None
+            if watermark is not None and watermark > since:
+                receipts.append({"reader_email": other, "timestamp": watermark})
+        receipts.sort(key=lambda r: r["timestamp"])
+
+        return {"messages": messages, "receipts": receipts, "truncated": truncated}
+
+    async def get_user_chat_rooms(
+        self,
+        user_email: str,
+        limit: int = 50,
+        before: Optional[str] = None,
+        include_profiles: bool = False
+    ) -> Tuple[List[ChatRoomSummary], Optional[str]]:
+        """
+        Pagina de conversaciones del usuario, de la mas reciente a la mas antigua.
+
+        Una sola agregacion por pagina: rango de idx_chatrooms_participant_recent
+        en orden `(updated_at, _id)` desde el cursor `before`, proyeccion con
+        solo los campos de la lista y, con `include_profiles`, el nombre y
+        avatar del otro participante mediante `$lookup` (por email indexado).
+
+        Returns:
+            (salas, next_cursor). next_cursor es None si no quedan mas salas.
 
-    async def get_user_chat_rooms(self, user_email: str) -> List[ChatRoom]:
+        Raises:
+            ValueError: si el cursor no es valido
+        """
         db = await self._get_db()
-        query = {"participants": user_email}
-        cursor = db.chat_rooms.find(query).sort("updated_at", -1)
+        match = {"participants": user_email}
+        if before:
+            key, object_id = decode_cursor(before, datetime)
+            match.update(keyset_filter("updated_at", key, object_id, -1))
+
+        pipeline = [
+            {"$match": match},
+            {"$sort": {"updated_at": -1, "_id": -1}},
+            {"$limit": limit + 1},
+            {"$project": {
+                "room_id": 1,
+                "participants": 1,
+                "updated_at": 1,
+                "read_up_to": 1,
+                "unread": 1,
+                "last_message._id": 1,
+                "last_message.id": 1,
+                "last_message.sender_email": 1,
+                "last_message.receiver_email": 1,
+                "last_message.content": 1,
+                "last_message.timestamp": 1,
+                "last_message.is_read": 1
+            }}
+        ]
+        if include_profiles:
+            #el otro participante; en la conversacion con uno mismo no hay perfil que buscar
+            pipeline.append({"$lookup": {
+                "from": "users",
+                "let": {"other": {"$arrayElemAt": [{"$setDifference": ["$participants", [user_email]]}, 0]}},
+                "pipeline": [
+                    {"$match": {"$expr": {"$eq": ["$email", "$$other"]}}},
+                    {"$project": {"_id": 0, "username": 1, "avatar_url": 1}}
+                ],
+                "as": "other_user"
+            }})
+
+        docs = await db.chat_rooms.aggregate(pipeline).to_list(length=limit + 1)
+        has_more = len(docs) > limit
+        del docs[limit:]
 
         chat_rooms = []
-        async for doc in cursor:
-            doc["id"] = str(doc["_id"])
-            if doc.get("last_message"):
-                last_msg = doc["last_message"]
-                if "_id" in last_msg:
-                    last_msg["id"] = str(last_msg.pop("_id"))
-                elif "id" not in last_msg:
-                    last_msg["id"] = ""
-            chat_rooms.append(ChatRoom(**doc))
+        for doc in docs:
+            participants = doc.get("participants", [])
+            others = [email for email in participants if email != user_email]
+            slot = str(participants.index(user_email)) if user_email in participants else None
+            profile = (doc.get("other_user") or [{}])[0]
+
+            last_message = doc.get("last_message")
+            if last_message:
+                if "_id" in last_message:
+                    last_message["id"] = str(last_message.pop("_id"))
+                elif "id" not in last_message:
+                    last_message["id"] = ""
+                if "receiver_email" in last_message and "timestamp" in last_message:
+                    last_message["is_read"] = is_message_read(last_message, doc)
+
+            chat_rooms.append(ChatRoomSummary(
+                id=str(doc["_id"]),
+                room_id=doc.get("room_id", ""),
+                participants=participants,
+                other_user_email=others[0] if others else user_email,
+                other_user_username=profile.get("username"),
+                other_user_avatar_url=profile.get("avatar_url"),
+                last_message=last_message or None,
+                unread_count=max(0, (doc.get("unread") or {}).get(slot, 0)),
+                updated_at=doc["updated_at"]
+            ))
 
-        return chat_rooms
+        next_cursor = encode_cursor(docs[-1]["updated_at"], docs[-1]["_id"]) if has_more else None
+        return chat_rooms, next_cursor
 
     async def mark_messages_as_read(self, sender_email: str, receiver_email: str):
+        """
+        Marcar como leida la conversacion de `sender_email` hacia `receiver_email`.
+
+        Una sola escritura sobre la sala: se avanza la marca de lectura del
+        receptor hasta ahora y se pone a cero su contador de no leidos, sin
+        tocar los documentos de mensajes. Si habia no leidos se descuentan de
+        su total y se notifica a sus dispositivos.
+        """
         db = await self._get_db()
-        query = {
-            "sender_email": sender_email,
-            "receiver_email": receiver_email,
-            "is_read": False
-        }
+        room_id, participants = room_key(sender_email, receiver_email)
+        slot = str(participants.index(receiver_email))
 
-        await db.messages.update_many(
-            query,
-            {"$set": {"is_read": True}}
+        #$max: una confirmacion atrasada nunca retrocede la marca
+        room_before = await db.chat_rooms.find_one_and_update(
+            {"room_id": room_id},
+            {
+                "$max": {f"read_up_to.{slot}": datetime.now(timezone.utc)},
+                "$set": {f"unread.{slot}": 0}
+            },
+            projection={"unread": 1},
+            return_document=ReturnDocument.BEFORE
         )
+        cleared = ((room_before or {}).get("unread") or {}).get(slot, 0)
+        if cleared:
+            total = await self._increment_unread_total(db, receiver_email, -cleared)
+            await publish_unread_update(receiver_email, sender_email, 0, total)
 
     async def get_unread_count(self, user_email: str) -> int:
+        """Total de mensajes no leidos del usuario (contador materializado, O(1))"""
         db = await self._get_db()
-        query = {
-            "receiver_email": user_email,
-            "is_read": False
-        }
+        user = await db.users.find_one({"email": user_email}, {"unread_total": 1})
+        return max(0, (user or {}).get("unread_total", 0))
 
-        return await db.messages.count_documents(query)
+    async def get_all_users(
+        self,
+        current_user_email: str,
+        limit: int = 100,
+        after: Optional[str] = None
+    ) -> Tuple[List[dict], Optional[str], int]:
+        """
+        Pagina del directorio de usuarios ordenada por username.
 
-    async def _update_chat_room(self, user1_email: str, user2_email: str, last_message: dict):
-        db = await self._get_db()
-        participants = sorted([user1_email, user2_email])
-        room_id = f"{participants[0]}_{participants[1]}"
+        Paginacion por clave sobre `username`: es unico, asi que no necesita
+        desempate por `_id` y el rango y el orden salen directamente de
+        idx_users_username (sin SORT en memoria). Proyeccion explicita: nunca
+        salen password, tokens ni telefono.
 
-        chat_room_data = {
-            "room_id": room_id,
-            "participants": participants,
-            "last_message": last_message,
-            "updated_at": datetime.now(timezone.utc)
-        }
-
-        existing_room = await db.chat_rooms.find_one({"room_id": room_id})
-
-        if existing_room:
-            await db.chat_rooms.update_one(
-                {"room_id": room_id},
-                {
-                    "$set": {
-                        "last_message": last_message,
-                        "updated_at": datetime.now(timezone.utc)
-                    }
-                }
-            )
-        else:
-            chat_room_data["created_at"] = datetime.now(timezone.utc)
-            await db.chat_rooms.insert_one(chat_room_data)
+        Returns:
+            (usuarios, next_cursor, total_estimate). total_estimate sale de los
+            metadatos de la coleccion (estimated_document_count), sin recorrerla.
 
-    async def get_all_users(self, current_user_email: str, limit: int = 100, skip: int = 0) -> list:
+        Raises:
+            ValueError: si el cursor no es valido
+        """
         db = await self._get_db()
         if limit > 500:
-            limit = 500
             chat_logger.warning(f"Límite de usuarios ajustado a 500 (solicitado: {limit})")
+            limit = 500
+
+        query = {"email": {"$ne": current_user_email}}
+        if after:
+            query["username"] = {"$gt": decode_key_cursor(after, str)}
 
         cursor = db.users.find(
-            {"email": {"$ne": current_user_email}},
-            {"password": 0}
-        ).skip(skip).limit(limit)
+            query,
+            {"email": 1, "username": 1, "avatar_url": 1}
+        ).sort([("username", 1)]).limit(limit + 1)
+        docs = await cursor.to_list(length=limit + 1)
+        has_more = len(docs) > limit
+        del docs[limit:]
 
         users = []
-        async for doc in cursor:
-            doc["id"] = str(doc.get("_id", ""))
-            doc.pop("_id", None)
-            users.append(doc)
-        return users
+        for doc in docs:
+            users.append({
+                "id": str(doc["_id"]),
+                "email": doc["email"],
+                "username": doc.get("username"),
+                "avatar_url": doc.get("avatar_url")
+            })
+
+        next_cursor = encode_key_cursor(docs[-1]["username"]) if has_more else None
+        #el usuario actual no aparece en el directorio
+        total_estimate = max(0, await db.users.estimated_document_count() - 1)
+        return users, next_cursor, total_estimate
 
     @staticmethod
     async def get_user_email_from_token(token: str):
@@ -0,0 +1,79 @@
+from typing import Dict, Set
+from database.connection import get_database
+from services.pubsub import pubsub
+from utils.logger import chat_logger
+
+# Canal pub/sub para propagar salas nuevas al indice de todos los workers
+CONTACTS_CHANNEL = "contacts:room_created"
+
+class ContactIndex:
+    """
+    Indice en memoria de contactos: usuarios que comparten un documento de
+    chat_rooms con cada usuario.
+
+    Los contactos de un usuario se cargan de la base de datos la primera vez que
+    se necesitan y a partir de ahi se mantienen al dia con cada sala creada.
+    """
+
+    def __init__(self):
+        self._contacts: Dict[str, Set[str]] = {}
+        #usuarios con cargas en curso: cuantas y los contactos de salas creadas mientras tanto
+        self._loads: Dict[str, int] = {}
+        self._pending: Dict[str, Set[str]] = {}
+
+    async def get_contacts(self, user_email: str) -> Set[str]:
+        """Obtener los contactos de un usuario (cargandolos si no estan en cache)"""
+        contacts = self._contacts.get(user_email)
+        if contacts is not None:
+            return contacts
+
+        self._loads[user_email] = self._loads.get(user_email, 0) + 1
+        self._pending.setdefault(user_email, set())
+        try:
+            db = await get_database()
+            contacts = set()
+            cursor = db.chat_rooms.find({"participants": user_email}, {"participants": 1, "_id": 0})
+            async for doc in cursor:
+                contacts.update(doc.get("participants", []))
+            contacts.discard(user_email)
+
+            #la consulta pudo no ver las salas creadas mientras se ejecutaba
+            contacts.update(self._pending[user_email])
+            cached = self._contacts.get(user_email)
+            if cached is not None:
+                #otra carga simultanea del mismo usuario termino antes
+                cached.update(contacts)
+                return cached
+            self._contacts[user_email] = contacts
+            chat_logger.debug(f"Contactos cargados para {user_email}: {len(contacts)}")
+            return contacts
+        finally:
+            self._loads[user_email] -= 1
+            if not self._loads[user_email]:
+                del self._loads[user_email]
+                del self._pending[user_email]
+
+    def add_room(self, user1_email: str, user2_email: str):
+        """Registrar una sala nueva en los usuarios en cache o cuyos contactos se estan cargando"""
+        for user_email, other_email in ((user1_email, user2_email), (user2_email, user1_email)):
+            if user_email in self._contacts:
+                self._contacts[user_email].add(other_email)
+            if user_email in self._pending:
+                self._pending[user_email].add(other_email)
+
+    def forget(self, user_email: str):
+        """Descartar la cache de un usuario (se recarga bajo demanda)"""
+        self._contacts.pop(user_email, None)
+
+    async def register_room(self, user1_email: str, user2_email: str):
+        """Propagar una sala recien creada al indice de todos los workers"""
+        await pubsub.publish(CONTACTS_CHANNEL, {"participants": [user1_email, user2_email]})
+
+    async def handle_room_created(self, channel: str, message: dict):
+        #handler pub/sub del canal de contactos
+        participants = message.get("participants") or []
+        if len(participants) == 2:
+            self.add_room(participants[0], participants[1])
+
+#instancia global del indice
+contact_index = ContactIndex()
@@ -0,0 +1,113 @@
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Awaitable, Callable, List, Optional, Tuple
+from config.settings import settings
+from services.ws_connection import WSConnection, PRIORITY_HIGH
+from utils.logger import websocket_logger
+from utils.metrics import metrics
+
+#codigo de cierre para conexiones que no responden al heartbeat (RFC 6455: going away)
+IDLE_CLOSE_CODE = 1001
+
+class HeartbeatScheduler:
+    """
+    Heartbeat de servidor para todas las conexiones WebSocket del proceso.
+
+    Una unica tarea y un heap de vencimientos `(instante, seq, conexion)` en
+    lugar de una tarea por conexion. Cada conexion se revisa cuando vence su
+    entrada:
+
+    - si recibio algun frame en el ultimo `interval`, se reprograma para
+      `last_seen + interval` sin enviar nada
+    - si lleva mas de `interval` sin actividad, se le envia `{"type": "ping"}`
+      (el cliente responde con `pong`, que cuenta como actividad)
+    - si lleva mas de `timeout` sin actividad, se expulsa con `on_evict`
+
+    Las conexiones cerradas no se sacan del heap: su entrada se descarta al
+    vencer (borrado perezoso), asi registrar y desregistrar es O(log n).
+    """
+
+    def __init__(
+        self,
+        on_evict: Callable[[WSConnection], Awaitable[None]],
+        interval: float = None,
+        timeout: float = None,
+    ):
+        self.on_evict = on_evict
+        self.interval = interval or settings.ws_heartbeat_interval
+        self.timeout = timeout or settings.ws_connection_timeout
+        self._heap: List[Tuple[float, int, WSConnection]] = []
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._heap.clear()
+
+    def register(self, connection: WSConnection):
+        """Empezar a vigilar una conexion recien aceptada"""
+        self._push(connection.last_seen + self.interval, connection)
+        self.start()
+
+    def _push(self, due: float, connection: WSConnection):
+        is_earliest = not self._heap or due < self._heap[0][0]
+        heapq.heappush(self._heap, (due, next(self._seq), connection))
+        if is_earliest:
+            self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            if not self._heap:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            delay = self._heap[0][0] - time.monotonic()
+            if delay > 0:
+                #dormir hasta el proximo vencimiento o hasta que llegue uno anterior
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            _, _, connection = heapq.heappop(self._heap)
+            if connection.closed:
+                continue
+            try:
+                await self._check(connection, time.monotonic())
+            except Exception as e:
+                websocket_logger.error(f"Error en heartbeat de {connection.user_email}: {e}")
+
+    async def _check(self, connection: WSConnection, now: float):
+        idle = now - connection.last_seen
+        if idle >= self.timeout:
+            websocket_logger.info(
+                f"Conexión de {connection.user_email} inactiva {idle:.0f}s, expulsando por heartbeat"
+            )
+            metrics.incr("ws.heartbeat.evicted")
+            await self.on_evict(connection)
+            return
+
+        if idle >= self.interval:
+            metrics.incr("ws.heartbeat.pings")
+            connection.send_frame({"type": "ping"}, PRIORITY_HIGH)
+            #siguiente revision: otro ping o la expulsion, lo que llegue antes
+            due = min(now + self.interval, connection.last_seen + self.timeout)
+        else:
+            due = connection.last_seen + self.interval
+        self._push(due, connection)
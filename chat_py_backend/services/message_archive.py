@@ -0,0 +1,325 @@
+import asyncio
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import uuid
+import zlib
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+from config.settings import settings
+from database.connection import get_database
+from utils import json_codec
+from utils.logger import db_logger
+from utils.metrics import metrics
+
+#cabecera de fichero y de bloque de los segmentos
+SEGMENT_MAGIC = b"CPYSEG1\n"
+#longitud comprimida, mensajes, crc32, (ms, oid) del primero y del ultimo
+_BLOCK = struct.Struct("<III q12s q12s")
+
+#mensajes por bloque: leer una pagina descomprime uno o dos bloques pequeños
+BLOCK_MESSAGES = 256
+
+#fechas como las devuelve Mongo (UTC sin zona)
+_EPOCH = datetime(1970, 1, 1)
+_MILLISECOND = timedelta(milliseconds=1)
+
+#clave de orden de un mensaje: (milisegundos, bytes del ObjectId), igual que (timestamp, _id)
+ArchiveKey = Tuple[int, bytes]
+
+def archive_key(timestamp: datetime, object_id: ObjectId) -> ArchiveKey:
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return (timestamp - _EPOCH) // _MILLISECOND, object_id.binary
+
+class BlockInfo(NamedTuple):
+    offset: int
+    length: int
+    count: int
+    crc: int
+    first: ArchiveKey
+    last: ArchiveKey
+
+def _encode_row(doc: dict) -> list:
+    ms, _ = archive_key(doc["timestamp"], doc["_id"])
+    return [
+        str(doc["_id"]), ms, doc["sender_email"], doc["receiver_email"],
+        doc["content"], bool(doc.get("is_read", False)), doc.get("client_message_id")
+    ]
+
+def _decode_row(row: list, room_id: str) -> dict:
+    object_id, ms, sender_email, receiver_email, content, is_read, client_message_id = row
+    doc = {
+        "_id": ObjectId(object_id),
+        "room_id": room_id,
+        "sender_email": sender_email,
+        "receiver_email": receiver_email,
+        "content": content,
+        "timestamp": _EPOCH + ms * _MILLISECOND,
+        "is_read": is_read
+    }
+    if client_message_id is not None:
+        doc["client_message_id"] = client_message_id
+    return doc
+
+class SegmentStore:
+    """
+    Archivo frio de mensajes: un segmento por conversacion, solo de escritura
+    al final.
+
+    Cada segmento es una secuencia de bloques comprimidos con zlib, en orden
+    `(timestamp, _id)`. La cabecera de cada bloque guarda la clave de su
+    primer y ultimo mensaje, asi que una pagina se localiza leyendo solo las
+    cabeceras (mapeadas en memoria) y se descomprimen unicamente los bloques
+    que contienen el cursor. Un bloque incompleto al final (escritura
+    interrumpida) se ignora al leer y se trunca en la siguiente escritura.
+    """
+
+    def __init__(self, base_dir: str = None, cache_size: int = 1024):
+        self.base_dir = base_dir or settings.message_archive_dir
+        self.cache_size = cache_size
+        #indice de bloques por segmento, valido mientras no cambie el tamaño del fichero
+        self._indexes: "OrderedDict[str, Tuple[int, List[BlockInfo]]]" = OrderedDict()
+        #las lecturas llegan desde varios hilos (asyncio.to_thread)
+        self._indexes_lock = threading.Lock()
+
+    def segment_path(self, room_id: str) -> str:
+        #los room_id contienen emails: el nombre del fichero es su hash
+        digest = hashlib.sha1(room_id.encode("utf-8")).hexdigest()
+        return os.path.join(self.base_dir, digest[:2], f"{digest}.seg")
+
+    def _scan(self, data, size: int) -> List[BlockInfo]:
+        blocks = []
+        offset = len(SEGMENT_MAGIC)
+        while offset + _BLOCK.size <= size:
+            length, count, crc, first_ms, first_oid, last_ms, last_oid = _BLOCK.unpack_from(data, offset)
+            if offset + _BLOCK.size + length > size:
+                break
+            blocks.append(BlockInfo(offset, length, count, crc, (first_ms, first_oid), (last_ms, last_oid)))
+            offset += _BLOCK.size + length
+        return blocks
+
+    def _index(self, path: str) -> Tuple[Optional[mmap.mmap], List[BlockInfo]]:
+        """Mapear un segmento y obtener sus bloques (None si no existe)"""
+        try:
+            with open(path, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                if size <= len(SEGMENT_MAGIC):
+                    return None, []
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            return None, []
+
+        with self._indexes_lock:
+            cached = self._indexes.get(path)
+            if cached is not None and cached[0] == size:
+                self._indexes.move_to_end(path)
+                return data, cached[1]
+
+        if data[:len(SEGMENT_MAGIC)] != SEGMENT_MAGIC:
+            data.close()
+            raise ValueError(f"Segmento de archivo inválido: {path}")
+        blocks = self._scan(data, size)
+        with self._indexes_lock:
+            self._indexes[path] = (size, blocks)
+            self._indexes.move_to_end(path)
+            while len(self._indexes) > self.cache_size:
+                self._indexes.popitem(last=False)
+        return data, blocks
+
+    def _read_block(self, data: mmap.mmap, block: BlockInfo, room_id: str) -> List[dict]:
+        start = block.offset + _BLOCK.size
+        payload = data[start:start + block.length]
+        if zlib.crc32(payload) != block.crc:
+            raise ValueError(f"Bloque corrupto en el archivo de {room_id} (offset {block.offset})")
+        return [_decode_row(row, room_id) for row in json_codec.loads(zlib.decompress(payload))]
+
+    def last_key(self, room_id: str) -> Optional[ArchiveKey]:
+        data, blocks = self._index(self.segment_path(room_id))
+        if data is not None:
+            data.close()
+        return blocks[-1].last if blocks else None
+
+    def read_page(
+        self,
+        room_id: str,
+        limit: int,
+        cursor: Optional[ArchiveKey] = None,
+        direction: int = -1
+    ) -> List[dict]:
+        """
+        Hasta `limit` mensajes archivados, en el mismo orden que la consulta
+        caliente equivalente.
+
+        direction -1: los anteriores a `cursor` (o los mas recientes si no hay
+        cursor), de mas nuevo a mas antiguo. direction 1: los posteriores a
+        `cursor`, de mas antiguo a mas nuevo.
+        """
+        data, blocks = self._index(self.segment_path(room_id))
+        if data is None:
+            return []
+        try:
+            docs = []
+            if direction == -1:
+                candidates = [b for b in blocks if cursor is None or b.first < cursor]
+                for block in reversed(candidates):
+                    for doc in reversed(self._read_block(data, block, room_id)):
+                        if cursor is None or archive_key(doc["timestamp"], doc["_id"]) < cursor:
+                            docs.append(doc)
+                    if len(docs) >= limit:
+                        break
+            else:
+                candidates = [b for b in blocks if cursor is None or b.last > cursor]
+                for block in candidates:
+                    for doc in self._read_block(data, block, room_id):
+                        if cursor is None or archive_key(doc["timestamp"], doc["_id"]) > cursor:
+                            docs.append(doc)
+                    if len(docs) >= limit:
+                        break
+            return docs[:limit]
+        finally:
+            data.close()
+
+    def append(self, room_id: str, docs: List[dict]) -> int:
+        """
+        Añadir mensajes (ordenados por `(timestamp, _id)`) al final del segmento.
+
+        Los que no son posteriores al ultimo archivado se omiten: tras una
+        caida entre la escritura y el borrado de la coleccion caliente, el
+        siguiente pase vuelve a leerlos y no deben duplicarse. Retorna cuantos
+        se escribieron; el fichero queda sincronizado en disco.
+        """
+        path = self.segment_path(room_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data, blocks = self._index(path)
+        if data is not None:
+            data.close()
+        last = blocks[-1].last if blocks else None
+        rows = [doc for doc in docs if last is None or archive_key(doc["timestamp"], doc["_id"]) > last]
+        if not rows:
+            return 0
+
+        end = blocks[-1].offset + _BLOCK.size + blocks[-1].length if blocks else len(SEGMENT_MAGIC)
+        mode = "r+b" if os.path.exists(path) else "w+b"
+        with open(path, mode) as f:
+            if mode == "w+b" or os.fstat(f.fileno()).st_size < len(SEGMENT_MAGIC):
+                f.seek(0)
+                f.write(SEGMENT_MAGIC)
+                end = len(SEGMENT_MAGIC)
+            #descartar un bloque a medio escribir de una caida anterior
+            f.truncate(end)
+            f.seek(end)
+            for i in range(0, len(rows), BLOCK_MESSAGES):
+                chunk = rows[i:i + BLOCK_MESSAGES]
+                payload = zlib.compress(json_codec.dumps([_encode_row(doc) for doc in chunk]))
+                first = archive_key(chunk[0]["timestamp"], chunk[0]["_id"])
+                last = archive_key(chunk[-1]["timestamp"], chunk[-1]["_id"])
+                f.write(_BLOCK.pack(len(payload), len(chunk), zlib.crc32(payload), *first, *last))
+                f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        return len(rows)
+
+class MessageArchiver:
+    """
+    Tarea de fondo que mueve los mensajes con mas de
+    `settings.message_archive_after_days` de la coleccion `messages` al
+    archivo frio.
+
+    Cada pase toma hasta `batch_size` mensajes en orden (room_id, timestamp,
+    _id), los añade a los segmentos de sus conversaciones y solo despues de
+    sincronizarlos en disco los borra de Mongo. Asi, en cada conversacion los
+    archivados son siempre anteriores a los que siguen en caliente.
+
+    Con varios workers solo archiva el que tiene el lease de la coleccion
+    `locks`; los segmentos deben estar en un directorio compartido por todos.
+    """
+
+    LOCK_ID = "message_archiver"
+
+    def __init__(self, store: SegmentStore = None, interval: float = None, batch_size: int = None):
+        self.store = store or message_archive
+        self.interval = interval or settings.message_archive_interval_seconds
+        self.batch_size = batch_size or settings.message_archive_batch_size
+        self.owner = uuid.uuid4().hex
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _acquire_lease(self, db) -> bool:
+        now = datetime.now(timezone.utc)
+        try:
+            await db.locks.find_one_and_update(
+                {"_id": self.LOCK_ID, "$or": [{"owner": self.owner}, {"expires_at": {"$lt": now}}]},
+                {"$set": {"owner": self.owner, "expires_at": now + timedelta(seconds=self.interval * 2)}},
+                upsert=True
+            )
+            return True
+        except DuplicateKeyError:
+            #otro worker tiene el lease vigente
+            return False
+
+    async def archive_once(self) -> int:
+        """Archivar un lote de mensajes antiguos. Retorna cuantos se movieron."""
+        db = await get_database()
+        if db is None or not await self._acquire_lease(db):
+            return 0
+
+        cutoff = datetime.now(timezone.utc) - timedelta(days=settings.message_archive_after_days)
+        cursor = db.messages.find({"timestamp": {"$lt": cutoff}, "room_id": {"$exists": True}}).sort(
+            [("room_id", 1), ("timestamp", 1), ("_id", 1)]
+        ).limit(self.batch_size)
+        docs = await cursor.to_list(length=self.batch_size)
+        if not docs:
+            return 0
+
+        by_room: Dict[str, List[dict]] = {}
+        for doc in docs:
+            by_room.setdefault(doc["room_id"], []).append(doc)
+
+        #escritura y fsync fuera del event loop
+        written = 0
+        for room_id, room_docs in by_room.items():
+            written += await asyncio.to_thread(self.store.append, room_id, room_docs)
+
+        result = await db.messages.delete_many({"_id": {"$in": [doc["_id"] for doc in docs]}})
+        metrics.incr("messages.archived", result.deleted_count)
+        db_logger.info(
+            f"Archivados {result.deleted_count} mensajes de {len(by_room)} conversaciones "
+            f"({written} escritos en segmentos)"
+        )
+        return result.deleted_count
+
+    async def _run(self):
+        while True:
+            try:
+                archived = await self.archive_once()
+                #lote completo: probablemente quedan mas, seguir sin esperar
+                if archived >= self.batch_size:
+                    await asyncio.sleep(0)
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                db_logger.error(f"Error archivando mensajes: {e}")
+            await asyncio.sleep(self.interval)
+
+#instancias globales del archivo frio
+message_archive = SegmentStore()
+message_archiver = MessageArchiver()
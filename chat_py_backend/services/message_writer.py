@@ -0,0 +1,251 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from bson import ObjectId
+from pymongo import InsertOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, WriteError
+from config.settings import settings
+from database.connection import get_database
+from services.contact_index import contact_index
+from services.unread import publish_unread_update
+from utils.logger import chat_logger
+from utils.metrics import metrics
+
+def _stored(timestamp: datetime) -> datetime:
+    #como lo compara Mongo: UTC con precision de milisegundos
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp.replace(microsecond=timestamp.microsecond // 1000 * 1000)
+
+def room_upsert_spec(
+    participants: List[str],
+    last_message: dict,
+    now: datetime,
+    unread_timestamps: Optional[Dict[str, List[datetime]]] = None
+) -> Tuple[dict, list]:
+    """
+    Filtro y actualizacion (pipeline) del upsert de la sala de dos participantes con su ultimo mensaje.
+
+    `unread_timestamps` lista por posicion de participante ("0"/"1", igual
+    que `read_up_to`) las fechas de los mensajes que recibe. Solo suman como
+    no leidos los posteriores a su marca de lectura en el momento de aplicar
+    la actualizacion: una lectura que llega entre la fecha de un mensaje y
+    esta escritura ya lo cubre y no debe volver a contarse.
+    """
+    room_id = f"{participants[0]}_{participants[1]}"
+    fields = {
+        "room_id": room_id,
+        "participants": {"$ifNull": ["$participants", {"$literal": participants}]},
+        "created_at": {"$ifNull": ["$created_at", now]},
+        "last_message": {"$literal": last_message},
+        "updated_at": now,
+    }
+    for slot, timestamps in (unread_timestamps or {}).items():
+        newer = {"$filter": {"input": {"$literal": timestamps}, "cond": {"$gt": ["$$this", f"$read_up_to.{slot}"]}}}
+        fields[f"unread.{slot}"] = {"$add": [{"$ifNull": [f"$unread.{slot}", 0]}, {"$size": newer}]}
+    return {"room_id": room_id}, [{"$set": fields}]
+
+def applied_unread(room_before: Optional[dict], slot: str, timestamps: List[datetime]) -> int:
+    """Cuantos de `timestamps` sumo como no leidos el upsert de la sala, a partir de la sala anterior"""
+    watermark = ((room_before or {}).get("read_up_to") or {}).get(slot)
+    if watermark is None:
+        return len(timestamps)
+    watermark = _stored(watermark)
+    return sum(1 for timestamp in timestamps if _stored(timestamp) > watermark)
+
+async def upsert_room(
+    db,
+    participants: List[str],
+    last_message: dict,
+    now: datetime,
+    unread_timestamps: Optional[Dict[str, List[datetime]]] = None,
+    session=None
+) -> Optional[dict]:
+    """
+    Actualizar la sala con su ultimo mensaje creandola si no existe.
+
+    Retorna la sala antes de la actualizacion (contadores y marcas de
+    lectura), o None si se acaba de crear.
+    """
+    room_filter, room_update = room_upsert_spec(participants, last_message, now, unread_timestamps)
+    options = {
+        "projection": {"unread": 1, "read_up_to": 1},
+        "return_document": ReturnDocument.BEFORE,
+        "session": session
+    }
+    try:
+        return await db.chat_rooms.find_one_and_update(room_filter, room_update, upsert=True, **options)
+    except DuplicateKeyError:
+        #dos primeros mensajes simultaneos: el otro upsert creo la sala, este la actualiza
+        return await db.chat_rooms.find_one_and_update(room_filter, room_update, **options)
+
+class GroupCommitWriter:
+    """
+    Buffer de escritura en grupo para mensajes (group commit).
+
+    Los mensajes que llegan dentro de `interval_ms` se insertan juntos con un
+    unico `bulk_write`. Cada llamada a `write` se resuelve en cuanto esa
+    insercion termina, de modo que la confirmacion al remitente nunca se
+    adelanta a la base de datos ni espera al resto del trabajo del lote.
+    Despues se actualizan las salas (un upsert por sala, en paralelo), los
+    totales de no leidos (un `bulk_write`) y se publican los contadores;
+    cada paso registra sus propios fallos sin afectar a los mensajes, que ya
+    estan guardados.
+    Los lotes se escriben de uno en uno: mientras uno esta en vuelo, el
+    siguiente sigue acumulando mensajes.
+    """
+
+    def __init__(self, max_batch: int = None, interval_ms: int = None):
+        self.max_batch = max_batch or settings.message_group_commit_max_batch
+        self.interval = (settings.message_group_commit_interval_ms if interval_ms is None else interval_ms) / 1000
+        self._buffer: List[Tuple[dict, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._lock = asyncio.Lock()
+
+    async def write(self, message_data: dict) -> ObjectId:
+        """Encolar un mensaje y esperar a que su lote sea persistido"""
+        loop = asyncio.get_running_loop()
+        message_data.setdefault("_id", ObjectId())
+        future = loop.create_future()
+        self._buffer.append((message_data, future))
+
+        if len(self._buffer) >= self.max_batch:
+            self._flush_now()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.interval, self._flush_now)
+
+        return await future
+
+    def _flush_now(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._buffer = self._buffer, []
+        if batch:
+            asyncio.create_task(self._flush(batch))
+
+    async def _flush(self, batch: List[Tuple[dict, asyncio.Future]]):
+        async with self._lock:
+            started = time.perf_counter()
+            docs = [doc for doc, _ in batch]
+            try:
+                db = await get_database()
+                if db is None:
+                    raise RuntimeError("Base de datos no inicializada. Verifique la conexión.")
+                failed = await self._insert_messages(db, docs)
+            except Exception as e:
+                chat_logger.error(f"Error en escritura agrupada de {len(batch)} mensajes: {e}")
+                metrics.incr("message_group_commit.errors")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+
+            metrics.incr("message_group_commit.flushes")
+            metrics.incr("message_group_commit.messages", len(batch) - len(failed))
+            metrics.observe("message_group_commit.batch_size", len(batch))
+            metrics.observe("message_group_commit.batch_fill", len(batch) / self.max_batch)
+            metrics.observe("message_group_commit.flush_ms", (time.perf_counter() - started) * 1000)
+
+            #los mensajes ya estan guardados: se confirman antes de tocar salas y contadores
+            for index, (doc, future) in enumerate(batch):
+                if future.done():
+                    continue
+                error = failed.get(index)
+                if error is None:
+                    future.set_result(doc["_id"])
+                elif error.get("code") == 11000:
+                    #reintento de un client_message_id ya guardado
+                    future.set_exception(DuplicateKeyError(error.get("errmsg", ""), 11000, error))
+                else:
+                    future.set_exception(WriteError(error.get("errmsg", ""), error.get("code"), error))
+
+            await self._update_rooms(db, [doc for index, doc in enumerate(docs) if index not in failed])
+
+    async def _insert_messages(self, db, docs: List[dict]) -> Dict[int, dict]:
+        """Insertar un lote. Retorna los errores de escritura por posicion en el lote."""
+        #sin orden: un duplicado (reintento idempotente) no aborta el resto del lote
+        try:
+            await db.messages.bulk_write([InsertOne(doc) for doc in docs], ordered=False)
+        except BulkWriteError as e:
+            failed = {error["index"]: error for error in e.details.get("writeErrors", [])}
+            if not failed:
+                raise
+            return failed
+        return {}
+
+    async def _update_rooms(self, db, docs: List[dict]):
+        """Salas, totales de no leidos y notificaciones de los mensajes ya insertados"""
+        #una sola actualizacion por sala: la del ultimo mensaje del lote
+        now = datetime.now(timezone.utc)
+        last_by_room = {}
+        unread_by_room: Dict[Tuple[str, str], Dict[str, List[datetime]]] = {}
+        for doc in docs:
+            participants = tuple(sorted([doc["sender_email"], doc["receiver_email"]]))
+            last_by_room[participants] = {**doc, "id": str(doc["_id"])}
+            receiver = doc["receiver_email"]
+            if receiver != doc["sender_email"]:
+                slot = str(participants.index(receiver))
+                unread_by_room.setdefault(participants, {}).setdefault(slot, []).append(doc["timestamp"])
+        if not last_by_room:
+            return
+
+        #en paralelo: cada upsert retorna la sala anterior para saber que no leidos aplico
+        rooms = list(last_by_room.items())
+        results = await asyncio.gather(*(
+            upsert_room(db, list(participants), last_message, now, unread_by_room.get(participants))
+            for participants, last_message in rooms
+        ), return_exceptions=True)
+
+        unread_by_user: Dict[str, int] = {}
+        counts: List[Tuple[str, str, int]] = []
+        for (participants, _), room_before in zip(rooms, results):
+            if isinstance(room_before, BaseException):
+                chat_logger.error(f"Error al actualizar la sala {participants[0]}_{participants[1]} tras una escritura agrupada: {room_before}")
+                metrics.incr("message_group_commit.room_errors")
+                continue
+            if room_before is None:
+                #sala creada en este lote: se registra en el indice de contactos
+                try:
+                    await contact_index.register_room(*participants)
+                except Exception as e:
+                    chat_logger.error(f"Error al registrar contactos de {participants[0]}_{participants[1]}: {e}")
+            for slot, timestamps in unread_by_room.get(participants, {}).items():
+                applied = applied_unread(room_before, slot, timestamps)
+                if not applied:
+                    continue
+                receiver = participants[int(slot)]
+                unread_by_user[receiver] = unread_by_user.get(receiver, 0) + applied
+                count = ((room_before or {}).get("unread") or {}).get(slot, 0) + applied
+                counts.append((receiver, participants[1 - int(slot)], count))
+        if not unread_by_user:
+            return
+
+        try:
+            await db.users.bulk_write([
+                UpdateOne({"email": email}, {"$inc": {"unread_total": count}})
+                for email, count in unread_by_user.items()
+            ], ordered=False)
+        except Exception as e:
+            chat_logger.error(f"Error al sumar no leídos de {len(unread_by_user)} usuarios: {e}")
+            metrics.incr("message_group_commit.unread_errors")
+            return
+
+        try:
+            await self._publish_unread(db, counts)
+        except Exception as e:
+            chat_logger.error(f"Error al publicar contadores de no leídos: {e}")
+
+    async def _publish_unread(self, db, counts: List[Tuple[str, str, int]]):
+        #los contadores de sala salen de los upserts; los totales, de una lectura de usuarios
+        receivers = list({receiver for receiver, _, _ in counts})
+        totals = {
+            user["email"]: user.get("unread_total", 0)
+            async for user in db.users.find({"email": {"$in": receivers}}, {"email": 1, "unread_total": 1})
+        }
+        for receiver, other, count in counts:
+            await publish_unread_update(receiver, other, count, totals.get(receiver, 0))
+
+#instancia global del buffer de escritura
+message_writer = GroupCommitWriter()
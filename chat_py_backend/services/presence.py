@@ -0,0 +1,200 @@
+import asyncio
+import os
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from config.settings import settings
+from services.contact_index import contact_index
+from services.pubsub import pubsub
+from utils.logger import websocket_logger
+
+PublishFn = Callable[[List[str], dict], Awaitable[None]]
+
+# Canal pub/sub con los workers que tienen algun dispositivo de cada usuario
+PRESENCE_CHANNEL = "presence:devices"
+
+class PresenceManager:
+    """
+    Anuncia cambios de estado online/offline con supresion de parpadeos.
+
+    - Una desconexion no se anuncia hasta que pasa el periodo de gracia; si el
+      usuario vuelve a conectar antes, el anuncio se cancela y nadie se entera.
+    - Los cambios se acumulan durante una ventana corta y se envian juntos: cada
+      contacto recibe un unico frame `user_status` con todos los cambios que le
+      afectan.
+
+    Un usuario esta online mientras algun worker tenga al menos un dispositivo
+    suyo. Cada worker publica en `PRESENCE_CHANNEL` cuando su primer
+    dispositivo de un usuario conecta o el ultimo se va, y todos mantienen el
+    conjunto de workers por usuario. Los cambios del estado global (ningun
+    worker -> alguno y al reves) se procesan en todos los workers, pero solo
+    los anuncia el worker que los origino. Al parar, un worker publica su
+    salida (`stop`): los demas lo quitan de todos los usuarios y el propio
+    worker anuncia offline, sin periodo de gracia, a los que se quedan sin
+    dispositivos. Solo si un worker muere sin parar sus usuarios siguen
+    apareciendo online hasta que reconectan y se desconectan.
+    """
+
+    def __init__(self, publish: PublishFn, grace_seconds: float = None, coalesce_ms: int = None):
+        self.publish = publish
+        self.grace_seconds = settings.ws_presence_grace_seconds if grace_seconds is None else grace_seconds
+        self.coalesce_seconds = (settings.ws_presence_coalesce_ms if coalesce_ms is None else coalesce_ms) / 1000
+        self.worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._workers: Dict[str, Set[str]] = {}
+        #usuario -> (temporizador del anuncio offline, worker que lo origino)
+        self._pending_offline: Dict[str, Tuple[asyncio.TimerHandle, str]] = {}
+        self._pending_changes: Dict[str, Tuple[bool, str]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self._device_updates: Set[asyncio.Task] = set()
+
+    def user_connected(self, user_email: str):
+        """Registrar el primer dispositivo del usuario en este worker"""
+        self._publish_devices(user_email, True)
+
+    def user_disconnected(self, user_email: str):
+        """Registrar que el usuario ya no tiene dispositivos en este worker"""
+        self._publish_devices(user_email, False)
+
+    def _publish_devices(self, user_email: str, online: bool):
+        #se llama desde codigo sincrono (cierre de conexiones); las tareas mantienen el orden
+        task = asyncio.create_task(pubsub.publish(
+            PRESENCE_CHANNEL, {"worker": self.worker_id, "user_email": user_email, "online": online}
+        ))
+        self._device_updates.add(task)
+        task.add_done_callback(self._device_updates.discard)
+
+    async def stop(self):
+        """Publicar la salida de este worker y anunciar offline a sus usuarios (antes de parar el pub/sub)"""
+        #cambios de dispositivos aun en vuelo de las conexiones que se cierran
+        if self._device_updates:
+            await asyncio.gather(*list(self._device_updates), return_exceptions=True)
+        await pubsub.publish(PRESENCE_CHANNEL, {"worker": self.worker_id, "gone": True})
+
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        changes, self._pending_changes = self._pending_changes, {}
+        if changes:
+            try:
+                await self._announce(changes)
+            except Exception as e:
+                websocket_logger.error(f"Error al anunciar cambios de presencia al parar: {e}")
+
+    def _worker_gone(self, worker: str):
+        for user_email in [email for email, workers in self._workers.items() if worker in workers]:
+            workers = self._workers[user_email]
+            workers.discard(worker)
+            if not workers:
+                del self._workers[user_email]
+                if worker == self.worker_id:
+                    self._queue_change(user_email, False)
+        #anuncios pendientes del worker que se va: los hace el mismo ahora
+        for user_email, (timer, origin) in list(self._pending_offline.items()):
+            if origin == worker:
+                timer.cancel()
+                del self._pending_offline[user_email]
+                if worker == self.worker_id:
+                    self._queue_change(user_email, False)
+
+    async def handle_devices_changed(self, channel: str, message: dict):
+        #handler pub/sub del canal de presencia
+        worker = message.get("worker")
+        if worker and message.get("gone"):
+            self._worker_gone(worker)
+            return
+        user_email = message.get("user_email")
+        if not user_email or not worker:
+            return
+        workers = self._workers.setdefault(user_email, set())
+        if message.get("online"):
+            was_offline = not workers
+            workers.add(worker)
+            if was_offline:
+                self._user_online(user_email, worker)
+            return
+
+        workers.discard(worker)
+        if not workers:
+            del self._workers[user_email]
+            self._user_offline(user_email, worker)
+
+    def _user_online(self, user_email: str, origin: str):
+        #cancela el anuncio offline pendiente en todos los workers
+        pending = self._pending_offline.pop(user_email, None)
+        if pending is not None:
+            pending[0].cancel()
+            websocket_logger.debug(f"Reconexion de {user_email} dentro del periodo de gracia")
+            return
+        if origin == self.worker_id:
+            self._queue_change(user_email, True)
+
+    def _user_offline(self, user_email: str, origin: str):
+        #todos los workers esperan el periodo de gracia; solo el de origen anuncia
+        if user_email in self._pending_offline:
+            return
+        if self.grace_seconds <= 0:
+            if origin == self.worker_id:
+                self._queue_change(user_email, False)
+            return
+        loop = asyncio.get_running_loop()
+        timer = loop.call_later(self.grace_seconds, self._offline_grace_expired, user_email, origin)
+        self._pending_offline[user_email] = (timer, origin)
+
+    def _offline_grace_expired(self, user_email: str, origin: str):
+        self._pending_offline.pop(user_email, None)
+        if origin == self.worker_id:
+            self._queue_change(user_email, False)
+
+    def _queue_change(self, user_email: str, is_online: bool):
+        pending = self._pending_changes.get(user_email)
+        if pending is not None and pending[0] != is_online:
+            #online y offline dentro de la misma ventana: el estado anunciado no cambia
+            del self._pending_changes[user_email]
+            return
+
+        self._pending_changes[user_email] = (is_online, datetime.now(timezone.utc).isoformat())
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_after_window())
+
+    async def _flush_after_window(self):
+        try:
+            await asyncio.sleep(self.coalesce_seconds)
+        finally:
+            self._flush_task = None
+        changes, self._pending_changes = self._pending_changes, {}
+        if changes:
+            try:
+                await self._announce(changes)
+            except Exception as e:
+                websocket_logger.error(f"Error al anunciar cambios de presencia: {e}")
+
+    async def _announce(self, changes: Dict[str, Tuple[bool, str]]):
+        #agrupar por destinatario: cada contacto recibe solo los cambios que le afectan
+        by_recipient: Dict[str, List[str]] = defaultdict(list)
+        for user_email, (is_online, _) in changes.items():
+            contacts = await contact_index.get_contacts(user_email)
+            for contact in contacts:
+                by_recipient[contact].append(user_email)
+            if not is_online:
+                contact_index.forget(user_email)
+
+        #destinatarios con el mismo conjunto de cambios comparten frame (se serializa una vez)
+        groups: Dict[Tuple[str, ...], List[str]] = defaultdict(list)
+        for recipient, changed_users in by_recipient.items():
+            groups[tuple(sorted(changed_users))].append(recipient)
+
+        for changed_users, recipients in groups.items():
+            statuses = [
+                {
+                    "user_email": user_email,
+                    "is_online": changes[user_email][0],
+                    "timestamp": changes[user_email][1],
+                }
+                for user_email in changed_users
+            ]
+            if len(statuses) == 1:
+                frame = {"type": "user_status", **statuses[0]}
+            else:
+                frame = {"type": "user_status", "statuses": statuses}
+            await self.publish(recipients, frame)
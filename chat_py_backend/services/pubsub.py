@@ -0,0 +1,216 @@
+import asyncio
+import os
+import struct
+import uuid
+from abc import ABC, abstractmethod
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+from config.settings import settings
+from utils.logger import websocket_logger
+from utils import json_codec
+
+MessageHandler = Callable[[str, dict], Awaitable[None]]
+
+class PubSubBackend(ABC):
+    """
+    Interfaz comun para los backends de publicacion/suscripcion.
+
+    Cada proceso registra un handler por canal; todo lo que se publique en un
+    canal llega a su handler en todos los procesos.
+    """
+
+    def __init__(self):
+        self._handlers: Dict[str, MessageHandler] = {}
+
+    def subscribe(self, channel: str, handler: MessageHandler):
+        """Registrar el handler que recibe los mensajes de un canal"""
+        self._handlers[channel] = handler
+
+    async def start(self):
+        """Preparar el backend para publicar y recibir"""
+
+    async def stop(self):
+        """Liberar recursos del backend"""
+
+    @abstractmethod
+    async def publish(self, channel: str, message: dict):
+        """Publicar un mensaje en un canal"""
+
+    async def _dispatch(self, channel: str, message: dict):
+        handler = self._handlers.get(channel)
+        if handler is None:
+            websocket_logger.warning(f"Mensaje pub/sub descartado, canal sin suscriptor: {channel}")
+            return
+        try:
+            await handler(channel, message)
+        except Exception as e:
+            websocket_logger.error(f"Error al procesar mensaje pub/sub del canal {channel}: {e}")
+
+class InProcessPubSub(PubSubBackend):
+    """Backend en memoria: entrega directa dentro del mismo proceso (un solo worker)"""
+
+    async def publish(self, channel: str, message: dict):
+        await self._dispatch(channel, message)
+
+#cabecera de cada mensaje en el stream: longitud del cuerpo (uint32 big-endian)
+_FRAME_HEADER = struct.Struct(">I")
+
+class UnixSocketPubSub(PubSubBackend):
+    """
+    Backend multiproceso basado en sockets Unix de stream.
+
+    Cada worker escucha en su propio socket dentro de un directorio compartido
+    y mantiene una conexion persistente con cada uno de los demas; publicar
+    consiste en escribir el mensaje (con prefijo de longitud) en todas ellas.
+
+    No hay limite de tamaño por mensaje y cada envio espera a que el socket
+    acepte los datos (`drain`): si otro worker va atrasado, quien publica
+    espera en lugar de descartar. Un envio fallido se reintenta una vez con una
+    conexion nueva; si el worker ha muerto, su socket huerfano se elimina.
+    """
+
+    def __init__(self, socket_dir: str, send_timeout: float = None):
+        super().__init__()
+        self.socket_dir = socket_dir
+        self.send_timeout = send_timeout or settings.ws_pubsub_send_timeout
+        self.socket_path: Optional[str] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._readers: Set[asyncio.Task] = set()
+        self._writers: Dict[str, asyncio.StreamWriter] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._peers: List[str] = []
+        self._peers_mtime: Optional[int] = None
+
+    async def start(self):
+        os.makedirs(self.socket_dir, exist_ok=True)
+        self.socket_path = os.path.join(self.socket_dir, f"{os.getpid()}-{uuid.uuid4().hex[:8]}.sock")
+        self._server = await asyncio.start_unix_server(self._handle_peer, path=self.socket_path)
+        websocket_logger.info(f"Pub/sub por socket Unix escuchando en {self.socket_path}")
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            self._server = None
+        for task in list(self._readers):
+            task.cancel()
+        self._readers.clear()
+        for writer in self._writers.values():
+            writer.close()
+        self._writers.clear()
+        if self.socket_path and os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self.socket_path = None
+
+    async def publish(self, channel: str, message: dict):
+        #entrega local directa, sin pasar por el socket propio
+        await self._dispatch(channel, message)
+
+        if self._server is None:
+            return
+        data = json_codec.dumps({"channel": channel, "message": message})
+        frame = _FRAME_HEADER.pack(len(data)) + data
+        peers = self._get_peers()
+        if peers:
+            await asyncio.gather(*(self._send(peer, frame, channel) for peer in peers))
+
+    async def _send(self, peer: str, frame: bytes, channel: str):
+        #un envio a la vez por worker: conserva el orden y no intercala mensajes
+        lock = self._locks.setdefault(peer, asyncio.Lock())
+        async with lock:
+            for attempt in range(2):
+                try:
+                    writer = self._writers.get(peer)
+                    if writer is None or writer.is_closing():
+                        _, writer = await asyncio.wait_for(
+                            asyncio.open_unix_connection(peer), timeout=self.send_timeout
+                        )
+                        self._writers[peer] = writer
+                    writer.write(frame)
+                    await asyncio.wait_for(writer.drain(), timeout=self.send_timeout)
+                    return
+                except (ConnectionRefusedError, FileNotFoundError):
+                    #worker muerto: limpiar su socket huerfano
+                    self._drop_peer(peer, unlink=True)
+                    websocket_logger.info(f"Eliminado socket pub/sub huerfano: {peer}")
+                    return
+                except (OSError, asyncio.TimeoutError) as e:
+                    #conexion rota o atascada: se reintenta una vez con una conexion nueva
+                    self._drop_peer(peer)
+                    if attempt:
+                        websocket_logger.error(
+                            f"No se pudo entregar un mensaje del canal {channel} al worker {peer}: {e!r}"
+                        )
+
+    def _drop_peer(self, peer: str, unlink: bool = False):
+        writer = self._writers.pop(peer, None)
+        if writer is not None:
+            writer.close()
+        if unlink:
+            self._locks.pop(peer, None)
+            try:
+                os.unlink(peer)
+            except OSError:
+                pass
+            self._peers_mtime = None
+
+    def _get_peers(self) -> List[str]:
+        #solo relistar el directorio cuando cambia (alta o baja de un worker)
+        try:
+            mtime = os.stat(self.socket_dir).st_mtime_ns
+        except FileNotFoundError:
+            return []
+        if mtime != self._peers_mtime:
+            self._peers_mtime = mtime
+            self._peers = [
+                os.path.join(self.socket_dir, name)
+                for name in os.listdir(self.socket_dir)
+                if name.endswith(".sock") and os.path.join(self.socket_dir, name) != self.socket_path
+            ]
+            for peer in set(self._writers) - set(self._peers):
+                self._drop_peer(peer)
+        return self._peers
+
+    async def _handle_peer(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        #mensajes de otro worker, en orden; mientras se procesan no se leen mas (backpressure)
+        task = asyncio.current_task()
+        self._readers.add(task)
+        try:
+            while True:
+                header = await reader.readexactly(_FRAME_HEADER.size)
+                data = await reader.readexactly(_FRAME_HEADER.unpack(header)[0])
+                try:
+                    envelope = json_codec.loads(data)
+                except (ValueError, UnicodeDecodeError) as e:
+                    websocket_logger.error(f"Mensaje pub/sub invalido: {e}")
+                    continue
+                await self._dispatch(envelope.get("channel", ""), envelope.get("message") or {})
+        except (asyncio.IncompleteReadError, ConnectionError):
+            #el otro worker cerro la conexion
+            pass
+        finally:
+            self._readers.discard(task)
+            writer.close()
+
+def create_pubsub_backend(name: str) -> PubSubBackend:
+    """Crear el backend pub/sub configurado ('memory' o 'unix')"""
+    if name == "memory":
+        return InProcessPubSub()
+    if name == "unix":
+        return UnixSocketPubSub(settings.ws_pubsub_socket_dir)
+    raise ValueError(f"Backend pub/sub desconocido: {name}")
+
+#instancia global del backend
+pubsub = create_pubsub_backend(settings.ws_pubsub_backend)
+
+# Canal por el que viajan todos los eventos destinados a clientes WS
+WS_DELIVERY_CHANNEL = "ws:deliver"
+
+async def publish_to_users(recipients: List[str], frame: dict, exclude_connection: Optional[str] = None):
+    """
+    Publicar un evento para todos los dispositivos de un conjunto de usuarios,
+    esten en el worker que esten. `exclude_connection` omite una conexion
+    concreta (normalmente la que origino el evento).
+    """
+    message = {"to": recipients, "frame": frame}
+    if exclude_connection:
+        message["exclude_connection"] = exclude_connection
+    await pubsub.publish(WS_DELIVERY_CHANNEL, message)
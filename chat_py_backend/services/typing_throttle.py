@@ -0,0 +1,106 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, List, Tuple
+from config.settings import settings
+from utils.logger import websocket_logger
+
+PublishFn = Callable[[List[str], dict], Awaitable[None]]
+
+class _TypingState:
+    __slots__ = ("last_forward", "expire_timer")
+
+    def __init__(self, last_forward: float, expire_timer: asyncio.TimerHandle):
+        self.last_forward = last_forward
+        self.expire_timer = expire_timer
+
+class TypingThrottle:
+    """
+    Limita y agrupa los indicadores de escritura por par remitente/destinatario.
+
+    - Los `is_typing: true` repetidos se colapsan: solo se reenvia uno cada
+      `refresh_seconds` mientras el indicador siga activo.
+    - Entre dos frames reenviados del mismo par pasan al menos `min_interval_ms`.
+    - El indicador caduca en el servidor tras `expire_seconds` sin refresco y se
+      envia el `is_typing: false` aunque el cliente nunca lo mande.
+    """
+
+    def __init__(
+        self,
+        publish: PublishFn,
+        refresh_seconds: float = None,
+        expire_seconds: float = None,
+        min_interval_ms: int = None,
+    ):
+        self.publish = publish
+        self.refresh_seconds = settings.ws_typing_refresh_seconds if refresh_seconds is None else refresh_seconds
+        self.expire_seconds = settings.ws_typing_expire_seconds if expire_seconds is None else expire_seconds
+        self.min_interval = (settings.ws_typing_min_interval_ms if min_interval_ms is None else min_interval_ms) / 1000
+        #pares con el indicador activo en el destinatario
+        self._active: Dict[Tuple[str, str], _TypingState] = {}
+        #ultimo "stop" reenviado por par, para el intervalo minimo
+        self._last_stop: Dict[Tuple[str, str], float] = {}
+
+    async def handle(self, sender_email: str, receiver_email: str, is_typing: bool):
+        """Procesar un frame de typing del cliente y reenviarlo si corresponde"""
+        key = (sender_email, receiver_email)
+        now = time.monotonic()
+        state = self._active.get(key)
+
+        if not is_typing:
+            if state is None:
+                return  #el destinatario ya no ve el indicador
+            self._stop(key)
+            await self._forward(sender_email, receiver_email, False)
+            return
+
+        if state is not None:
+            #indicador ya activo: solo extender la caducidad y refrescar de vez en cuando
+            state.expire_timer.cancel()
+            state.expire_timer = self._arm_expiry(key)
+            if now - state.last_forward < self.refresh_seconds:
+                return
+            state.last_forward = now
+            await self._forward(sender_email, receiver_email, True)
+            return
+
+        last_stop = self._last_stop.get(key)
+        if last_stop is not None and now - last_stop < self.min_interval:
+            return  #alternancia true/false demasiado rapida
+
+        self._active[key] = _TypingState(now, self._arm_expiry(key))
+        await self._forward(sender_email, receiver_email, True)
+
+    def _stop(self, key: Tuple[str, str]):
+        state = self._active.pop(key, None)
+        if state is not None:
+            state.expire_timer.cancel()
+        self._last_stop[key] = time.monotonic()
+        self._prune_stops()
+
+    def _prune_stops(self):
+        #las marcas de "stop" solo importan durante el intervalo minimo
+        if len(self._last_stop) < 1024:
+            return
+        cutoff = time.monotonic() - self.min_interval
+        self._last_stop = {k: t for k, t in self._last_stop.items() if t >= cutoff}
+
+    def _arm_expiry(self, key: Tuple[str, str]) -> asyncio.TimerHandle:
+        loop = asyncio.get_running_loop()
+        return loop.call_later(self.expire_seconds, self._expire, key)
+
+    def _expire(self, key: Tuple[str, str]):
+        if key not in self._active:
+            return
+        self._stop(key)
+        asyncio.create_task(self._forward(key[0], key[1], False))
+
+    async def _forward(self, sender_email: str, receiver_email: str, is_typing: bool):
+        typing_data = {
+            "type": "typing",
+            "sender_email": sender_email,
+            "is_typing": is_typing
+        }
+        try:
+            await self.publish([receiver_email], typing_data)
+        except Exception as e:
+            websocket_logger.error(f"Error al reenviar indicador de escritura de {sender_email}: {e}")
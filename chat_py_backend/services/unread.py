@@ -0,0 +1,14 @@
+from services.pubsub import publish_to_users
+
+def unread_update_frame(other_email: str, count: int, total: int) -> dict:
+    """Frame con los no leidos de una conversacion y el total del usuario"""
+    return {
+        "type": "unread_update",
+        "user_email": other_email,
+        "count": count,
+        "total": max(0, total)
+    }
+
+async def publish_unread_update(user_email: str, other_email: str, count: int, total: int):
+    """Enviar a todos los dispositivos de `user_email` sus contadores de no leidos con `other_email`"""
+    await publish_to_users([user_email], unread_update_frame(other_email, count, total))
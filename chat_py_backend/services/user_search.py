@@ -0,0 +1,234 @@
+import asyncio
+from bisect import bisect_left, insort
+from collections import Counter
+from typing import Dict, List, Optional, Set, Tuple
+from services.pubsub import pubsub
+from utils.logger import chat_logger
+
+# Canal pub/sub para propagar altas y cambios de usuarios al indice de todos los workers
+USERS_CHANNEL = "users:updated"
+
+#busqueda tolerante: consultas de al menos 4 caracteres, claves candidatas por trigramas
+MIN_FUZZY_QUERY = 4
+FUZZY_CANDIDATES = 200
+
+def search_record(user_doc: dict) -> dict:
+    """Campos de un documento de `users` que se guardan en el indice y devuelve la busqueda"""
+    return {
+        "id": str(user_doc["_id"]),
+        "email": user_doc["email"],
+        "username": user_doc.get("username"),
+        "avatar_url": user_doc.get("avatar_url")
+    }
+
+def search_keys(user: dict) -> Set[str]:
+    """Claves de busqueda de un usuario: username y parte local del email, en minusculas"""
+    keys = {user["email"].split("@", 1)[0].casefold()}
+    if user.get("username"):
+        keys.add(user["username"].casefold())
+    return keys
+
+def trigrams(text: str) -> Set[str]:
+    #con relleno para que el inicio de la palabra pese mas que su interior
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def max_typos(query: str) -> int:
+    return 1 if len(query) < 8 else 2
+
+def prefix_distance(query: str, key: str, limit: int) -> int:
+    """
+    Distancia de edicion (con transposiciones) entre `query` y el prefijo de
+    `key` que mas se le parece. Retorna `limit + 1` si supera `limit`.
+    """
+    width = min(len(key), len(query) + limit)
+    previous = None
+    row = list(range(width + 1))
+    for i in range(1, len(query) + 1):
+        current = [i] + [0] * width
+        for j in range(1, width + 1):
+            cost = 0 if query[i - 1] == key[j - 1] else 1
+            current[j] = min(row[j] + 1, current[j - 1] + 1, row[j - 1] + cost)
+            if i > 1 and j > 1 and query[i - 1] == key[j - 2] and query[i - 2] == key[j - 1]:
+                current[j] = min(current[j], previous[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous, row = row, current
+    return min(row)
+
+class UserSearchIndex:
+    """
+    Indice en memoria para buscar usuarios mientras se escribe.
+
+    - prefijo: lista ordenada de `(clave, email)` recorrida con bisect,
+      O(log n + resultados)
+    - tolerancia a errores: indice invertido de trigramas que propone claves
+      candidatas, filtradas por distancia de edicion con el prefijo de la
+      clave (1 error, 2 desde 8 caracteres); solo si el prefijo no llena la
+      pagina
+
+    Se construye al arrancar con una unica lectura de `users` y despues se
+    mantiene al dia con cada registro y cambio de perfil (via pub/sub, para
+    todos los workers). Las busquedas no consultan Mongo.
+    """
+
+    def __init__(self):
+        self._users: Dict[str, dict] = {}
+        self._keys: Dict[str, Set[str]] = {}
+        self._sorted: List[Tuple[str, str]] = []
+        #trigrama -> claves que lo contienen; clave -> emails que la usan
+        self._trigrams: Dict[str, Set[str]] = {}
+        self._owners: Dict[str, Set[str]] = {}
+        #cambios recibidos durante build (None si no hay construccion en curso)
+        self._changes_during_build: Optional[List[Tuple[dict, Optional[str]]]] = None
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    async def build(self, db):
+        """
+        Cargar todos los usuarios (solo los campos que se devuelven en la busqueda).
+
+        La construccion (CPU) se hace en un hilo sobre un indice nuevo que
+        despues sustituye al actual; los cambios que llegan por pub/sub
+        mientras tanto se reaplican sobre el indice nuevo.
+        """
+        cursor = db.users.find({}, {"email": 1, "username": 1, "avatar_url": 1})
+        users = [search_record(doc) async for doc in cursor]
+        self._changes_during_build = []
+        try:
+            fresh = await asyncio.to_thread(UserSearchIndex._built_from, users)
+        finally:
+            changes, self._changes_during_build = self._changes_during_build, None
+        self._users, self._keys, self._sorted = fresh._users, fresh._keys, fresh._sorted
+        self._trigrams, self._owners = fresh._trigrams, fresh._owners
+        for user, previous_email in changes:
+            self._apply_update(user, previous_email)
+        chat_logger.info(f"Indice de búsqueda de usuarios construido: {len(self._users)} usuarios")
+
+    @staticmethod
+    def _built_from(users: List[dict]) -> "UserSearchIndex":
+        index = UserSearchIndex()
+        for user in users:
+            index.remove(user["email"])
+            index._add(user)
+        #una sola ordenacion O(n log n); insort por usuario seria O(n^2)
+        index._sorted = sorted((key, email) for email, keys in index._keys.items() for key in keys)
+        return index
+
+    def clear(self):
+        self._users.clear()
+        self._keys.clear()
+        self._sorted.clear()
+        self._trigrams.clear()
+        self._owners.clear()
+
+    def upsert(self, user: dict):
+        """Insertar o reemplazar un usuario (por email)"""
+        self.remove(user["email"])
+        for key in self._add(user):
+            insort(self._sorted, (key, user["email"]))
+
+    def _add(self, user: dict) -> Set[str]:
+        #todo menos la lista ordenada, que build crea de una vez
+        email = user["email"]
+        keys = search_keys(user)
+        self._users[email] = user
+        self._keys[email] = keys
+        for key in keys:
+            owners = self._owners.setdefault(key, set())
+            if not owners:
+                for trigram in trigrams(key):
+                    self._trigrams.setdefault(trigram, set()).add(key)
+            owners.add(email)
+        return keys
+
+    def remove(self, email: str):
+        if self._users.pop(email, None) is None:
+            return
+        for key in self._keys.pop(email):
+            index = bisect_left(self._sorted, (key, email))
+            if index < len(self._sorted) and self._sorted[index] == (key, email):
+                del self._sorted[index]
+            owners = self._owners.get(key, set())
+            owners.discard(email)
+            if owners:
+                continue
+            self._owners.pop(key, None)
+            for trigram in trigrams(key):
+                postings = self._trigrams.get(trigram)
+                if postings is not None:
+                    postings.discard(key)
+                    if not postings:
+                        del self._trigrams[trigram]
+
+    def search(self, query: str, limit: int = 20, exclude_email: Optional[str] = None) -> List[dict]:
+        """
+        Usuarios cuyo username o parte local del email empieza por `query`
+        (en orden alfabetico) y, si faltan resultados, los mas parecidos por
+        trigramas.
+        """
+        query = query.strip().casefold()
+        if not query:
+            return []
+
+        found: List[str] = []
+        seen = {exclude_email}
+        index = bisect_left(self._sorted, (query, ""))
+        while index < len(self._sorted) and len(found) < limit:
+            key, email = self._sorted[index]
+            if not key.startswith(query):
+                break
+            if email not in seen:
+                seen.add(email)
+                found.append(email)
+            index += 1
+
+        if len(found) < limit and len(query) >= MIN_FUZZY_QUERY:
+            found.extend(self._fuzzy(query, limit - len(found), seen))
+
+        return [self._users[email] for email in found]
+
+    def _fuzzy(self, query: str, limit: int, seen: Set[Optional[str]]) -> List[str]:
+        #claves que comparten mas trigramas con la consulta, ordenadas por errores
+        shared = Counter()
+        for trigram in trigrams(query):
+            shared.update(self._trigrams.get(trigram, ()))
+        typos = max_typos(query)
+        matches = []
+        for key, _ in shared.most_common(FUZZY_CANDIDATES):
+            distance = prefix_distance(query, key, typos)
+            if distance <= typos:
+                matches.append((distance, key))
+        matches.sort()
+
+        found = []
+        for _, key in matches:
+            for email in sorted(self._owners[key] - seen):
+                seen.add(email)
+                found.append(email)
+                if len(found) >= limit:
+                    return found
+        return found
+
+    async def publish_user(self, user: dict, previous_email: Optional[str] = None):
+        """Propagar un alta o cambio de usuario al indice de todos los workers"""
+        await pubsub.publish(USERS_CHANNEL, {"user": user, "previous_email": previous_email})
+
+    async def handle_user_updated(self, channel: str, message: dict):
+        #handler pub/sub del canal de usuarios
+        user = message.get("user") or {}
+        if not user.get("email"):
+            return
+        previous_email = message.get("previous_email")
+        if self._changes_during_build is not None:
+            self._changes_during_build.append((user, previous_email))
+        self._apply_update(user, previous_email)
+
+    def _apply_update(self, user: dict, previous_email: Optional[str]):
+        if previous_email and previous_email != user["email"]:
+            self.remove(previous_email)
+        self.upsert(user)
+
+#instancia global del indice
+user_search_index = UserSearchIndex()
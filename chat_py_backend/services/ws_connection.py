@@ -0,0 +1,152 @@
+import asyncio
+import time
+import uuid
+from collections import deque
+from typing import Deque, Optional
+from fastapi import WebSocket
+from config.settings import settings
+from utils.logger import websocket_logger
+from utils.ws_codec import JSON_CODEC, Payload, WSCodec
+
+#carriles de prioridad de la cola de salida
+PRIORITY_HIGH = 0  #mensajes de chat, confirmaciones, errores: nunca se descartan
+PRIORITY_LOW = 1   #typing y presencia: descartables si el cliente no da abasto
+
+#codigo de cierre para clientes que no consumen a tiempo (RFC 6455: try again later)
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+class WSConnection:
+    """
+    Conexion WebSocket con colas de salida acotadas y una tarea escritora propia.
+
+    Los handlers nunca esperan al socket: `send` solo encola y la tarea escritora
+    drena primero el carril de alta prioridad y despues el de baja. Si el carril
+    alto se llena, el cliente se considera lento y se desconecta; si se llena el
+    bajo, se descarta el evento descartable mas antiguo.
+
+    Con `batch_window_ms > 0` la tarea escritora espera ese margen tras el
+    primer evento y envia todo lo acumulado (hasta `max_batch`) como un unico
+    frame `{"type": "batch", "events": [...]}`.
+
+    Los frames se guardan ya codificados con el `codec` negociado en el
+    handshake (JSON en texto o MessagePack en binario).
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        user_email: str,
+        max_queue: int = None,
+        max_low_queue: int = None,
+        batch_window_ms: int = 0,
+        max_batch: int = 64,
+        codec: WSCodec = JSON_CODEC,
+    ):
+        self.websocket = websocket
+        self.user_email = user_email
+        self.id = uuid.uuid4().hex
+        self.connected_at = time.monotonic()
+        self.last_seen = self.connected_at
+        self.max_queue = max_queue or settings.ws_send_queue_size
+        self.max_low_queue = max_low_queue or settings.ws_send_queue_low_size
+        self.codec = codec
+        self.batch_window = batch_window_ms / 1000
+        self.max_batch = max_batch
+        self.closed = False
+        self.dropped_low = 0
+        #mientras se reenvian los eventos perdidos, los eventos en vivo esperan aqui
+        self.live_backlog: Optional[list] = None
+        self._high: Deque[Payload] = deque()
+        self._low: Deque[Payload] = deque()
+        self._wakeup = asyncio.Event()
+        self._writer: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Arrancar la tarea escritora (llamar despues de accept)"""
+        self._writer = asyncio.create_task(self._write_loop())
+
+    def touch(self):
+        """Registrar actividad del cliente (cualquier frame recibido)"""
+        self.last_seen = time.monotonic()
+
+    def send_frame(self, frame: dict, priority: int = PRIORITY_HIGH) -> bool:
+        """Codificar un frame con el codec de la conexion y encolarlo"""
+        return self.send(self.codec.encode(frame), priority)
+
+    def send(self, payload: Payload, priority: int = PRIORITY_HIGH) -> bool:
+        """Encolar un frame ya codificado. Retorna False si no se encolo."""
+        if self.closed:
+            return False
+
+        if priority == PRIORITY_LOW:
+            if len(self._low) >= self.max_low_queue:
+                self._low.popleft()
+                self.dropped_low += 1
+            self._low.append(payload)
+        else:
+            if len(self._high) >= self.max_queue:
+                websocket_logger.warning(
+                    f"Cola de salida llena para {self.user_email} ({len(self._high)} frames), desconectando cliente lento"
+                )
+                self._abort(SLOW_CONSUMER_CLOSE_CODE, "Cliente demasiado lento")
+                return False
+            self._high.append(payload)
+
+        self._wakeup.set()
+        return True
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        """Detener la tarea escritora y cerrar el socket"""
+        if self._writer and self._writer is not asyncio.current_task():
+            self._writer.cancel()
+        self._writer = None
+        self.closed = True
+        self._high.clear()
+        self._low.clear()
+        try:
+            await self.websocket.close(code=code, reason=reason)
+        except Exception:
+            #el socket puede estar ya cerrado por el cliente
+            pass
+
+    def _abort(self, code: int, reason: str):
+        if self.closed:
+            return
+        self.closed = True
+        asyncio.create_task(self.close(code, reason))
+
+    def _next_payload(self) -> Payload:
+        if not self.batch_window:
+            return self._high.popleft() if self._high else self._low.popleft()
+
+        events = []
+        while len(events) < self.max_batch and (self._high or self._low):
+            events.append(self._high.popleft() if self._high else self._low.popleft())
+        if len(events) == 1:
+            return events[0]
+        #los eventos ya estan codificados: el lote se arma sin volver a codificar
+        return self.codec.join_batch(events)
+
+    async def _write_loop(self):
+        try:
+            while True:
+                await self._wakeup.wait()
+                if self.batch_window:
+                    #margen de latencia para acumular eventos en un solo frame
+                    await asyncio.sleep(self.batch_window)
+                self._wakeup.clear()
+                while self._high or self._low:
+                    payload = self._next_payload()
+                    if self.codec.binary:
+                        send = self.websocket.send_bytes(payload)
+                    else:
+                        send = self.websocket.send_text(payload)
+                    await asyncio.wait_for(send, timeout=settings.ws_send_timeout)
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            websocket_logger.warning(f"Timeout de envio para {self.user_email}, desconectando cliente lento")
+            self._abort(SLOW_CONSUMER_CLOSE_CODE, "Cliente demasiado lento")
+        except Exception as e:
+            websocket_logger.error(f"Error al escribir en WebSocket de {self.user_email}: {e}")
+            self._abort(1011, "Error de envio")
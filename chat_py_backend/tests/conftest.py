@@ -0,0 +1,8 @@
+import os
+import sys
+
+#los tests se ejecutan desde chat_py_backend sin .env: valores minimos para Settings
+os.environ.setdefault("JWT_SECRET", "test-secret-" + "x" * 32)
+os.environ.setdefault("MAIL_FROM", "tests@example.com")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
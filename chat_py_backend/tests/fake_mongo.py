@@ -0,0 +1,194 @@
+"""Coleccion Mongo minima en memoria para los tests (solo lo que usa ChatService al guardar y paginar)"""
+import copy
+from types import SimpleNamespace
+from bson import ObjectId
+from pymongo import InsertOne, ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+def _get(doc, path):
+    for part in path.split("."):
+        if not isinstance(doc, dict):
+            return None
+        doc = doc.get(part)
+    return doc
+
+def _set(doc, path, value):
+    *parents, last = path.split(".")
+    for part in parents:
+        doc = doc.setdefault(part, {})
+    doc[last] = value
+
+_OPERATORS = {
+    "$ne": lambda current, value: current != value,
+    "$gt": lambda current, value: current is not None and current > value,
+    "$gte": lambda current, value: current is not None and current >= value,
+    "$lt": lambda current, value: current is not None and current < value,
+    "$lte": lambda current, value: current is not None and current <= value,
+    "$in": lambda current, value: current in value,
+}
+
+def _matches_value(current, condition):
+    if isinstance(condition, dict) and condition and all(op in _OPERATORS for op in condition):
+        return all(_OPERATORS[op](current, value) for op, value in condition.items())
+    if isinstance(current, list) and not isinstance(condition, list):
+        #igualdad contra un array: basta con que lo contenga
+        return condition in current
+    return current == condition
+
+def _matches(doc, query):
+    for field, condition in query.items():
+        if field == "$or":
+            if not any(_matches(doc, branch) for branch in condition):
+                return False
+        elif not _matches_value(_get(doc, field), condition):
+            return False
+    return True
+
+def _greater(left, right):
+    #como en BSON: null (o un campo ausente) es menor que cualquier valor
+    if left is None:
+        return False
+    return right is None or left > right
+
+_EXPRESSIONS = {
+    "$ifNull": lambda args, evaluate: next((value for value in map(evaluate, args[:-1]) if value is not None), evaluate(args[-1])),
+    "$add": lambda args, evaluate: sum(evaluate(arg) for arg in args),
+    "$size": lambda arg, evaluate: len(evaluate(arg)),
+    "$gt": lambda args, evaluate: _greater(evaluate(args[0]), evaluate(args[1])),
+}
+
+def _evaluate(expression, doc, variables):
+    """Expresiones de agregacion que usan las actualizaciones con pipeline"""
+    def evaluate(value):
+        return _evaluate(value, doc, variables)
+
+    if isinstance(expression, str) and expression.startswith("$$"):
+        return variables[expression[2:]]
+    if isinstance(expression, str) and expression.startswith("$"):
+        return _get(doc, expression[1:])
+    if isinstance(expression, list):
+        return [evaluate(value) for value in expression]
+    if isinstance(expression, dict) and len(expression) == 1:
+        (operator, args), = expression.items()
+        if operator == "$literal":
+            return copy.deepcopy(args)
+        if operator == "$filter":
+            return [
+                item for item in evaluate(args["input"])
+                if _evaluate(args["cond"], doc, {**variables, "this": item})
+            ]
+        if operator in _EXPRESSIONS:
+            return _EXPRESSIONS[operator](args, evaluate)
+    if isinstance(expression, dict):
+        return {key: evaluate(value) for key, value in expression.items()}
+    return expression
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+        self.sort_spec = None
+
+    def sort(self, keys):
+        self.sort_spec = list(keys)
+        for field, direction in reversed(keys):
+            self.docs.sort(key=lambda doc: _get(doc, field), reverse=direction < 0)
+        return self
+
+    def limit(self, count):
+        self.docs = self.docs[:count]
+        return self
+
+    async def to_list(self, length=None):
+        return self.docs[:length]
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self.docs:
+            yield doc
+
+class FakeCollection:
+    def __init__(self, unique=None):
+        self.docs = []
+        #campos con indice unico compuesto, p.ej. ("sender_email", "client_message_id")
+        self.unique = unique
+
+    async def insert_one(self, doc, session=None):
+        if self.unique and all(doc.get(field) is not None for field in self.unique):
+            key = [doc[field] for field in self.unique]
+            if any([other.get(field) for field in self.unique] == key for other in self.docs):
+                raise DuplicateKeyError("E11000 duplicate key", 11000)
+        doc.setdefault("_id", ObjectId())
+        self.docs.append(copy.deepcopy(doc))
+
+    async def find_one(self, query, projection=None):
+        for doc in self.docs:
+            if _matches(doc, query):
+                return copy.deepcopy(doc)
+        return None
+
+    def find(self, query, projection=None):
+        #el ultimo cursor queda accesible para comprobar el orden pedido a Mongo
+        self.last_cursor = FakeCursor([copy.deepcopy(doc) for doc in self.docs if _matches(doc, query)])
+        return self.last_cursor
+
+    async def estimated_document_count(self):
+        return len(self.docs)
+
+    def _apply(self, doc, update):
+        if isinstance(update, list):
+            #pipeline: cada etapa $set se evalua sobre el documento de entrada
+            for stage in update:
+                current = copy.deepcopy(doc)
+                for field, expression in stage["$set"].items():
+                    _set(doc, field, _evaluate(expression, current, {}))
+            return
+        for field, value in update.get("$set", {}).items():
+            _set(doc, field, value)
+        for field, value in update.get("$inc", {}).items():
+            _set(doc, field, (_get(doc, field) or 0) + value)
+        for field, value in update.get("$max", {}).items():
+            current = _get(doc, field)
+            _set(doc, field, value if current is None or value > current else current)
+
+    async def update_one(self, query, update, upsert=False, session=None):
+        await self.find_one_and_update(query, update, upsert=upsert)
+
+    async def find_one_and_update(self, query, update, upsert=False, projection=None,
+                                  return_document=ReturnDocument.BEFORE, session=None):
+        doc = next((doc for doc in self.docs if _matches(doc, query)), None)
+        before = copy.deepcopy(doc)
+        if doc is None:
+            if not upsert:
+                return None
+            doc = {"_id": ObjectId(), **query, **copy.deepcopy(update.get("$setOnInsert", {}) if isinstance(update, dict) else {})}
+            self.docs.append(doc)
+        self._apply(doc, update)
+        return copy.deepcopy(doc) if return_document == ReturnDocument.AFTER else before
+
+    async def bulk_write(self, requests, ordered=True, session=None):
+        #InsertOne y UpdateOne, con los errores por posicion de un BulkWriteError real
+        errors, upserted = [], {}
+        for index, request in enumerate(requests):
+            if isinstance(request, InsertOne):
+                try:
+                    await self.insert_one(request._doc)
+                except DuplicateKeyError as e:
+                    errors.append({"index": index, "code": 11000, "errmsg": str(e)})
+                    if ordered:
+                        break
+                continue
+            existed = any(_matches(doc, request._filter) for doc in self.docs)
+            await self.update_one(request._filter, request._doc, upsert=request._upsert)
+            if not existed and request._upsert:
+                upserted[index] = self.docs[-1]["_id"]
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": len(requests) - len(errors)})
+        return SimpleNamespace(upserted_ids=upserted)
+
+class FakeDatabase:
+    def __init__(self):
+        self.messages = FakeCollection(unique=("sender_email", "client_message_id"))
+        self.chat_rooms = FakeCollection()
+        self.users = FakeCollection()
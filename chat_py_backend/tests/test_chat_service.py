@@ -0,0 +1,87 @@
+import asyncio
+import pytest
+from config.settings import settings
+from services import chat_service as chat_service_module
+from services.chat_service import ChatService
+from tests.fake_mongo import FakeDatabase
+
+@pytest.fixture
+def db(monkeypatch):
+    database = FakeDatabase()
+
+    async def get_database():
+        return database
+    monkeypatch.setattr(chat_service_module, "get_database", get_database)
+
+    async def publish_unread_update(*args):
+        pass
+    monkeypatch.setattr(chat_service_module, "publish_unread_update", publish_unread_update)
+    monkeypatch.setattr(settings, "message_group_commit", False)
+    return database
+
+@pytest.mark.parametrize("mode", ["sequential", "pipelined"])
+def test_retry_with_same_client_message_id_does_not_count_as_unread(db, monkeypatch, mode):
+    monkeypatch.setattr(settings, "message_commit_mode", mode)
+    service = ChatService()
+
+    async def run():
+        await db.users.insert_one({"email": "a@example.com"})
+        await db.users.insert_one({"email": "b@example.com"})
+        first, created = await service.save_message("a@example.com", "b@example.com", "hola", client_message_id="c-1")
+        assert created
+        for _ in range(3):
+            retry, created = await service.save_message("a@example.com", "b@example.com", "hola", client_message_id="c-1")
+            assert not created and retry.id == first.id
+        room = await db.chat_rooms.find_one({"room_id": "a@example.com_b@example.com"})
+        receiver = await db.users.find_one({"email": "b@example.com"})
+        return room, receiver
+
+    room, receiver = asyncio.run(run())
+    assert room["unread"] == {"1": 1}
+    assert receiver["unread_total"] == 1
+    assert len(db.messages.docs) == 1
+
+def test_user_directory_pages_on_the_unique_username_index(db):
+    service = ChatService()
+
+    async def run():
+        for name in ["dora", "alice", "carol", "bob", "erin"]:
+            await db.users.insert_one({"email": f"{name}@example.com", "username": name})
+        pages, after = [], None
+        while True:
+            users, after, total = await service.get_all_users("carol@example.com", limit=2, after=after)
+            #solo username: un desempate por _id obligaria a Mongo a ordenar en memoria
+            assert db.users.last_cursor.sort_spec == [("username", 1)]
+            pages.append([user["username"] for user in users])
+            if after is None:
+                return pages, total
+
+    pages, total = asyncio.run(run())
+    assert pages == [["alice", "bob"], ["dora", "erin"]]
+    assert total == 4
+
+@pytest.mark.parametrize("mode", ["sequential", "pipelined"])
+def test_read_between_insert_and_room_update_is_not_counted_again(db, monkeypatch, mode):
+    monkeypatch.setattr(settings, "message_commit_mode", mode)
+    service = ChatService()
+    insert_one = db.messages.insert_one
+
+    async def insert_then_read(doc, **kwargs):
+        await insert_one(doc, **kwargs)
+        if doc["content"] == "segundo":
+            #b abre la conversacion justo despues de la insercion, antes del $inc de la sala
+            await service.mark_messages_as_read("a@example.com", "b@example.com")
+
+    async def run():
+        await db.users.insert_one({"email": "a@example.com"})
+        await db.users.insert_one({"email": "b@example.com"})
+        await service.save_message("a@example.com", "b@example.com", "primero")
+        monkeypatch.setattr(db.messages, "insert_one", insert_then_read)
+        await service.save_message("a@example.com", "b@example.com", "segundo")
+        room = await db.chat_rooms.find_one({"room_id": "a@example.com_b@example.com"})
+        receiver = await db.users.find_one({"email": "b@example.com"})
+        return room, receiver
+
+    room, receiver = asyncio.run(run())
+    assert room["unread"] == {"1": 0}
+    assert receiver["unread_total"] == 0
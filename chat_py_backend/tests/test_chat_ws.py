@@ -0,0 +1,52 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from config.settings import settings
+from middleware.security import ws_rate_limiter
+from model.chat import Message
+from routes import chat_ws
+
+class _Connection:
+    #solo lo que usa el registro de conexiones (hashable por identidad)
+    def __init__(self, connection_id, connected_at):
+        self.id = connection_id
+        self.user_email = "a@example.com"
+        self.connected_at = connected_at
+        self.closed_with = None
+
+    async def close(self, code=1000, reason=""):
+        self.closed_with = code
+
+def test_evicted_device_releases_its_flood_bucket(monkeypatch):
+    monkeypatch.setattr(settings, "ws_max_devices_per_user", 1)
+    oldest, newest = _Connection("old", 1), _Connection("new", 2)
+    chat_ws.connected_users["a@example.com"] = {oldest, newest}
+    try:
+        ws_rate_limiter.is_allowed(oldest.id, oldest.user_email, "message")
+        asyncio.run(chat_ws.enforce_device_limit("a@example.com"))
+        #el finally del endpoint de la conexion expulsada vuelve a desregistrarla
+        chat_ws.unregister_connection(oldest)
+
+        assert oldest.closed_with == 1000
+        assert chat_ws.connected_users["a@example.com"] == {newest}
+        assert f"conn:{oldest.id}" not in ws_rate_limiter.buckets
+    finally:
+        chat_ws.connected_users.pop("a@example.com", None)
+        ws_rate_limiter.clear()
+
+def test_replay_interleaves_receipts_with_messages_by_time():
+    base = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    def message(message_id, seconds):
+        return Message(
+            id=message_id, sender_email="b@example.com", receiver_email="a@example.com",
+            content=message_id, timestamp=base + timedelta(seconds=seconds)
+        )
+
+    missed = {
+        "messages": [message("m1", 1), message("m2", 2), message("m3", 5)],
+        #b leyo hasta m2 (incluido) antes de que llegara m3
+        "receipts": [{"reader_email": "b@example.com", "timestamp": base + timedelta(seconds=2)}],
+        "truncated": False,
+    }
+    order = [frame.get("id") or frame["type"] for frame in chat_ws.replay_frames(missed)]
+    assert order == ["m1", "m2", "read_receipt", "m3"]
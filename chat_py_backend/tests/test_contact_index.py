@@ -0,0 +1,60 @@
+import asyncio
+import pytest
+from services import contact_index as contact_index_module
+from services.contact_index import ContactIndex
+from tests.fake_mongo import FakeDatabase
+
+@pytest.fixture
+def db(monkeypatch):
+    database = FakeDatabase()
+
+    async def get_database():
+        #cede el control como una conexion real: las cargas simultaneas se intercalan
+        await asyncio.sleep(0)
+        return database
+    monkeypatch.setattr(contact_index_module, "get_database", get_database)
+    return database
+
+def test_room_created_during_load_is_not_lost(db, monkeypatch):
+    index = ContactIndex()
+    find = db.chat_rooms.find
+
+    def find_then_room_created(query, projection=None):
+        #la consulta ya se lanzo cuando llega por pub/sub la sala nueva con carol
+        cursor = find(query, projection)
+        index.add_room("alice@example.com", "carol@example.com")
+        return cursor
+    monkeypatch.setattr(db.chat_rooms, "find", find_then_room_created)
+
+    async def run():
+        await db.chat_rooms.insert_one({"participants": ["alice@example.com", "bob@example.com"]})
+        return await index.get_contacts("alice@example.com")
+
+    assert asyncio.run(run()) == {"bob@example.com", "carol@example.com"}
+    assert index._pending == {} and index._loads == {}
+
+def test_rooms_created_after_load_update_the_cache(db):
+    index = ContactIndex()
+
+    async def run():
+        await db.chat_rooms.insert_one({"participants": ["alice@example.com", "bob@example.com"]})
+        contacts = await index.get_contacts("alice@example.com")
+        index.add_room("carol@example.com", "alice@example.com")
+        #carol no esta en cache: no se guarda nada para ella
+        assert "carol@example.com" not in index._contacts
+        return contacts
+
+    assert asyncio.run(run()) == {"bob@example.com", "carol@example.com"}
+
+def test_concurrent_loads_share_one_cache_entry(db):
+    index = ContactIndex()
+
+    async def run():
+        await db.chat_rooms.insert_one({"participants": ["alice@example.com", "bob@example.com"]})
+        first, second = await asyncio.gather(
+            index.get_contacts("alice@example.com"), index.get_contacts("alice@example.com")
+        )
+        assert first is second
+        return first
+
+    assert asyncio.run(run()) == {"bob@example.com"}
@@ -0,0 +1,63 @@
+import base64
+import json
+from datetime import datetime, timezone
+import pytest
+from bson import ObjectId
+from utils.cursor import decode_cursor, decode_key_cursor, encode_cursor, encode_key_cursor, keyset_filter
+
+OID = "0123456789abcdef01234567"
+
+def _raw_cursor(payload) -> str:
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).rstrip(b"=").decode()
+
+def test_roundtrip_datetime_and_string_keys():
+    timestamp = datetime(2024, 5, 1, 12, 30, 15, 123000, tzinfo=timezone.utc)
+    assert decode_cursor(encode_cursor(timestamp, OID), datetime) == (timestamp, ObjectId(OID))
+    assert decode_cursor(encode_cursor("alice", OID), str) == ("alice", ObjectId(OID))
+
+@pytest.mark.parametrize("payload", [
+    ["d", 10 ** 30, OID],                 #fecha fuera de rango (OverflowError)
+    ["d", -10 ** 30, OID],
+    ["d", 1.5e300, OID],                  #no es un entero de milisegundos
+    ["d", True, OID],
+    ["d", "2024-01-01", OID],
+    ["s", {"$gt": ""}, OID],              #operador de Mongo como clave
+    ["s", ["a"], OID],
+    ["s", None, OID],
+    ["s", "alice", {"$ne": None}],        #operador como id
+    ["s", "alice", "not-an-object-id"],
+    ["x", "alice", OID],
+    ["s", "alice"],
+    {"kind": "s"},
+    "texto",
+    None,
+])
+def test_hostile_payloads_are_rejected(payload):
+    with pytest.raises(ValueError, match="Cursor de paginación inválido"):
+        decode_cursor(_raw_cursor(payload))
+
+@pytest.mark.parametrize("cursor", ["", "!!!", "a", "bm90LWpzb24", "%00"])
+def test_garbage_is_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+def test_key_type_must_match_the_listing():
+    string_cursor = encode_cursor("alice", OID)
+    date_cursor = encode_cursor(datetime(2024, 1, 1, tzinfo=timezone.utc), OID)
+    with pytest.raises(ValueError):
+        decode_cursor(string_cursor, datetime)
+    with pytest.raises(ValueError):
+        decode_cursor(date_cursor, str)
+
+def test_decoded_key_only_yields_scalar_range_filters():
+    key, object_id = decode_cursor(encode_cursor("alice", OID), str)
+    assert keyset_filter("username", key, object_id, 1) == {"$or": [
+        {"username": {"$gt": "alice"}},
+        {"username": "alice", "_id": {"$gt": ObjectId(OID)}}
+    ]}
+
+def test_key_cursor_roundtrip_and_hostile_payloads():
+    assert decode_key_cursor(encode_key_cursor("alice"), str) == "alice"
+    for payload in [["s", {"$gt": ""}], ["s", "alice", OID], ["d", 10 ** 30], ["d", 0]]:
+        with pytest.raises(ValueError, match="Cursor de paginación inválido"):
+            decode_key_cursor(_raw_cursor(payload), str)
@@ -0,0 +1,66 @@
+import asyncio
+import time
+from services.heartbeat import HeartbeatScheduler
+
+class _Connection:
+    #lo que el heartbeat usa de WSConnection
+    def __init__(self, user_email):
+        self.user_email = user_email
+        self.last_seen = time.monotonic()
+        self.closed = False
+        self.sent = []
+
+    def send_frame(self, frame, priority=None):
+        self.sent.append(frame["type"])
+
+def _scheduler():
+    evicted = []
+
+    async def on_evict(connection):
+        connection.closed = True
+        evicted.append(connection.user_email)
+
+    return HeartbeatScheduler(on_evict, interval=0.05, timeout=0.15), evicted
+
+def test_idle_connection_is_pinged_then_evicted():
+    async def scenario():
+        scheduler, evicted = _scheduler()
+        connection = _Connection("a@example.com")
+        scheduler.register(connection)
+        await asyncio.sleep(0.08)
+        assert connection.sent == ["ping"] and evicted == []
+
+        await asyncio.sleep(0.12)
+        assert evicted == ["a@example.com"]
+        await scheduler.stop()
+
+    asyncio.run(scenario())
+
+def test_active_connection_is_neither_pinged_nor_evicted():
+    async def scenario():
+        scheduler, evicted = _scheduler()
+        connection = _Connection("a@example.com")
+        scheduler.register(connection)
+        for _ in range(8):
+            await asyncio.sleep(0.025)
+            connection.last_seen = time.monotonic()
+        assert connection.sent == [] and evicted == []
+        await scheduler.stop()
+
+    asyncio.run(scenario())
+
+def test_closed_connections_are_dropped_lazily():
+    async def scenario():
+        scheduler, evicted = _scheduler()
+        closed = _Connection("a@example.com")
+        idle = _Connection("b@example.com")
+        scheduler.register(closed)
+        scheduler.register(idle)
+        closed.closed = True
+        await asyncio.sleep(0.2)
+        assert closed.sent == [] and evicted == ["b@example.com"]
+        #sin conexiones vivas el heap queda vacio y la tarea espera
+        assert scheduler._heap == []
+        await scheduler.stop()
+
+    asyncio.run(scenario())
@@ -0,0 +1,56 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from bson import ObjectId
+from config.settings import settings
+from services import chat_service as chat_service_module
+from services.chat_service import ChatService
+from services.message_archive import SegmentStore
+from tests.fake_mongo import FakeDatabase
+
+def _messages(room_id, count):
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    return [
+        {
+            "_id": ObjectId(), "room_id": room_id, "sender_email": "a", "receiver_email": "b",
+            "content": f"{room_id}-{i}", "timestamp": start + timedelta(seconds=i)
+        }
+        for i in range(count)
+    ]
+
+def test_concurrent_reads_share_the_index_cache(tmp_path):
+    #mas salas que entradas en la cache: las lecturas en paralelo expulsan sin parar
+    store = SegmentStore(str(tmp_path), cache_size=4)
+    rooms = [f"room{i}" for i in range(32)]
+    for room_id in rooms:
+        store.append(room_id, _messages(room_id, 20))
+
+    def read(room_id):
+        return [doc["content"] for doc in store.read_page(room_id, 100, None, 1)]
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        pages = list(pool.map(read, rooms * 50))
+
+    assert pages == [[f"{room_id}-{i}" for i in range(20)] for room_id in rooms * 50]
+    assert len(store._indexes) <= 4
+
+def test_history_skips_the_archive_when_disabled(monkeypatch):
+    database = FakeDatabase()
+
+    async def get_database():
+        return database
+    monkeypatch.setattr(chat_service_module, "get_database", get_database)
+    monkeypatch.setattr(settings, "message_archive_enabled", False)
+
+    def read_page(*args):
+        raise AssertionError("el archivo no debe leerse si esta desactivado")
+    monkeypatch.setattr(chat_service_module.message_archive, "read_page", read_page)
+
+    async def run():
+        for doc in _messages("a_b", 3):
+            await database.messages.insert_one(doc)
+        return await ChatService().get_chat_history("a", "b", limit=10)
+
+    messages, next_cursor = asyncio.run(run())
+    assert [message.content for message in messages] == ["a_b-0", "a_b-1", "a_b-2"]
+    assert next_cursor is None
@@ -0,0 +1,131 @@
+import asyncio
+from datetime import datetime, timezone
+import pytest
+from pymongo.errors import DuplicateKeyError
+from services import chat_service as chat_service_module
+from services import message_writer as message_writer_module
+from services.chat_service import ChatService
+from services.contact_index import contact_index
+from services.message_writer import GroupCommitWriter
+from tests.fake_mongo import FakeDatabase
+
+@pytest.fixture
+def db(monkeypatch):
+    database = FakeDatabase()
+
+    async def get_database():
+        return database
+    monkeypatch.setattr(message_writer_module, "get_database", get_database)
+
+    async def register_room(*participants):
+        pass
+    monkeypatch.setattr(contact_index, "register_room", register_room)
+
+    database.published = []
+
+    async def publish_unread_update(receiver_email, other_email, count, total):
+        database.published.append((receiver_email, count, total))
+    monkeypatch.setattr(message_writer_module, "publish_unread_update", publish_unread_update)
+    return database
+
+def _message(content, client_message_id=None):
+    doc = {
+        "room_id": "a@example.com_b@example.com",
+        "sender_email": "a@example.com",
+        "receiver_email": "b@example.com",
+        "content": content,
+        "timestamp": datetime.now(timezone.utc),
+        "is_read": False
+    }
+    if client_message_id:
+        doc["client_message_id"] = client_message_id
+    return doc
+
+def _write_batch(writer, *docs):
+    return asyncio.gather(*(writer.write(doc) for doc in docs), return_exceptions=True)
+
+def test_duplicate_inside_a_batch_fails_alone(db):
+    writer = GroupCommitWriter(max_batch=3, interval_ms=1000)
+
+    async def run():
+        await db.users.insert_one({"email": "b@example.com"})
+        await db.messages.insert_one(_message("original", "c-1"))
+        return await _write_batch(writer, _message("hola"), _message("reintento", "c-1"), _message("adios"))
+
+    first, duplicate, last = asyncio.run(run())
+    assert isinstance(duplicate, DuplicateKeyError)
+    assert not isinstance(first, Exception) and not isinstance(last, Exception)
+    assert len(db.messages.docs) == 3
+    room = db.chat_rooms.docs[0]
+    assert room["unread"] == {"1": 2}
+    assert room["last_message"]["content"] == "adios"
+    assert db.users.docs[0]["unread_total"] == 2
+    assert db.published == [("b@example.com", 2, 2)]
+
+def test_room_failure_does_not_fail_persisted_messages(db):
+    writer = GroupCommitWriter(max_batch=2, interval_ms=1000)
+
+    async def broken_bulk_write(*args, **kwargs):
+        raise RuntimeError("chat_rooms no disponible")
+    db.chat_rooms.bulk_write = broken_bulk_write
+
+    async def run():
+        await db.users.insert_one({"email": "b@example.com"})
+        return await _write_batch(writer, _message("uno"), _message("dos"))
+
+    results = asyncio.run(run())
+    assert all(not isinstance(result, Exception) for result in results)
+    assert [doc["_id"] for doc in db.messages.docs] == results
+    #los pasos siguientes se ejecutan aunque falle el de las salas
+    assert db.users.docs[0]["unread_total"] == 2
+
+def test_ack_does_not_wait_for_unread_publish(db, monkeypatch):
+    writer = GroupCommitWriter(max_batch=1, interval_ms=1000)
+    publishing = asyncio.Event()
+    release = asyncio.Event()
+
+    async def slow_publish(*args):
+        publishing.set()
+        await release.wait()
+    monkeypatch.setattr(message_writer_module, "publish_unread_update", slow_publish)
+
+    async def run():
+        #la confirmacion llega aunque la publicacion siga bloqueada
+        message_id = await asyncio.wait_for(writer.write(_message("hola")), 1)
+        await asyncio.wait_for(publishing.wait(), 1)
+        release.set()
+        return message_id
+
+    assert asyncio.run(run()) == db.messages.docs[0]["_id"]
+
+def test_read_landing_before_the_room_update_is_not_counted_again(db, monkeypatch):
+    writer = GroupCommitWriter(max_batch=1, interval_ms=1000)
+    service = ChatService()
+
+    async def get_database():
+        return db
+    monkeypatch.setattr(chat_service_module, "get_database", get_database)
+
+    async def publish_unread_update(*args):
+        pass
+    monkeypatch.setattr(chat_service_module, "publish_unread_update", publish_unread_update)
+    bulk_write = db.messages.bulk_write
+
+    async def insert_then_read(requests, **kwargs):
+        result = await bulk_write(requests, **kwargs)
+        await service.mark_messages_as_read("a@example.com", "b@example.com")
+        return result
+
+    async def run():
+        await db.users.insert_one({"email": "b@example.com"})
+        await writer.write(_message("primero"))
+        monkeypatch.setattr(db.messages, "bulk_write", insert_then_read)
+        await writer.write(_message("segundo"))
+        #la confirmacion llega antes que la sala: esperar a que termine el lote
+        async with writer._lock:
+            pass
+
+    asyncio.run(run())
+    assert db.chat_rooms.docs[0]["last_message"]["content"] == "segundo"
+    assert db.chat_rooms.docs[0]["unread"] == {"1": 0}
+    assert db.users.docs[0]["unread_total"] == 0
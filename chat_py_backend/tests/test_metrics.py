@@ -0,0 +1,17 @@
+from fastapi.testclient import TestClient
+from config.settings import settings
+import main
+
+client = TestClient(main.app)
+
+def test_metrics_disabled_without_token(monkeypatch):
+    monkeypatch.setattr(settings, "metrics_token", "")
+    assert client.get("/metrics").status_code == 404
+
+def test_metrics_require_the_token(monkeypatch):
+    monkeypatch.setattr(settings, "metrics_token", "s3cret")
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer otro"}).status_code == 401
+    response = client.get("/metrics", headers={"Authorization": "Bearer s3cret"})
+    assert response.status_code == 200
+    assert isinstance(response.json(), dict)
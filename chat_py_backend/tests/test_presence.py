@@ -0,0 +1,101 @@
+import asyncio
+import pytest
+from services import presence as presence_module
+from services.contact_index import contact_index
+from services.presence import PresenceManager
+from services.pubsub import PubSubBackend
+
+class _Cluster(PubSubBackend):
+    #pub/sub compartido por varios "workers" dentro del mismo proceso
+    def __init__(self):
+        super().__init__()
+        self.workers = []
+
+    async def publish(self, channel, message):
+        for worker in self.workers:
+            await worker.handle_devices_changed(channel, message)
+
+@pytest.fixture
+def cluster(monkeypatch):
+    bus = _Cluster()
+    monkeypatch.setattr(presence_module, "pubsub", bus)
+
+    async def get_contacts(user_email):
+        return {"b@example.com"}
+    monkeypatch.setattr(contact_index, "get_contacts", get_contacts)
+    return bus
+
+def _workers(bus, count):
+    announced = []
+
+    async def publish(recipients, frame):
+        for status in frame.get("statuses") or [frame]:
+            announced.append(status["is_online"])
+
+    bus.workers = [PresenceManager(publish, grace_seconds=0.05, coalesce_ms=0) for _ in range(count)]
+    return bus.workers, announced
+
+async def _settle():
+    await asyncio.sleep(0.1)
+
+def test_user_stays_online_while_another_worker_has_devices(cluster):
+    async def scenario():
+        (first, second), announced = _workers(cluster, 2)
+        first.user_connected("a@example.com")
+        second.user_connected("a@example.com")
+        await _settle()
+        first.user_disconnected("a@example.com")
+        await _settle()
+        assert announced == [True]
+
+        second.user_disconnected("a@example.com")
+        await _settle()
+        assert announced == [True, False]
+
+    asyncio.run(scenario())
+
+def test_reconnect_to_another_worker_within_grace_is_silent(cluster):
+    async def scenario():
+        (first, second), announced = _workers(cluster, 2)
+        first.user_connected("a@example.com")
+        await _settle()
+        first.user_disconnected("a@example.com")
+        await asyncio.sleep(0)
+        second.user_connected("a@example.com")
+        await _settle()
+        assert announced == [True]
+
+    asyncio.run(scenario())
+
+def test_stopping_worker_announces_its_users_offline(cluster):
+    async def scenario():
+        (leaving, staying), announced = _workers(cluster, 2)
+        leaving.user_connected("a@example.com")
+        leaving.user_connected("c@example.com")
+        staying.user_connected("c@example.com")
+        await _settle()
+        assert announced == [True, True]
+
+        await leaving.stop()
+        #sin esperar al periodo de gracia, antes de que se cierre el pub/sub
+        assert announced == [True, True, False]
+        assert staying._workers == {"c@example.com": {staying.worker_id}}
+        await _settle()
+        assert announced == [True, True, False]
+
+    asyncio.run(scenario())
+
+def test_stopping_worker_flushes_its_pending_offline_announcements(cluster):
+    async def scenario():
+        (leaving, staying), announced = _workers(cluster, 2)
+        leaving.user_connected("a@example.com")
+        await _settle()
+        leaving.user_disconnected("a@example.com")
+        await asyncio.sleep(0)
+        assert "a@example.com" in staying._pending_offline
+
+        await leaving.stop()
+        assert announced == [True, False]
+        assert staying._pending_offline == {}
+
+    asyncio.run(scenario())
@@ -0,0 +1,90 @@
+import asyncio
+import os
+import socket
+from services.pubsub import UnixSocketPubSub
+
+async def _pair(socket_dir):
+    sender, receiver = UnixSocketPubSub(str(socket_dir)), UnixSocketPubSub(str(socket_dir))
+    await sender.start()
+    await receiver.start()
+    return sender, receiver
+
+async def _wait_for(received, count, timeout=10):
+    async def wait():
+        while len(received) < count:
+            await asyncio.sleep(0.01)
+    await asyncio.wait_for(wait(), timeout)
+
+def test_large_fanout_is_delivered(tmp_path):
+    async def run():
+        sender, receiver = await _pair(tmp_path)
+        received = []
+
+        async def handler(channel, message):
+            received.append(message)
+        receiver.subscribe("ws:deliver", handler)
+        sender.subscribe("ws:deliver", lambda channel, message: asyncio.sleep(0))
+
+        recipients = [f"user{i}@example.com" for i in range(10_000)]
+        await sender.publish("ws:deliver", {"to": recipients, "frame": {"type": "private_message"}})
+        await _wait_for(received, 1)
+        await sender.stop()
+        await receiver.stop()
+        return received
+
+    received = asyncio.run(run())
+    assert received[0]["to"] == [f"user{i}@example.com" for i in range(10_000)]
+
+def test_burst_is_delivered_in_order(tmp_path):
+    async def run():
+        sender, receiver = await _pair(tmp_path)
+        received = []
+
+        async def handler(channel, message):
+            received.append(message["n"])
+        receiver.subscribe("ws:deliver", handler)
+        sender.subscribe("ws:deliver", lambda channel, message: asyncio.sleep(0))
+
+        for n in range(5_000):
+            await sender.publish("ws:deliver", {"n": n, "frame": {"type": "message_sent"}})
+        await _wait_for(received, 5_000)
+        await sender.stop()
+        await receiver.stop()
+        return received
+
+    assert asyncio.run(run()) == list(range(5_000))
+
+def test_concurrent_publishes_are_all_delivered(tmp_path):
+    async def run():
+        sender, receiver = await _pair(tmp_path)
+        received = set()
+
+        async def handler(channel, message):
+            received.add(message["n"])
+        receiver.subscribe("ws:deliver", handler)
+        sender.subscribe("ws:deliver", lambda channel, message: asyncio.sleep(0))
+
+        await asyncio.gather(*(sender.publish("ws:deliver", {"n": n}) for n in range(2_000)))
+        await _wait_for(received, 2_000)
+        await sender.stop()
+        await receiver.stop()
+        return received
+
+    assert asyncio.run(run()) == set(range(2_000))
+
+def test_dead_worker_socket_is_removed(tmp_path):
+    #socket de un worker muerto: el fichero sigue en el directorio pero nadie escucha
+    dead_path = str(tmp_path / "999-dead.sock")
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(dead_path)
+    stale.close()
+
+    async def run():
+        sender = UnixSocketPubSub(str(tmp_path))
+        await sender.start()
+        sender.subscribe("ws:deliver", lambda channel, message: asyncio.sleep(0))
+        await sender.publish("ws:deliver", {"n": 1})
+        await sender.stop()
+
+    asyncio.run(run())
+    assert not os.path.exists(dead_path)
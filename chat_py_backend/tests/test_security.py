@@ -0,0 +1,79 @@
+import pytest
+from pydantic import ValidationError
+from config.settings import Settings, settings
+from middleware import security
+from middleware.security import HandshakeAdmission, TokenBucket, WSFloodControl
+
+class _Clock:
+    #reloj monotono controlado por el test
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = _Clock()
+    monkeypatch.setattr(security.time, "monotonic", fake)
+    return fake
+
+def test_bucket_allows_a_burst_then_refills_at_its_rate(clock):
+    bucket = TokenBucket(rate=2, capacity=4)
+    assert [bucket.try_acquire() for _ in range(5)] == [True] * 4 + [False]
+    assert bucket.retry_after() == pytest.approx(0.5)
+
+    clock.now += 0.5
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
+
+    #el saldo nunca supera la rafaga aunque pase mucho tiempo
+    clock.now += 60
+    assert [bucket.try_acquire() for _ in range(5)] == [True] * 4 + [False]
+
+def test_handshake_admission_limits_inflight_and_rate(clock):
+    admission = HandshakeAdmission(max_inflight=2, rate=1, burst=3)
+    assert admission.try_admit() and admission.try_admit()
+    #sin huecos de validacion libres
+    assert not admission.try_admit()
+    admission.release()
+    assert admission.try_admit()
+    admission.release()
+    admission.release()
+    #rafaga agotada: hay que esperar al siguiente token
+    assert not admission.try_admit()
+    assert settings.ws_handshake_retry_min_ms <= admission.retry_after_ms() <= settings.ws_handshake_retry_max_ms
+    clock.now += 1
+    assert admission.try_admit()
+
+def test_flood_control_per_connection_and_per_user(clock):
+    flood = WSFloodControl(budgets={"message": [1, 2], "other": [1, 1]}, user_factor=1.5)
+    assert flood.is_allowed("c1", "a@example.com", "message")
+    assert flood.is_allowed("c1", "a@example.com", "message")
+    assert not flood.is_allowed("c1", "a@example.com", "message")
+    #otra conexion del mismo usuario tiene saldo propio, pero el del usuario (3) se agota
+    assert flood.is_allowed("c2", "a@example.com", "message")
+    assert not flood.is_allowed("c2", "a@example.com", "message")
+    clock.now += 1
+    assert flood.is_allowed("c2", "a@example.com", "message")
+
+def test_unknown_frame_types_share_the_default_budget(clock):
+    flood = WSFloodControl(budgets={"message": [1, 2], "other": [1, 1]})
+    assert flood.is_allowed("c1", "a@example.com", "nuevo_tipo")
+    assert not flood.is_allowed("c1", "a@example.com", {"no": "es un str"})
+    assert set(flood.buckets["conn:c1"]) == {"other"}
+
+def test_forgotten_buckets_are_evicted(clock):
+    flood = WSFloodControl(budgets={"message": [1, 1], "other": [1, 1]})
+    flood.is_allowed("c1", "a@example.com", "message")
+    flood.forget_connection("c1")
+    flood.forget_user("a@example.com")
+    assert flood.buckets == {}
+    #una conexion nueva empieza con la rafaga completa
+    assert flood.is_allowed("c1", "a@example.com", "message")
+
+def test_budgets_without_a_default_are_rejected_at_startup():
+    with pytest.raises(ValidationError, match="other"):
+        Settings(ws_inbound_budgets={"message": [5, 20]})
+    with pytest.raises(ValidationError):
+        Settings(ws_inbound_budgets={"message": [0, 20], "other": [2, 10]})
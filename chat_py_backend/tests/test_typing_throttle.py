@@ -0,0 +1,70 @@
+import asyncio
+from services.typing_throttle import TypingThrottle
+
+def _throttle(**timings):
+    forwarded = []
+
+    async def publish(recipients, frame):
+        forwarded.append((recipients[0], frame["sender_email"], frame["is_typing"]))
+
+    return TypingThrottle(publish, **timings), forwarded
+
+def test_repeated_starts_are_collapsed_until_the_refresh():
+    async def scenario():
+        throttle, forwarded = _throttle(refresh_seconds=0.05, expire_seconds=1, min_interval_ms=0)
+        for _ in range(5):
+            await throttle.handle("a@example.com", "b@example.com", True)
+        assert forwarded == [("b@example.com", "a@example.com", True)]
+
+        await asyncio.sleep(0.06)
+        await throttle.handle("a@example.com", "b@example.com", True)
+        assert len(forwarded) == 2
+
+    asyncio.run(scenario())
+
+def test_stop_is_forwarded_only_for_an_active_indicator():
+    async def scenario():
+        throttle, forwarded = _throttle(refresh_seconds=1, expire_seconds=1, min_interval_ms=0)
+        await throttle.handle("a@example.com", "b@example.com", False)
+        assert forwarded == []
+
+        await throttle.handle("a@example.com", "b@example.com", True)
+        await throttle.handle("a@example.com", "b@example.com", False)
+        await throttle.handle("a@example.com", "b@example.com", False)
+        assert [is_typing for _, _, is_typing in forwarded] == [True, False]
+
+    asyncio.run(scenario())
+
+def test_start_right_after_a_stop_is_dropped():
+    async def scenario():
+        throttle, forwarded = _throttle(refresh_seconds=1, expire_seconds=1, min_interval_ms=50)
+        await throttle.handle("a@example.com", "b@example.com", True)
+        await throttle.handle("a@example.com", "b@example.com", False)
+        await throttle.handle("a@example.com", "b@example.com", True)
+        assert [is_typing for _, _, is_typing in forwarded] == [True, False]
+
+        #otro par no comparte el intervalo
+        await throttle.handle("a@example.com", "c@example.com", True)
+        await asyncio.sleep(0.06)
+        await throttle.handle("a@example.com", "b@example.com", True)
+        assert [is_typing for _, _, is_typing in forwarded] == [True, False, True, True]
+
+    asyncio.run(scenario())
+
+def test_indicator_expires_without_a_client_stop():
+    async def scenario():
+        throttle, forwarded = _throttle(refresh_seconds=1, expire_seconds=0.05, min_interval_ms=0)
+        await throttle.handle("a@example.com", "b@example.com", True)
+        await asyncio.sleep(0.03)
+        #un refresco extiende la caducidad
+        await throttle.handle("a@example.com", "b@example.com", True)
+        await asyncio.sleep(0.03)
+        assert forwarded == [("b@example.com", "a@example.com", True)]
+
+        await asyncio.sleep(0.05)
+        assert forwarded[-1] == ("b@example.com", "a@example.com", False)
+        #el stop tardio del cliente ya no se reenvia
+        await throttle.handle("a@example.com", "b@example.com", False)
+        assert len(forwarded) == 2
+
+    asyncio.run(scenario())
@@ -0,0 +1,96 @@
+import asyncio
+import threading
+from bson import ObjectId
+from services import user_search as user_search_module
+from services.pubsub import InProcessPubSub
+from services.user_search import USERS_CHANNEL, UserSearchIndex
+from tests.fake_mongo import FakeDatabase
+
+USERS = [
+    ("alice@example.com", "alice"),
+    ("alina@example.com", "alina"),
+    ("bob@example.com", "bobby"),
+    ("carol@example.com", "carolina"),
+    ("zed@mail.com", None),
+]
+
+def _built_index():
+    db = FakeDatabase()
+
+    async def run():
+        for email, username in USERS:
+            await db.users.insert_one({"_id": ObjectId(), "email": email, "username": username})
+        index = UserSearchIndex()
+        await index.build(db)
+        return index
+    return asyncio.run(run())
+
+def _emails(results):
+    return [user["email"] for user in results]
+
+def test_build_sorts_keys_once_like_incremental_upserts():
+    index = _built_index()
+    incremental = UserSearchIndex()
+    for user in index._users.values():
+        incremental.upsert(user)
+    assert index._sorted == incremental._sorted
+    assert len(index) == len(USERS)
+
+def test_prefix_search_on_username_and_email_local_part():
+    index = _built_index()
+    assert _emails(index.search("ali")) == ["alice@example.com", "alina@example.com"]
+    assert _emails(index.search("ZE")) == ["zed@mail.com"]
+    assert _emails(index.search("ali", exclude_email="alice@example.com")) == ["alina@example.com"]
+    assert index.search("   ") == []
+
+def test_typo_tolerant_search_through_trigrams():
+    index = _built_index()
+    #una transposicion y una sustitucion respecto a "carolina"
+    assert _emails(index.search("caorl")) == ["carol@example.com"]
+    assert _emails(index.search("carolinq")) == ["carol@example.com"]
+    #por debajo de 4 caracteres solo hay busqueda por prefijo
+    assert index.search("bbo") == []
+
+def test_published_changes_reach_every_worker_index(monkeypatch):
+    bus = InProcessPubSub()
+    monkeypatch.setattr(user_search_module, "pubsub", bus)
+    publisher, other_worker = UserSearchIndex(), UserSearchIndex()
+    bus.subscribe(USERS_CHANNEL, other_worker.handle_user_updated)
+
+    async def run():
+        user = {"id": "1", "email": "dave@example.com", "username": "dave", "avatar_url": None}
+        await publisher.publish_user(user)
+        assert _emails(other_worker.search("dav")) == ["dave@example.com"]
+
+        #cambio de email: la entrada anterior desaparece
+        renamed = {**user, "email": "david@example.com", "username": "david"}
+        await publisher.publish_user(renamed, previous_email="dave@example.com")
+        assert _emails(other_worker.search("dav")) == ["david@example.com"]
+        assert len(other_worker) == 1
+
+    asyncio.run(run())
+
+def test_changes_published_while_building_are_kept(monkeypatch):
+    db = FakeDatabase()
+    index = UserSearchIndex()
+    gate = threading.Event()
+    built_from = UserSearchIndex._built_from
+
+    def slow_build(users):
+        gate.wait(5)
+        return built_from(users)
+    monkeypatch.setattr(UserSearchIndex, "_built_from", staticmethod(slow_build))
+
+    async def run():
+        await db.users.insert_one({"_id": ObjectId(), "email": "alice@example.com", "username": "alice"})
+        build = asyncio.create_task(index.build(db))
+        while index._changes_during_build is None:
+            await asyncio.sleep(0.001)
+        #alta recibida mientras la construccion sigue en el hilo
+        user = {"id": "2", "email": "alina@example.com", "username": "alina", "avatar_url": None}
+        await index.handle_user_updated(USERS_CHANNEL, {"user": user})
+        gate.set()
+        await build
+
+    asyncio.run(run())
+    assert _emails(index.search("ali")) == ["alice@example.com", "alina@example.com"]
@@ -0,0 +1,74 @@
+import pytest
+from utils import ws_codec
+from utils.ws_codec import JSON_CODEC, MSGPACK_CODEC, MSGPACK_SUBPROTOCOL, KeyRenamer, negotiate_codec
+
+pytestmark = pytest.mark.skipif(MSGPACK_CODEC is None, reason="msgpack no instalado")
+
+MESSAGE = {
+    "type": "message",
+    "id": "665f1c2a9b1e8a3d4c5b6a79",
+    "sender_email": "a@example.com",
+    "receiver_email": "b@example.com",
+    "content": "hola",
+    "timestamp": "2026-01-15T10:32:11.123456+00:00",
+    "is_read": False,
+    "client_message_id": "c-1",
+}
+
+FRAMES = [
+    MESSAGE,
+    {"type": "typing", "sender_email": "a@example.com", "is_typing": True},
+    {"type": "error", "message": "Formato de mensaje inválido", "rejected_type": "message"},
+    {"type": "user_status", "statuses": [
+        {"user_email": "a@example.com", "is_online": True},
+        {"user_email": "b@example.com", "is_online": False},
+    ]},
+    {"type": "batch", "ops": [MESSAGE, {"type": "read", "sender_email": "b@example.com"}]},
+]
+
+@pytest.mark.parametrize("codec", [JSON_CODEC, MSGPACK_CODEC], ids=lambda codec: codec.name)
+@pytest.mark.parametrize("frame", FRAMES, ids=lambda frame: frame["type"])
+def test_frames_round_trip(codec, frame):
+    assert codec.decode(codec.encode(frame)) == frame
+
+def test_msgpack_uses_short_tags_including_nested_frames():
+    import msgpack
+    frame = FRAMES[3]
+    assert msgpack.unpackb(MSGPACK_CODEC.encode(frame)) == {
+        "t": "user_status",
+        "ss": [{"u": "a@example.com", "o": True}, {"u": "b@example.com", "o": False}],
+    }
+
+@pytest.mark.parametrize("codec", [JSON_CODEC, MSGPACK_CODEC], ids=lambda codec: codec.name)
+def test_joined_batch_decodes_to_the_events(codec):
+    events = [MESSAGE, FRAMES[1]]
+    batch = codec.decode(codec.join_batch([codec.encode(event) for event in events]))
+    assert batch == {"type": "batch", "events": events}
+
+def test_same_shape_with_other_values_reuses_the_mapping():
+    renamer = KeyRenamer(ws_codec.FIELD_TAGS, ws_codec.NESTED_FIELDS)
+    first = renamer.rename({"type": "typing", "sender_email": "a@example.com", "is_typing": True})
+    second = renamer.rename({"type": "typing", "sender_email": "b@example.com", "is_typing": False})
+    assert first == {"t": "typing", "s": "a@example.com", "ty": True}
+    assert second == {"t": "typing", "s": "b@example.com", "ty": False}
+    assert len(renamer._shapes) == 1
+
+def test_client_chosen_shapes_are_bounded(monkeypatch):
+    monkeypatch.setattr(ws_codec, "MAX_FRAME_SHAPES", 4)
+    renamer = KeyRenamer(ws_codec.TAG_FIELDS, ())
+    for i in range(10):
+        assert renamer.rename({"t": "x", f"k{i}": i}) == {"type": "x", f"k{i}": i}
+    assert len(renamer._shapes) <= 4
+
+def test_msgpack_rejects_text_and_garbage():
+    with pytest.raises(ValueError):
+        MSGPACK_CODEC.decode('{"type": "ping"}')
+    with pytest.raises(ValueError):
+        MSGPACK_CODEC.decode(b"\xc1")
+    #un valor que no es mapa se devuelve tal cual para que el dispatcher lo rechace
+    assert MSGPACK_CODEC.decode(b"\x01") == 1
+
+def test_negotiation_prefers_msgpack_only_when_offered():
+    assert negotiate_codec([]) is JSON_CODEC
+    assert negotiate_codec(["otro"]) is JSON_CODEC
+    assert negotiate_codec(["otro", MSGPACK_SUBPROTOCOL]) is MSGPACK_CODEC
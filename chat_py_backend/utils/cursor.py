@@ -0,0 +1,89 @@
+import base64
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional, Tuple, Union
+from bson import ObjectId
+from bson.errors import InvalidId
+from utils import json_codec
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MILLISECOND = timedelta(milliseconds=1)
+
+CursorKey = Union[datetime, str]
+
+def _pack_key(key: CursorKey) -> list:
+    if isinstance(key, datetime):
+        if key.tzinfo is None:
+            key = key.replace(tzinfo=timezone.utc)
+        return ["d", (key - EPOCH) // _MILLISECOND]
+    return ["s", key]
+
+def _unpack_key(kind: Any, key: Any, key_type: Optional[type]) -> CursorKey:
+    if kind == "d":
+        #bool es subclase de int pero no es una fecha valida
+        if not isinstance(key, int) or isinstance(key, bool):
+            raise ValueError("Fecha de cursor inválida")
+        key = EPOCH + key * _MILLISECOND
+    elif kind == "s":
+        if not isinstance(key, str):
+            raise ValueError("Clave de cursor inválida")
+    else:
+        raise ValueError(f"Tipo de cursor desconocido: {kind}")
+    if key_type is not None and not isinstance(key, key_type):
+        raise ValueError("El cursor no corresponde a este listado")
+    return key
+
+def _encode(raw: list) -> str:
+    return base64.urlsafe_b64encode(json_codec.dumps(raw)).rstrip(b"=").decode("ascii")
+
+def _decode(cursor: str) -> Any:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    return json_codec.loads(base64.urlsafe_b64decode(padded))
+
+def encode_cursor(key: CursorKey, object_id: Union[ObjectId, str]) -> str:
+    """
+    Cursor opaco para paginacion por clave (keyset) sobre `(key, _id)`.
+
+    `key` es la clave de orden (fecha o texto); `_id` desempata documentos
+    con la misma clave. Las fechas se guardan en milisegundos, la misma
+    precision con la que las almacena Mongo.
+    """
+    return _encode(_pack_key(key) + [str(object_id)])
+
+def decode_cursor(cursor: str, key_type: Optional[type] = None) -> Tuple[CursorKey, ObjectId]:
+    """
+    Decodificar un cursor de `encode_cursor`. Lanza ValueError si no es valido.
+
+    `key_type` (datetime o str) exige el tipo de clave del listado que se
+    pagina: la clave acaba en un filtro de Mongo y no puede ser otra cosa.
+    """
+    try:
+        kind, key, object_id = _decode(cursor)
+        if not isinstance(object_id, str):
+            raise ValueError("Id de cursor inválido")
+        return _unpack_key(kind, key, key_type), ObjectId(object_id)
+    except (ValueError, TypeError, OverflowError, InvalidId) as e:
+        raise ValueError("Cursor de paginación inválido") from e
+
+def encode_key_cursor(key: CursorKey) -> str:
+    """Cursor opaco sobre una clave de orden unica (no necesita desempate por `_id`)"""
+    return _encode(_pack_key(key))
+
+def decode_key_cursor(cursor: str, key_type: Optional[type] = None) -> CursorKey:
+    """Decodificar un cursor de `encode_key_cursor`. Lanza ValueError si no es valido."""
+    try:
+        kind, key = _decode(cursor)
+        return _unpack_key(kind, key, key_type)
+    except (ValueError, TypeError, OverflowError) as e:
+        raise ValueError("Cursor de paginación inválido") from e
+
+def keyset_filter(field: str, key: Any, object_id: ObjectId, direction: int) -> dict:
+    """
+    Filtro de documentos posteriores al cursor en orden `(field, _id)`.
+
+    `direction` 1 = ascendente (siguientes), -1 = descendente (anteriores).
+    """
+    op = "$gt" if direction == 1 else "$lt"
+    return {"$or": [
+        {field: {op: key}},
+        {field: key, "_id": {op: object_id}}
+    ]}
@@ -0,0 +1,98 @@
+import json
+from datetime import datetime, timezone
+from typing import Any
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from config.settings import settings
+
+#backends opcionales: se usa el primero disponible, stdlib como respaldo
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+def _default(obj: Any):
+    #tipos que no son JSON nativo: fechas (UTC si vienen sin zona) e ids de Mongo
+    if isinstance(obj, datetime):
+        if obj.tzinfo is None:
+            obj = obj.replace(tzinfo=timezone.utc)
+        return obj.isoformat()
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    raise TypeError(f"Tipo no serializable a JSON: {type(obj).__name__}")
+
+class _StdlibBackend:
+    name = "stdlib"
+
+    def dumps(self, obj: Any) -> bytes:
+        return json.dumps(obj, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    def loads(self, data):
+        return json.loads(data)
+
+class _OrjsonBackend:
+    name = "orjson"
+
+    def dumps(self, obj: Any) -> bytes:
+        #OPT_NAIVE_UTC: las fechas sin zona (como las devuelve Mongo) se marcan como UTC
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NAIVE_UTC)
+
+    def loads(self, data):
+        return orjson.loads(data)
+
+class _MsgspecBackend:
+    name = "msgspec"
+
+    def __init__(self):
+        self._encoder = msgspec.json.Encoder(enc_hook=_default)
+        self._decoder = msgspec.json.Decoder()
+
+    def dumps(self, obj: Any) -> bytes:
+        return self._encoder.encode(obj)
+
+    def loads(self, data):
+        try:
+            return self._decoder.decode(data)
+        except msgspec.DecodeError as e:
+            #mismo contrato que json/orjson: errores de formato como ValueError
+            raise ValueError(str(e)) from e
+
+def _select_backend(name: str):
+    if name in ("auto", "orjson") and orjson is not None:
+        return _OrjsonBackend()
+    if name in ("auto", "msgspec") and msgspec is not None:
+        return _MsgspecBackend()
+    if name not in ("auto", "stdlib"):
+        raise ValueError(f"Backend JSON '{name}' no disponible")
+    return _StdlibBackend()
+
+_backend = _select_backend(settings.json_backend)
+backend_name = _backend.name
+
+def dumps(obj: Any) -> bytes:
+    """Serializar a JSON (UTF-8) con el backend mas rapido disponible"""
+    return _backend.dumps(obj)
+
+def dumps_str(obj: Any) -> str:
+    """Serializar a JSON como str (frames de texto WebSocket)"""
+    return _backend.dumps(obj).decode("utf-8")
+
+def loads(data) -> Any:
+    """Deserializar JSON desde str o bytes"""
+    return _backend.loads(data)
+
+class FastJSONResponse(JSONResponse):
+    """
+    Respuesta JSON que serializa con el codec rapido.
+
+    Acepta directamente fechas y ObjectId, asi que los endpoints calientes
+    pueden devolverla con dicts sin pasar por `jsonable_encoder`.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,65 @@
+import threading
+from typing import Dict
+
+class _Summary:
+    __slots__ = ("count", "total", "min", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value: float):
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "avg": self.total / self.count if self.count else 0,
+            "min": self.min,
+            "max": self.max,
+        }
+
+class Metrics:
+    """
+    Registro minimo de metricas en memoria (por proceso).
+
+    - Contadores: `incr("nombre")`
+    - Resumenes de valores observados (count/avg/min/max): `observe("nombre", valor)`
+    """
+
+    def __init__(self):
+        self._counters: Dict[str, int] = {}
+        self._summaries: Dict[str, _Summary] = {}
+        self._lock = threading.Lock()
+
+    def incr(self, name: str, value: int = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name: str, value: float):
+        with self._lock:
+            summary = self._summaries.get(name)
+            if summary is None:
+                summary = self._summaries[name] = _Summary()
+            summary.observe(value)
+
+    def snapshot(self) -> dict:
+        """Obtener todas las metricas en un dict serializable"""
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "summaries": {name: s.to_dict() for name, s in self._summaries.items()},
+            }
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._summaries.clear()
+
+#instancia global de metricas
+metrics = Metrics()
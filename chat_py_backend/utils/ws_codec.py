@@ -0,0 +1,137 @@
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+try:
+    import msgpack
+except ImportError:  #dependencia opcional: sin ella solo se ofrece JSON
+    msgpack = None
+
+from utils import json_codec
+
+Payload = Union[str, bytes]
+
+#subprotocolo negociado en el handshake de /ws/chat para usar MessagePack
+MSGPACK_SUBPROTOCOL = "chatpy.msgpack.v1"
+
+#etiquetas cortas para los campos del protocolo MessagePack
+FIELD_TAGS: Dict[str, str] = {
+    "type": "t",
+    "id": "i",
+    "sender_email": "s",
+    "receiver_email": "r",
+    "content": "c",
+    "timestamp": "ts",
+    "is_read": "rd",
+    "message_id": "mi",
+    "is_typing": "ty",
+    "reader_email": "re",
+    "user_email": "u",
+    "is_online": "o",
+    "statuses": "ss",
+    "message": "m",
+    "events": "e",
+    "ops": "op",
+    "client_message_id": "ci",
+}
+TAG_FIELDS: Dict[str, str] = {tag: field for field, tag in FIELD_TAGS.items()}
+
+#campos cuyo valor es una lista de frames (presencia agrupada y lotes)
+NESTED_FIELDS = frozenset({"statuses", "events", "ops"})
+
+#limite de formas de frame memorizadas: las claves entrantes las elige el cliente
+MAX_FRAME_SHAPES = 256
+
+class WSCodec:
+    """Codificacion de frames WebSocket en formato texto (JSON, con el codec rapido)"""
+
+    name = "json"
+    binary = False
+
+    def encode(self, frame: dict) -> Payload:
+        return json_codec.dumps_str(frame)
+
+    def decode(self, data: Payload) -> dict:
+        return json_codec.loads(data)
+
+    def join_batch(self, events: List[Payload]) -> Payload:
+        """Armar un frame batch a partir de eventos ya codificados"""
+        return '{"type": "batch", "events": [' + ", ".join(events) + ']}'
+
+class MsgPackCodec(WSCodec):
+    """Frames binarios MessagePack con etiquetas cortas en lugar de nombres de campo"""
+
+    name = "msgpack"
+    binary = True
+
+    def __init__(self):
+        #cabecera de mapa de 2 claves + {t: "batch"} + clave de eventos
+        self._batch_prefix = (
+            b"\x82" + msgpack.packb(FIELD_TAGS["type"]) + msgpack.packb("batch")
+            + msgpack.packb(FIELD_TAGS["events"])
+        )
+        self._packer = msgpack.Packer()
+        self._to_tags = KeyRenamer(FIELD_TAGS, NESTED_FIELDS)
+        self._to_fields = KeyRenamer(TAG_FIELDS, {FIELD_TAGS[field] for field in NESTED_FIELDS})
+
+    def encode(self, frame: dict) -> Payload:
+        return self._packer.pack(self._to_tags.rename(frame))
+
+    def decode(self, data: Payload) -> dict:
+        if isinstance(data, str):
+            raise ValueError("Se esperaba un frame binario MessagePack")
+        try:
+            frame = msgpack.unpackb(data, raw=False)
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"Frame MessagePack inválido: {e}") from e
+        return self._to_fields.rename(frame)
+
+    def join_batch(self, events: List[Payload]) -> Payload:
+        #mapa {t: "batch", e: [...]} concatenando los eventos ya empaquetados
+        return self._batch_prefix + self._packer.pack_array_header(len(events)) + b"".join(events)
+
+class KeyRenamer:
+    """
+    Traduccion de claves de frame (nombre de campo <-> etiqueta corta).
+
+    La traduccion se calcula una vez por forma de frame (la tupla de claves,
+    que es fija para cada tipo) y despues cada frame se reconstruye con un
+    solo `zip`. Solo se recorre el interior de los campos de NESTED_FIELDS.
+    """
+
+    def __init__(self, mapping: Dict[str, str], nested: Iterable[str]):
+        self.mapping = mapping
+        self.nested = frozenset(nested)
+        self._shapes: Dict[Tuple, Tuple[Tuple, bool]] = {}
+
+    def rename(self, frame):
+        if not isinstance(frame, dict):
+            return frame
+        keys = tuple(frame)
+        shape = self._shapes.get(keys)
+        if shape is None:
+            if len(self._shapes) >= MAX_FRAME_SHAPES:
+                self._shapes.clear()
+            shape = self._shapes[keys] = (
+                tuple(self.mapping.get(key, key) for key in keys),
+                not self.nested.isdisjoint(keys)
+            )
+        tags, has_nested = shape
+        if not has_nested:
+            return dict(zip(tags, frame.values()))
+        return {
+            tag: self._rename_list(value) if key in self.nested else value
+            for key, tag, value in zip(keys, tags, frame.values())
+        }
+
+    def _rename_list(self, value):
+        if not isinstance(value, list):
+            return value
+        return [self.rename(item) for item in value]
+
+JSON_CODEC = WSCodec()
+MSGPACK_CODEC: Optional[MsgPackCodec] = MsgPackCodec() if msgpack is not None else None
+
+def negotiate_codec(offered_subprotocols: List[str]) -> WSCodec:
+    """Elegir el codec segun los subprotocolos ofrecidos por el cliente (JSON por defecto)"""
+    if MSGPACK_CODEC is not None and MSGPACK_SUBPROTOCOL in offered_subprotocols:
+        return MSGPACK_CODEC
+    return JSON_CODEC
@@ -6,7 +6,7 @@ import { CHAT_ACTIONS } from './chatActions';
 import { initialState } from './initialState';
 import { ChatContext } from './ChatContextProvider';
 import type { ChatContextValue } from './types';
-import type { ChatMessage, User } from '../types';
+import type { ChatMessage, User, UserStatusChange } from '../types';
 
 interface ChatProviderProps {
   children: ReactNode;
@@ -98,7 +98,7 @@ export const ChatProvider = ({ children }: ChatProviderProps) => {
   const loadChatHistory = useCallback(
     async (userEmail: string): Promise<ChatMessage[]> => {
       try {
-        const history = await chatService.getChatHistory(userEmail);
+        const { messages: history } = await chatService.getChatHistory(userEmail);
         setMessages(history);
         return history;
       } catch (error) {
@@ -111,7 +111,7 @@ export const ChatProvider = ({ children }: ChatProviderProps) => {
 
   const loadUsers = useCallback(async (): Promise<User[]> => {
     try {
-      const users = await chatService.getUsers();
+      const { users } = await chatService.getUsers();
       setUsers(users);
       return users;
     } catch (error) {
@@ -159,7 +159,12 @@ export const ChatProvider = ({ children }: ChatProviderProps) => {
     };
 
     const handleUserStatus = (data: Record<string, unknown>) => {
-      setUserOnlineStatus(String(data.user_email ?? ''), Boolean(data.is_online));
+      const statuses = Array.isArray(data.statuses)
+        ? (data.statuses as UserStatusChange[])
+        : [data as unknown as UserStatusChange];
+      statuses.forEach((status) => {
+        setUserOnlineStatus(String(status.user_email ?? ''), Boolean(status.is_online));
+      });
     };
 
     const handleReadReceipt = (data: Record<string, unknown>) => {
@@ -177,11 +182,28 @@ export const ChatProvider = ({ children }: ChatProviderProps) => {
       );
     };
 
+    //contadores materializados en el servidor: el valor es absoluto, no un delta
+    const handleUnreadUpdate = (data: Record<string, unknown>) => {
+      setUnreadCount(String(data.user_email ?? ''), Number(data.count ?? 0));
+    };
+
+    //el reenvio al reconectar no cubrio todo lo perdido: recargar lista e historial abierto
+    const handleResumeComplete = (data: Record<string, unknown>) => {
+      if (!data.reset && !data.truncated) return;
+      loadUsers().catch(() => undefined);
+      const selectedUser = stateRef.current.selectedUser;
+      if (selectedUser) {
+        loadChatHistory(selectedUser.email).catch(() => undefined);
+      }
+    };
+
     chatService.onMessage('connection_status', handleConnectionStatus);
     chatService.onMessage('message', handleNewMessage);
     chatService.onMessage('typing', handleTyping);
     chatService.onMessage('user_status', handleUserStatus);
     chatService.onMessage('read_receipt', handleReadReceipt);
+    chatService.onMessage('unread_update', handleUnreadUpdate);
+    chatService.onMessage('resume_complete', handleResumeComplete);
 
     return () => {
       chatService.offMessage('connection_status', handleConnectionStatus);
@@ -189,8 +211,19 @@ export const ChatProvider = ({ children }: ChatProviderProps) => {
       chatService.offMessage('typing', handleTyping);
       chatService.offMessage('user_status', handleUserStatus);
       chatService.offMessage('read_receipt', handleReadReceipt);
+      chatService.offMessage('unread_update', handleUnreadUpdate);
+      chatService.offMessage('resume_complete', handleResumeComplete);
     };
-  }, [addMessage, setConnectionStatus, setMessages, setUserOnlineStatus, setUserTyping]);
+  }, [
+    addMessage,
+    loadChatHistory,
+    loadUsers,
+    setConnectionStatus,
+    setMessages,
+    setUnreadCount,
+    setUserOnlineStatus,
+    setUserTyping,
+  ]);
 
   const contextValue: ChatContextValue = useMemo(
     () => ({
@@ -5,8 +5,12 @@ import { buildAuthorizedWsUrl } from './wsClient';
 import { handleAxiosError } from '../utils/errorHandler';
 import type { 
   ChatMessage, 
-  ChatRoom, 
+  ChatHistoryPage,
+  ChatRoomPage, 
+  MessageSearchPage,
   User,
+  UserDirectoryPage,
+  UserSearchResults,
   WebSocketMessage,
   WebSocketConnectionStatus,
 } from '../types';
@@ -19,8 +23,17 @@ interface QueueMessage {
   sender_email?: string;
   content?: string;
   is_typing?: boolean;
+  client_message_id?: string;
 }
 
+//id unico por mensaje: si se reenvia tras perder la confirmacion, el servidor no lo duplica
+const generateClientMessageId = (): string => {
+    if (typeof crypto !== 'undefined' && typeof crypto.randomUUID === 'function') {
+        return crypto.randomUUID();
+    }
+    return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 12)}`;
+};
+
 class ChatService {
     private ws: WebSocket | null = null;
     //multiples handlers por tipo para que contexto y componentes puedan suscribirse al mismo evento
@@ -31,6 +44,8 @@ class ChatService {
     private reconnectAttempts: number = 0;
     private maxReconnectAttempts: number = 5;
     private reconnectInterval: number = 3000; //3 segundos
+    //id del ultimo mensaje recibido: cursor para reanudar tras una reconexion
+    private lastMessageId: string | null = null;
 
     //logica de websocket
     async connect(): Promise<void> {
@@ -55,7 +70,10 @@ class ChatService {
         this.isConnecting = true;
         logger.info('Intentando conectar WebSocket...', { operation: 'websocket_connect' });
 
-        const wsUrl = buildAuthorizedWsUrl('/ws/chat');
+        //batch=1: el servidor puede agrupar varios eventos en un solo frame
+        //resume_after: el servidor reenvia lo perdido desde el ultimo mensaje visto
+        const resume = this.lastMessageId ? `&resume_after=${encodeURIComponent(this.lastMessageId)}` : '';
+        const wsUrl = buildAuthorizedWsUrl(`/ws/chat?batch=1${resume}`);
         if (!wsUrl) {
             logger.debug('WebSocket: no se pudo construir la URL', { operation: 'websocket_connect' });
             this.isConnecting = false;
@@ -105,7 +123,7 @@ class ChatService {
                         attempt: this.reconnectAttempts,
                         maxAttempts: this.maxReconnectAttempts
                     });
-                    setTimeout(() => this.connect(), this.reconnectInterval);
+                    setTimeout(() => this.connect(), this.getReconnectDelay(event));
                 }
             };
 
@@ -125,6 +143,7 @@ class ChatService {
         logger.info('Desconectando WebSocket', { operation: 'websocket_disconnect' });
         this.reconnectAttempts = this.maxReconnectAttempts;
         this.isConnecting = false;
+        this.lastMessageId = null;
         
         if (this.ws) {
             //verificar el estado antes de cerrar
@@ -143,7 +162,8 @@ class ChatService {
         const message: QueueMessage = {
             type: 'message',
             receiver_email: receiverEmail,
-            content: content
+            content: content,
+            client_message_id: generateClientMessageId()
         };
 
         //verificar si el WebSocket esta realmente conectado
@@ -232,7 +252,38 @@ class ChatService {
         }
     }
 
+    //el servidor rechaza handshakes con 1013 y sugiere un retraso con jitter en el motivo
+    private getReconnectDelay(event: CloseEvent): number {
+        if (event.code === 1013) {
+            const match = /retry_after_ms=(\d+)/.exec(event.reason || '');
+            if (match) {
+                return parseInt(match[1], 10);
+            }
+        }
+        return this.reconnectInterval;
+    }
+
     handleMessage(data: WebSocketMessage): void {
+        //desempaquetar lotes del servidor y procesar cada evento en orden
+        if (data.type === 'batch' && Array.isArray(data.events)) {
+            (data.events as WebSocketMessage[]).forEach((event) => this.handleMessage(event));
+            return;
+        }
+
+        //heartbeat del servidor: responder para no ser desconectado por inactividad
+        if (data.type === 'ping') {
+            if (this.ws && this.ws.readyState === WebSocket.OPEN) {
+                this.ws.send(JSON.stringify({ type: 'pong' }));
+            }
+            return;
+        }
+
+        if (data.type === 'message' && typeof data.id === 'string') {
+            this.lastMessageId = data.id;
+        } else if (data.type === 'message_sent' && typeof data.message_id === 'string') {
+            this.lastMessageId = data.message_id;
+        }
+
         const handlers = this.messageHandlers.get(data.type);
         if (handlers) {
             handlers.forEach((handler) => {
@@ -269,9 +320,10 @@ class ChatService {
     }
 
     //metodos de la API
-    async getChatHistory(otherUserEmail: string, limit: number = 50): Promise<ChatMessage[]> {
+    async getChatHistory(otherUserEmail: string, limit: number = 50, before?: string): Promise<ChatHistoryPage> {
         try {
-            const response = await http.get<ChatMessage[]>(`/chat/history/${otherUserEmail}?limit=${limit}`);
+            const cursor = before ? `&before=${encodeURIComponent(before)}` : '';
+            const response = await http.get<ChatHistoryPage>(`/chat/history/${otherUserEmail}?limit=${limit}${cursor}`);
             return response.data;
         } catch (error) {
             const info = handleAxiosError(error as any, { operation: 'getChatHistory', otherUserEmail });
@@ -280,9 +332,22 @@ class ChatService {
         }
     }
 
-    async getChatRooms(): Promise<ChatRoom[]> {
+    async searchMessages(query: string, limit: number = 20, offset: number = 0, withUser?: string): Promise<MessageSearchPage> {
+        try {
+            const scope = withUser ? `&with_user=${encodeURIComponent(withUser)}` : '';
+            const response = await http.get<MessageSearchPage>(`/chat/search?q=${encodeURIComponent(query)}&limit=${limit}&offset=${offset}${scope}`);
+            return response.data;
+        } catch (error) {
+            const info = handleAxiosError(error as any, { operation: 'searchMessages' });
+            logger.error('Error al buscar mensajes', new Error(info.error), { operation: 'searchMessages' });
+            throw new Error(info.error);
+        }
+    }
+
+    async getChatRooms(limit: number = 50, before?: string, includeProfiles: boolean = false): Promise<ChatRoomPage> {
         try {
-            const response = await http.get<ChatRoom[]>(`/chat/rooms`);
+            const cursor = before ? `&before=${encodeURIComponent(before)}` : '';
+            const response = await http.get<ChatRoomPage>(`/chat/rooms?limit=${limit}&include_profiles=${includeProfiles}${cursor}`);
             return response.data;
         } catch (error) {
             const info = handleAxiosError(error as any, { operation: 'getChatRooms' });
@@ -291,9 +356,10 @@ class ChatService {
         }
     }
 
-    async getUsers(): Promise<User[]> {
+    async getUsers(limit: number = 100, after?: string): Promise<UserDirectoryPage> {
         try {
-            const response = await http.get<User[]>(`/chat/users`);
+            const cursor = after ? `&after=${encodeURIComponent(after)}` : '';
+            const response = await http.get<UserDirectoryPage>(`/chat/users?limit=${limit}${cursor}`);
             return response.data;
         } catch (error) {
             const info = handleAxiosError(error as any, { operation: 'getUsers' });
@@ -302,6 +368,17 @@ class ChatService {
         }
     }
 
+    async searchUsers(query: string, limit: number = 20): Promise<User[]> {
+        try {
+            const response = await http.get<UserSearchResults>(`/chat/users/search?q=${encodeURIComponent(query)}&limit=${limit}`);
+            return response.data.users;
+        } catch (error) {
+            const info = handleAxiosError(error as any, { operation: 'searchUsers' });
+            logger.error('Error al buscar usuarios', new Error(info.error), { operation: 'searchUsers' });
+            throw new Error(info.error);
+        }
+    }
+
     async getUnreadCount(): Promise<number> {
         try {
             const response = await http.get<{ unread_count: number }>(`/chat/unread-count`);
@@ -46,11 +46,38 @@ export interface ChatMessage {
   is_read: boolean;
 }
 
+//pagina del historial: next_cursor permite cargar mensajes anteriores (before)
+export interface ChatHistoryPage {
+  messages: ChatMessage[];
+  next_cursor: string | null;
+}
+
+//resultados de /chat/search por relevancia: next_offset pide la siguiente pagina
+export interface MessageSearchResult extends ChatMessage {
+  score: number;
+}
+
+export interface MessageSearchPage {
+  results: MessageSearchResult[];
+  next_offset: number | null;
+}
+
 export interface ChatRoom {
+  id: string;
+  room_id: string;
+  participants: string[];
   other_user_email: string;
-  other_user_username?: string;
-  last_message?: ChatMessage;
+  other_user_username?: string | null;
+  other_user_avatar_url?: string | null;
+  last_message?: ChatMessage | null;
   unread_count: number;
+  updated_at: string;
+}
+
+//pagina de conversaciones: next_cursor (before) carga las siguientes mas antiguas
+export interface ChatRoomPage {
+  rooms: ChatRoom[];
+  next_cursor: string | null;
 }
 
 export interface User {
@@ -62,6 +89,18 @@ export interface User {
   is_online?: boolean;
 }
 
+//pagina del directorio ordenado por username: next_cursor (after) carga la siguiente
+export interface UserDirectoryPage {
+  users: User[];
+  next_cursor: string | null;
+  total_estimate: number;
+}
+
+//resultados de la busqueda por prefijo de username/email (tolera errores de escritura)
+export interface UserSearchResults {
+  users: User[];
+}
+
 //tipos de respuesta estandar
 export interface ApiSuccessResponse<T = unknown> {
   success: true;
@@ -94,6 +133,7 @@ export interface WebSocketChatMessage extends WebSocketMessage {
   content: string;
   timestamp: string;
   is_read: boolean;
+  client_message_id?: string;
 }
 
 export interface WebSocketTypingMessage extends WebSocketMessage {
@@ -117,12 +157,36 @@ export interface WebSocketConnectionStatus extends WebSocketMessage {
 export interface WebSocketMessageSent extends WebSocketMessage {
   type: 'message_sent';
   message_id: string;
+  client_message_id?: string;
 }
 
-export interface WebSocketUserStatus extends WebSocketMessage {
-  type: 'user_status';
+export interface WebSocketResumeComplete extends WebSocketMessage {
+  type: 'resume_complete';
+  replayed: number;
+  truncated?: boolean;
+  reset?: boolean;
+}
+
+//no leidos de la conversacion con `user_email` y total del usuario
+export interface WebSocketUnreadUpdate extends WebSocketMessage {
+  type: 'unread_update';
+  user_email: string;
+  count: number;
+  total: number;
+}
+
+export interface UserStatusChange {
   user_email: string;
   is_online: boolean;
+  timestamp: string;
+}
+
+//un solo cambio viene en los campos de primer nivel; varios agrupados vienen en `statuses`
+export interface WebSocketUserStatus extends WebSocketMessage {
+  type: 'user_status';
+  user_email?: string;
+  is_online?: boolean;
+  statuses?: UserStatusChange[];
 }
 
 export interface WebSocketError extends WebSocketMessage {